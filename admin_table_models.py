@@ -0,0 +1,290 @@
+import cv2
+from PyQt5.QtWidgets import QStyledItemDelegate, QStyle, QStyleOptionButton, QApplication
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant, QEvent, QRect, QTimer, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap, QColor, QFont, QPen
+from ui_theme import ACCENT_BLUE, TEXT_PRIMARY
+
+PRESENT_COLOR = QColor(49, 162, 76)
+ABSENT_COLOR = QColor(228, 22, 58)
+THUMBNAIL_SIZE = 40
+THUMBNAIL_SPACING = 5
+ROW_HEIGHT = THUMBNAIL_SIZE + 2 * THUMBNAIL_SPACING
+
+
+class RecordTableModel(QAbstractTableModel):
+
+    # columns: list of (header, record key); a key of None is the checkbox column
+    columns = []
+    key = 'employee_id'
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.records = []
+        self.row_by_key = {}
+        self.checked = set()
+        self.font = QFont("Segoe UI", 10)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section][0]
+        return QVariant()
+
+    def flags(self, index):
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.isValid() and self.columns[index.column()][1] is None:
+            flags |= Qt.ItemIsUserCheckable
+        return flags
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        record = self.records[index.row()]
+        column_key = self.columns[index.column()][1]
+
+        if column_key is None:
+            if role == Qt.CheckStateRole:
+                return Qt.Checked if record[self.key] in self.checked else Qt.Unchecked
+            return QVariant()
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return str(record.get(column_key, ''))
+        if role == Qt.FontRole:
+            return self.font
+        return self.extra_data(record, column_key, role)
+
+    def extra_data(self, record, column_key, role):
+        return QVariant()
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.CheckStateRole:
+            return False
+        record_key = self.records[index.row()][self.key]
+        if value == Qt.Checked:
+            self.checked.add(record_key)
+        else:
+            self.checked.discard(record_key)
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        return True
+
+    def record_at(self, row):
+        if 0 <= row < len(self.records):
+            return self.records[row]
+        return None
+
+    def checked_records(self):
+        return [record for record in self.records if record[self.key] in self.checked]
+
+    def _reindex(self):
+        self.row_by_key = {record[self.key]: row for row, record in enumerate(self.records)}
+
+    def _emit_row_changed(self, row):
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.columns) - 1))
+
+    def set_records(self, records):
+        # Apply the new page as row removals, insertions and in-place updates so the
+        # view only repaints what changed; fall back to a reset if the order differs
+        new_keys = [record[self.key] for record in records]
+        new_key_set = set(new_keys)
+
+        for row in range(len(self.records) - 1, -1, -1):
+            if self.records[row][self.key] not in new_key_set:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.records[row]
+                self.endRemoveRows()
+
+        for row, record in enumerate(records):
+            if row < len(self.records) and self.records[row][self.key] == record[self.key]:
+                if self.records[row] != record:
+                    self.records[row] = record
+                    self._emit_row_changed(row)
+            else:
+                self.beginInsertRows(QModelIndex(), row, row)
+                self.records.insert(row, record)
+                self.endInsertRows()
+
+        if [record[self.key] for record in self.records] != new_keys:
+            self.beginResetModel()
+            self.records = list(records)
+            self.endResetModel()
+
+        self.checked &= new_key_set
+        self._reindex()
+
+    def update_record(self, record_key, **changes):
+        row = self.row_by_key.get(record_key)
+        if row is None:
+            return False
+        self.records[row] = dict(self.records[row], **changes)
+        self._emit_row_changed(row)
+        return True
+
+    def remove_record(self, record_key):
+        row = self.row_by_key.get(record_key)
+        if row is None:
+            return False
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.records[row]
+        self.endRemoveRows()
+        self.checked.discard(record_key)
+        self._reindex()
+        return True
+
+
+class EmployeeTableModel(RecordTableModel):
+
+    columns = [("Employee ID", 'employee_id'), ("Employee Name", 'employee_name'),
+               ("Photos", 'photos'), ("Select", None)]
+    photos_column = 2
+
+    def __init__(self, images_loader, parent=None):
+        super().__init__(parent)
+        self.images_loader = images_loader
+        self.thumbnails = {}
+        self.pending_thumbnails = set()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and index.column() == self.photos_column and role == Qt.DisplayRole:
+            return QVariant()
+        return super().data(index, role)
+
+    def extra_data(self, record, column_key, role):
+        if column_key == 'employee_id' and role == Qt.ForegroundRole:
+            return QColor(ACCENT_BLUE)
+        return QVariant()
+
+    def thumbnails_for(self, row):
+        # Called from the delegate while painting, so only visible rows trigger a load;
+        # requests from one paint pass are batched into a single query
+        record = self.record_at(row)
+        if record is None:
+            return []
+        employee_id = record[self.key]
+        if employee_id in self.thumbnails:
+            return self.thumbnails[employee_id]
+        if not self.pending_thumbnails:
+            QTimer.singleShot(0, self._load_pending_thumbnails)
+        self.pending_thumbnails.add(employee_id)
+        return []
+
+    def _load_pending_thumbnails(self):
+        employee_ids = list(self.pending_thumbnails)
+        self.pending_thumbnails = set()
+        images_by_id = self.images_loader(employee_ids)
+
+        for employee_id in employee_ids:
+            pixmaps = []
+            for img in (images_by_id.get(employee_id) or [])[:3]:
+                if img is None:
+                    continue
+                # Fit inside the square keeping the aspect ratio; the delegate centres it
+                h, w = img.shape[:2]
+                scale = THUMBNAIL_SIZE / max(h, w)
+                thumb = cv2.resize(img, (max(int(round(w * scale)), 1), max(int(round(h * scale)), 1)),
+                                   interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+                rgb_image = cv2.cvtColor(thumb, cv2.COLOR_BGR2RGB)
+                h, w, ch = rgb_image.shape
+                qt_image = QImage(rgb_image.data, w, h, ch * w, QImage.Format_RGB888)
+                pixmaps.append(QPixmap.fromImage(qt_image))
+            self.thumbnails[employee_id] = pixmaps
+
+            row = self.row_by_key.get(employee_id)
+            if row is not None:
+                index = self.index(row, self.photos_column)
+                self.dataChanged.emit(index, index)
+
+    def set_records(self, records):
+        keep = {record[self.key] for record in records}
+        self.thumbnails = {key: value for key, value in self.thumbnails.items() if key in keep}
+        super().set_records(records)
+
+    def invalidate_thumbnails(self, employee_id):
+        self.thumbnails.pop(employee_id, None)
+        row = self.row_by_key.get(employee_id)
+        if row is not None:
+            index = self.index(row, self.photos_column)
+            self.dataChanged.emit(index, index)
+
+
+class AttendanceTableModel(RecordTableModel):
+
+    columns = [("Employee ID", 'employee_id'), ("Name", 'employee_name'),
+               ("Arrival Time", 'arrival_time'), ("Status", 'status'), ("Select", None)]
+
+    def extra_data(self, record, column_key, role):
+        if column_key == 'status' and role == Qt.BackgroundRole:
+            return PRESENT_COLOR if record.get('status') == "Present" else ABSENT_COLOR
+        return QVariant()
+
+
+class CheckBoxDelegate(QStyledItemDelegate):
+
+    def _checkbox_rect(self, option):
+        style = QApplication.style()
+        size = style.subElementRect(QStyle.SE_CheckBoxIndicator, QStyleOptionButton(), None).size()
+        x = option.rect.x() + (option.rect.width() - size.width()) // 2
+        y = option.rect.y() + (option.rect.height() - size.height()) // 2
+        return QRect(x, y, size.width(), size.height())
+
+    def paint(self, painter, option, index):
+        checkbox = QStyleOptionButton()
+        checkbox.rect = self._checkbox_rect(option)
+        checkbox.state = QStyle.State_Enabled
+        checkbox.state |= QStyle.State_On if index.data(Qt.CheckStateRole) == Qt.Checked else QStyle.State_Off
+        QApplication.style().drawControl(QStyle.CE_CheckBox, checkbox, painter)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and self._checkbox_rect(option).contains(event.pos()):
+            checked = index.data(Qt.CheckStateRole) == Qt.Checked
+            return model.setData(index, Qt.Unchecked if checked else Qt.Checked, Qt.CheckStateRole)
+        return event.type() in (QEvent.MouseButtonPress, QEvent.MouseButtonDblClick) and \
+            self._checkbox_rect(option).contains(event.pos())
+
+
+class StatusDelegate(QStyledItemDelegate):
+
+    def paint(self, painter, option, index):
+        background = index.data(Qt.BackgroundRole)
+        if isinstance(background, QColor):
+            painter.fillRect(option.rect, background)
+        painter.setPen(QColor(TEXT_PRIMARY))
+        painter.drawText(option.rect.adjusted(8, 0, -8, 0), Qt.AlignVCenter | Qt.AlignLeft, str(index.data()))
+
+
+class ThumbnailDelegate(QStyledItemDelegate):
+    thumbnail_clicked = pyqtSignal(int, int)
+
+    def _thumbnail_rect(self, option, position):
+        x = option.rect.x() + THUMBNAIL_SPACING + position * (THUMBNAIL_SIZE + THUMBNAIL_SPACING)
+        y = option.rect.y() + (option.rect.height() - THUMBNAIL_SIZE) // 2
+        return QRect(x, y, THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+
+    def paint(self, painter, option, index):
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+        pixmaps = index.model().thumbnails_for(index.row())
+        painter.save()
+        painter.setPen(QPen(QColor(ACCENT_BLUE), 1))
+        for position, pixmap in enumerate(pixmaps):
+            rect = self._thumbnail_rect(option, position)
+            painter.drawPixmap(rect.x() + (rect.width() - pixmap.width()) // 2,
+                               rect.y() + (rect.height() - pixmap.height()) // 2, pixmap)
+            painter.drawRect(rect)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease:
+            for position in range(len(model.thumbnails_for(index.row()))):
+                if self._thumbnail_rect(option, position).contains(event.pos()):
+                    self.thumbnail_clicked.emit(index.row(), position)
+                    return True
+        return False
+
+    def sizeHint(self, option, index):
+        size = super().sizeHint(option, index)
+        size.setHeight(ROW_HEIGHT)
+        return size
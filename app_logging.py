@@ -0,0 +1,131 @@
+import json
+import time
+import queue
+import random
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+ROOT_LOGGER = 'attendance'
+TEXT_FORMAT = '%(asctime)s %(levelname)-7s %(name)s: %(message)s'
+# LogRecord attributes that are not user-supplied extra fields
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def get_logger(name):
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+class RateLimitFilter(logging.Filter):
+
+    # Lets through at most `limit` records per message template and logger every
+    # `interval` seconds; the next record let through says how many were dropped.
+    # Runs in the calling thread, before anything is formatted or queued.
+
+    def __init__(self, limit=5, interval=10.0):
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if not self.limit:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self.lock:
+            window_start, count, suppressed = self.windows.get(key, (now, 0, 0))
+            if now - window_start >= self.interval:
+                window_start, count = now, 0
+            if count >= self.limit:
+                self.windows[key] = (window_start, count, suppressed + 1)
+                return False
+            self.windows[key] = (window_start, count + 1, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class SamplingFilter(logging.Filter):
+
+    # Keeps a fraction of DEBUG/INFO records per logger, e.g. {'attendance.recognition': 0.1};
+    # warnings and errors are never sampled away
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates or {})
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self.rates.get(record.name)
+        return rate is None or random.random() < rate
+
+
+class SuppressedCountFormatter(logging.Formatter):
+
+    def format(self, record):
+        message = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        return f"{message} (+{suppressed} similar suppressed)" if suppressed else message
+
+
+class JsonFormatter(logging.Formatter):
+
+    # One JSON object per line; fields passed with extra={...} are kept as keys, so
+    # dicts such as a metrics snapshot stay structured
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f".{int(record.msecs):03d}",
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RecordQueueHandler(QueueHandler):
+
+    # The stock prepare() formats the message in the calling thread and drops args and
+    # exc_info. The record is queued untouched instead, so the listener's handlers do all
+    # the formatting and JsonFormatter still sees the exception.
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(logging_settings):
+
+    # Records are filtered in the calling thread and handed to a QueueListener thread for
+    # formatting and I/O, so a slow console or disk never stalls the camera loop.
+    # Returns the listener; call stop() on it at exit to flush.
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(logging_settings['level'])
+    logger.propagate = False
+
+    console = logging.StreamHandler()
+    console.setFormatter(SuppressedCountFormatter(TEXT_FORMAT))
+    handlers = [console]
+    if logging_settings.get('json_file'):
+        json_handler = RotatingFileHandler(logging_settings['json_file'], maxBytes=logging_settings['max_bytes'],
+                                           backupCount=logging_settings['backup_count'], encoding='utf-8')
+        json_handler.setFormatter(JsonFormatter())
+        handlers.append(json_handler)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = RecordQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(logging_settings['sample_rates']))
+    queue_handler.addFilter(RateLimitFilter(logging_settings['rate_limit_per_key'],
+                                            logging_settings['rate_limit_interval_s']))
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
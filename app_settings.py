@@ -0,0 +1,140 @@
+import os
+import json
+import copy
+
+SETTINGS_FILE = 'settings.json'
+
+# Every key has a default here; settings.json only needs the values that differ
+DEFAULT_SETTINGS = {
+    'model': {
+        'name': 'buffalo_l',
+        'det_size': [640, 640],
+        'det_thresh': 0.5,
+        'warmup_runs': 2,
+        'optimized_cache_dir': 'model_cache',
+        # e.g. 'int8' once quantize_models.py has produced and approved that variant
+        'variant': None,
+        'variants_dir': 'model_variants',
+    },
+    'camera': {
+        'source': 0,
+        # Per-source detection regions, see roi.load_roi_config
+        'roi_config': 'roi_config.json',
+        # 'thread' runs capture and inference on a QThread; 'process' runs them in two
+        # worker processes that share frames through a frame_transport.FrameRing
+        'transport': 'thread',
+        'ring_slots': 6,
+        'max_frame_size': [1920, 1080],
+        # camera_capture.CaptureConfig. backend 'auto' is v4l2 on Linux and dshow on
+        # Windows; null leaves a property at the driver's default. The device may round
+        # or refuse any of these; what it accepted is logged when it opens.
+        'capture': {
+            'backend': 'auto',
+            'fourcc': 'MJPG',
+            # Frames wider or taller than 1000 px are shrunk to 800 px before detection, so
+            # requesting more only adds decode and resize work; keep any size at or below that
+            'width': None,
+            'height': None,
+            'fps': 30,
+            'buffer_size': 1,
+            'reopen_backoff_s': [0.5, 10.0],
+            'max_failed_reads': 30,
+        },
+    },
+    # detection_controller.AdaptiveDetectionController. Off by default, so detection runs
+    # at model.det_size as before; turning it on trades detector input size for FPS.
+    'detection': {
+        'adaptive': False,
+        'target_fps': 10,
+        'candidate_sizes': [320, 480, 640],
+        'min_face_px': 32,
+        'window_frames': 60,
+        'switch_interval': 15,
+        # Every nth empty frame at a reduced size is retried at the largest; 0 never retries
+        'fallback_interval': 5,
+    },
+    # face_quality.FaceQualityGate; yaw in inter-eye distances, pitch as nose position
+    # between the eye and mouth lines. Off by default: once enabled, faces that fail any
+    # check are not recognized at all, so tune the limits on the kiosk's camera first.
+    'quality': {
+        'enabled': False,
+        'min_det_score': 0.6,
+        'min_face_px': 48,
+        'max_yaw': 0.35,
+        'pitch_range': [0.2, 0.8],
+        'max_roll_deg': 25,
+        'min_blur_var': 40.0,
+    },
+    # pipeline_metrics.PipelineMetrics; disabled means a no-op recorder on the hot path
+    'metrics': {
+        'enabled': True,
+        'overlay': False,
+        'window': 1000,
+        'dump_interval_s': 60,
+        # metrics_exporter.MetricsExporter; http_port None or textfile_dir None turns
+        # that output off, and both are off by default. With an http_port (9108 is the
+        # usual choice) the endpoint listens on host, localhost unless changed.
+        'exporter': {
+            'host': '127.0.0.1',
+            'http_port': None,
+            'textfile_dir': None,
+            'textfile_interval_s': 15,
+        },
+    },
+    # app_logging.setup_logging; sample_rates maps logger name to the share of
+    # DEBUG/INFO records kept, e.g. {"attendance.recognition": 0.1}
+    'logging': {
+        'level': 'INFO',
+        'json_file': None,
+        'max_bytes': 10 * 1024 * 1024,
+        'backup_count': 5,
+        'rate_limit_per_key': 5,
+        'rate_limit_interval_s': 10,
+        'sample_rates': {},
+    },
+    # profiling.start_capture, used by the admin panel, SIGUSR1 and --profile
+    'profiling': {
+        'output_dir': 'profiles',
+        'duration_s': 30,
+        'interval_ms': 10,
+    },
+    # model_runtime.RuntimeProfile; runtime_tuner.py can pick these for the local machine
+    'runtime': {
+        'intra_op_threads': 0,
+        'inter_op_threads': 0,
+        'execution_mode': 'sequential',
+        'graph_optimization': 'all',
+        'opencv_threads': None,
+        'providers': ['CUDAExecutionProvider', 'CPUExecutionProvider'],
+    },
+}
+
+
+def _merge(defaults, overrides):
+    merged = copy.deepcopy(defaults)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def load_settings(path=SETTINGS_FILE):
+
+    if not os.path.exists(path):
+        return copy.deepcopy(DEFAULT_SETTINGS)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return _merge(DEFAULT_SETTINGS, json.load(f))
+    except (OSError, ValueError) as e:
+        print(f"Error reading {path}, using defaults: {e}")
+        return copy.deepcopy(DEFAULT_SETTINGS)
+
+
+def save_settings(settings, path=SETTINGS_FILE):
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(settings, f, indent=2)
+    os.replace(tmp_path, path)
@@ -4,29 +4,41 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
 import sys
-import csv
+import queue
+import threading
+import signal
+import argparse
+import multiprocessing
+import time as perf_time
 from datetime import date, datetime, time, timedelta
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QLabel, QLineEdit, QDialog, QFileDialog, QMessageBox, 
-                             QTableWidget, QTableWidgetItem, QGroupBox, QFormLayout, QTimeEdit,
-                             QCheckBox, QListWidget, QListWidgetItem, QScrollArea, QHeaderView)
-from PyQt5.QtCore import QTimer, Qt, QThread, pyqtSignal, QTime, QSize, QRect
+                             QGroupBox, QFormLayout, QTimeEdit,
+                             QListWidget, QListWidgetItem, QScrollArea, QHeaderView,
+                             QDateEdit, QProgressDialog, QTableView, QAbstractItemView)
+from PyQt5.QtCore import QTimer, Qt, QThread, pyqtSignal, QTime, QSize, QRect, QDate
 from PyQt5.QtGui import QImage, QPixmap, QFont, QColor, QIcon, QPainter, QBrush
 import cv2
 import numpy as np
-from database_helper import DatabaseHelper
-from insightface_embeddings import InsightFaceEmbeddingExtractor
-
-DARK_BG = "#18191A"
-DARK_SECONDARY = "#242526"
-DARK_TERTIARY = "#3A3B3C"
-ACCENT_BLUE = "#0A66C2"
-ACCENT_BLUE_HOVER = "#0952A4"
-TEXT_PRIMARY = "#E4E6EB"
-TEXT_SECONDARY = "#B0B3B9"
-SUCCESS_GREEN = "#31A24C"
-ERROR_RED = "#E4163A"
-WARNING_ORANGE = "#F57C00"
+from attendance_engine import AttendanceEngine
+from detection_controller import AdaptiveDetectionController
+from face_quality import FaceQualityGate
+from roi import roi_for_source
+from pipeline_metrics import NULL_METRICS, GilLagProbe
+from frame_transport import FrameRing, capture_main, inference_main, DISPLAY_READER
+from frame_buffers import BufferPool, ScratchBuffers
+from camera_capture import CaptureConfig, CameraSource
+from profiling import ThreadProfileHook, active_capture
+from app_logging import get_logger, setup_logging
+from app_settings import load_settings
+from attendance_export import export_attendance_range
+from admin_table_models import (EmployeeTableModel, AttendanceTableModel, CheckBoxDelegate,
+                                StatusDelegate, ThumbnailDelegate)
+from ui_theme import (DARK_BG, DARK_SECONDARY, DARK_TERTIARY, ACCENT_BLUE, ACCENT_BLUE_HOVER,
+                      TEXT_PRIMARY, TEXT_SECONDARY, SUCCESS_GREEN, ERROR_RED, WARNING_ORANGE)
+
+
+log = get_logger('app')
 
 
 def create_camera_icon(size=400):
@@ -61,6 +73,91 @@ def create_camera_icon(size=400):
     return pixmap
 
 
+class KeysetPager:
+
+    def __init__(self, fetch_page, page_size=50, key='employee_id'):
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.key = key
+        self.page_starts = [None]
+        self.rows = []
+        self.has_next = False
+
+    @property
+    def page_number(self):
+        return len(self.page_starts)
+
+    def _load(self):
+        # One extra row tells us whether a next page exists without a COUNT query
+        rows = self.fetch_page(self.page_starts[-1], self.page_size + 1)
+        self.has_next = len(rows) > self.page_size
+        self.rows = rows[:self.page_size]
+        return self.rows
+
+    def first(self):
+        self.page_starts = [None]
+        return self._load()
+
+    def reload(self):
+        rows = self._load()
+        if not rows and len(self.page_starts) > 1:
+            return self.previous()
+        return rows
+
+    def next(self):
+        if self.has_next and self.rows:
+            self.page_starts.append(self.rows[-1][self.key])
+            return self._load()
+        return self.rows
+
+    def previous(self):
+        if len(self.page_starts) > 1:
+            self.page_starts.pop()
+        return self._load()
+
+
+def create_pagination_bar(on_previous, on_next):
+    bar = QHBoxLayout()
+    prev_btn = QPushButton("◀ Previous")
+    next_btn = QPushButton("Next ▶")
+    page_label = QLabel("Page 1")
+    page_label.setStyleSheet(f"color: {TEXT_SECONDARY};")
+    for btn, handler in ((prev_btn, on_previous), (next_btn, on_next)):
+        btn.setFont(QFont("Segoe UI", 10, QFont.Bold))
+        btn.setMinimumHeight(35)
+        btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {DARK_TERTIARY};
+                color: white;
+                border: none;
+                border-radius: 5px;
+                padding: 0 12px;
+            }}
+            QPushButton:hover:enabled {{ background-color: #4A4B4C; }}
+            QPushButton:disabled {{ color: {TEXT_SECONDARY}; }}
+        """)
+        btn.clicked.connect(handler)
+    bar.addStretch()
+    bar.addWidget(prev_btn)
+    bar.addWidget(page_label)
+    bar.addWidget(next_btn)
+    return bar, prev_btn, next_btn, page_label
+
+
+def update_pagination_bar(pager, prev_btn, next_btn, page_label):
+    prev_btn.setEnabled(pager.page_number > 1)
+    next_btn.setEnabled(pager.has_next)
+    page_label.setText(f"Page {pager.page_number}")
+
+
+def create_debounce_timer(callback, interval=300):
+    timer = QTimer()
+    timer.setSingleShot(True)
+    timer.setInterval(interval)
+    timer.timeout.connect(callback)
+    return timer
+
+
 class ImageViewerDialog(QDialog):
     
     def __init__(self, parent=None, image_path=None, image_data=None):
@@ -120,41 +217,321 @@ class InsightFaceCameraThread(QThread):
     frame_ready = pyqtSignal(object)
     face_recognized = pyqtSignal(str, str, float, dict)
 
-    def __init__(self, extractor, embeddings_data, daily_records):
+    # Frames the UI may have queued but not painted before new ones are dropped rather
+    # than piling up in the Qt event queue
+    MAX_PENDING_FRAMES = 2
+
+    def __init__(self, extractor, embeddings_data, daily_records, detection_controller=None, quality_gate=None,
+                 source=0, roi=None, metrics=NULL_METRICS, capture_config=None):
         super().__init__()
         self.extractor = extractor
         self.embeddings_data = embeddings_data
         self.running = False
         self.camera = None
         self.daily_records = daily_records
+        self.detection_controller = detection_controller
+        self.quality_gate = quality_gate
+        self.source = source
+        self.capture_config = capture_config or CaptureConfig()
+        self.roi = roi
+        self.metrics = metrics
+        # Each counter is written by one thread only: emitted here, painted by the UI
+        self.frames_emitted = 0
+        self.frames_painted = 0
+        # Frames are read into pooled arrays and handed back by the UI once painted
+        self.frame_pool = BufferPool()
+
+    def set_embeddings(self, embeddings_data):
+        # Rebinding the attribute is atomic; the loop picks the new gallery up on its next frame
+        self.embeddings_data = embeddings_data
+
+    def release_frame(self, frame):
+        self.frame_pool.release(frame)
+
+    def paint(self, frame, render):
+        # frame_ready carries the pooled frame itself; it goes back to the pool once rendered
+        try:
+            render(frame)
+        finally:
+            self.release_frame(frame)
+        return True
 
     def run(self):
-        self.camera = cv2.VideoCapture(0)
+        started = perf_time.perf_counter()
+        self.camera = CameraSource(self.source, self.capture_config, self.metrics)
+        self.camera.open()
         self.running = True
-
+        first_frame = True
+
+        metrics = self.metrics
+        fps_started = started
+        fps_frames = 0
+        profile_hook = ThreadProfileHook('camera')
+        gil_probe = GilLagProbe(metrics)
+        gil_probe.start()
+        frame_pool = self.frame_pool
+        frame_shape = None
         while self.running:
-            ret, frame = self.camera.read()
+            profile_hook.tick()
+            frame_started = perf_time.perf_counter()
+            buffer = frame_pool.acquire(frame_shape) if frame_shape else None
+            if buffer is None:
+                ret, frame = self.camera.read()
+            else:
+                ret, frame = self.camera.read(image=buffer)
+            metrics.record('capture', frame_started)
+            if not ret:
+                metrics.incr('capture_failed')
+                frame_pool.release(buffer)
+            elif buffer is None or not np.may_share_memory(frame, buffer):
+                # First frame, or the camera changed resolution and OpenCV allocated one
+                frame_pool.adopt(frame)
+                frame_pool.release(buffer)
+                frame_shape = frame.shape
             if ret:
+                metrics.incr('frames')
+                embeddings_data = self.embeddings_data
+                controller = self.detection_controller
+                det_sizes = controller.sizes_to_try() if controller else None
+                inference_started = perf_time.perf_counter()
                 employee_id, similarity, employee_name, face_info = self.extractor.recognize_face_from_embedding(
-                    frame, self.embeddings_data
+                    frame, embeddings_data, det_sizes=det_sizes, quality_gate=self.quality_gate, roi=self.roi,
+                    metrics=metrics
                 )
+                finished = perf_time.perf_counter()
+                if controller:
+                    controller.observe(frame.shape, (finished - inference_started) * 1000, face_info)
+                if first_frame:
+                    first_frame = False
+                    log.info("First frame: %.0f ms after start, inference %.0f ms",
+                             (finished - started) * 1000, (finished - inference_started) * 1000)
 
                 if employee_id and similarity > self.extractor.threshold:
-                    if employee_id not in self.daily_records:
+                    if self.daily_records.claim(employee_id):
                         self.face_recognized.emit(employee_id, employee_name, float(similarity), 
                                                  face_info if face_info else {})
-                        self.daily_records[employee_id] = datetime.now()
-
-                self.frame_ready.emit(frame)
 
+                pending = self.frames_emitted - self.frames_painted
+                metrics.set_gauge('frames_pending_paint', pending)
+                if pending < self.MAX_PENDING_FRAMES:
+                    self.frames_emitted += 1
+                    self.frame_ready.emit(frame)
+                else:
+                    metrics.incr('frames_dropped')
+                    frame_pool.release(frame)
+                metrics.record('frame', frame_started)
+                metrics.maybe_dump()
+
+                fps_frames += 1
+                elapsed = perf_time.perf_counter() - fps_started
+                if elapsed >= 1.0:
+                    metrics.set_gauge('fps', fps_frames / elapsed)
+                    metrics.set_gauge('buffer_allocations',
+                                      frame_pool.allocations + self.extractor.scratch.allocations)
+                    fps_started += elapsed
+                    fps_frames = 0
+
+        profile_hook.close()
+        gil_probe.stop()
         if self.camera:
             self.camera.release()
+        if self.quality_gate is not None:
+            log.info("Quality gate: %s", self.quality_gate.summary(),
+                     extra={'quality_counts': self.quality_gate.snapshot()})
 
     def stop(self):
         self.running = False
         self.wait()
 
 
+class ProcessCameraThread(QThread):
+    frame_ready = pyqtSignal(object)
+    face_recognized = pyqtSignal(str, str, float, dict)
+
+    MAX_PENDING_FRAMES = InsightFaceCameraThread.MAX_PENDING_FRAMES
+
+    # Same interface as InsightFaceCameraThread, but capture and inference run in two
+    # worker processes (camera.transport = 'process'). Frames travel through a shared-
+    # memory FrameRing; this thread only receives small result messages and records
+    # attendance claims. frame_ready carries (seq, slot, shape) rather than a frame: the
+    # UI renders straight from the ring slot in paint(), so no frame is copied out of the
+    # ring. The GUI process's GIL is left to Qt and this thread.
+
+    def __init__(self, settings, embeddings_file, daily_records, source=0, roi=None, metrics=NULL_METRICS):
+        super().__init__()
+        self.settings = settings
+        self.embeddings_file = embeddings_file
+        self.daily_records = daily_records
+        self.source = source
+        self.roi = roi
+        self.metrics = metrics
+        self.running = False
+        self.commands_queue = None
+        self.frames_emitted = 0
+        self.frames_painted = 0
+        # Set while the workers run; the lock keeps run() from closing it during a paint
+        self.ring = None
+        self.ring_lock = threading.Lock()
+
+    def set_embeddings(self, embeddings_data):
+        # The engine saves a rebuilt gallery before swapping it in; the worker reloads the file
+        if self.commands_queue is not None:
+            self.commands_queue.put('reload_gallery')
+
+    def release_frame(self, frame):
+        # Nothing to hand back; the ring slot is only held during paint()
+        pass
+
+    def paint(self, frame, render):
+        # Renders the announced ring slot while holding it as the display reader. Returns
+        # False, without a usable render, if capture had already reused the slot.
+        seq, slot, shape = frame
+        with self.ring_lock:
+            ring = self.ring
+            if ring is None:
+                return False
+            valid = ring.hold(DISPLAY_READER, slot, seq)
+            if valid:
+                render(ring.view(slot, shape))
+                valid = ring.still_valid(slot, seq)
+            ring.release(DISPLAY_READER)
+        if not valid:
+            self.metrics.incr('frames_dropped')
+        return valid
+
+    def run(self):
+        camera_settings = self.settings['camera']
+        max_w, max_h = camera_settings['max_frame_size']
+        ring = FrameRing.create(camera_settings['ring_slots'], max_w * max_h * 3)
+        self.ring = ring
+        # spawn: forking a process that has Qt and ONNX Runtime threads running is unsafe
+        context = multiprocessing.get_context('spawn')
+        frames_queue = context.Queue(maxsize=max(1, camera_settings['ring_slots'] - ring.readers - 1))
+        results_queue = context.Queue()
+        self.commands_queue = context.Queue()
+        stop_event = context.Event()
+        workers = [
+            context.Process(target=capture_main, name="capture",
+                            args=(self.source, camera_settings['capture'], self.metrics.enabled, ring.spec,
+                                  frames_queue, stop_event), daemon=True),
+            context.Process(target=inference_main, name="inference",
+                            args=(self.settings, self.embeddings_file, self.source, ring.spec, frames_queue,
+                                  results_queue, self.commands_queue, stop_event), daemon=True),
+        ]
+        for worker in workers:
+            worker.start()
+        log.info("Capture and inference started in processes %s", ", ".join(str(w.pid) for w in workers))
+
+        metrics = self.metrics
+        gil_probe = GilLagProbe(metrics)
+        gil_probe.start()
+        fps_started = perf_time.perf_counter()
+        fps_frames = 0
+        self.running = True
+        try:
+            while self.running:
+                try:
+                    message = results_queue.get(timeout=0.2)
+                except queue.Empty:
+                    if not all(worker.is_alive() for worker in workers):
+                        log.error("A camera worker process exited; stopping recognition")
+                        break
+                    continue
+                kind = message[0]
+                if kind == 'failed':
+                    log.error("Inference process failed: %s", message[1])
+                    break
+                if kind == 'ready':
+                    continue
+                if kind == 'torn':
+                    metrics.incr('frames_dropped', message[2] + 1)
+                    metrics.merge(message[3])
+                    continue
+
+                (_, seq, slot, shape, dropped, latency_ms, employee_id, similarity, employee_name, face_info,
+                 frame_metrics) = message
+                frame_started = perf_time.perf_counter()
+                # Capture, detection, alignment, embedding, gallery_scan, their counters and the
+                # inference process's buffer_allocations, as measured in the worker processes
+                metrics.merge(frame_metrics)
+                metrics.incr('frames')
+                if dropped:
+                    metrics.incr('frames_dropped', dropped)
+                fps_frames += 1
+                elapsed = frame_started - fps_started
+                if elapsed >= 1.0:
+                    metrics.set_gauge('fps', fps_frames / elapsed)
+                    fps_started += elapsed
+                    fps_frames = 0
+                if employee_id and self.daily_records.claim(employee_id):
+                    self.face_recognized.emit(employee_id, employee_name, similarity, face_info or {})
+
+                pending = self.frames_emitted - self.frames_painted
+                metrics.set_gauge('frames_pending_paint', pending)
+                if pending >= self.MAX_PENDING_FRAMES:
+                    metrics.incr('frames_dropped')
+                    continue
+                self.frames_emitted += 1
+                self.frame_ready.emit((seq, slot, shape))
+                metrics.record('frame', frame_started)
+                metrics.maybe_dump()
+        finally:
+            gil_probe.stop()
+            stop_event.set()
+            for worker in workers:
+                worker.join(timeout=5)
+                if worker.is_alive():
+                    worker.terminate()
+            self.commands_queue = None
+            with self.ring_lock:
+                self.ring = None
+            ring.close()
+
+    def stop(self):
+        self.running = False
+        self.wait()
+
+
+class AttendanceExportThread(QThread):
+    progress = pyqtSignal(int, int)
+    export_finished = pyqtSignal(bool, int, str)
+
+    def __init__(self, db_helper, file_path, start_date, end_date, include_today_absent):
+        super().__init__()
+        self.db_helper = db_helper
+        self.file_path = file_path
+        self.start_date = start_date
+        self.end_date = end_date
+        self.include_today_absent = include_today_absent
+        self.cancelled = False
+
+    def run(self):
+        worker_db = self.db_helper.clone()
+        if worker_db is None:
+            self.export_finished.emit(False, 0, "Failed to connect to database")
+            return
+
+        try:
+            ok, rows_written = export_attendance_range(
+                worker_db, self.file_path, self.start_date, self.end_date,
+                include_today_absent=self.include_today_absent,
+                progress_callback=self.progress.emit,
+                cancel_check=lambda: self.cancelled
+            )
+        finally:
+            worker_db.disconnect()
+
+        if self.cancelled:
+            self.export_finished.emit(False, rows_written, "Export cancelled")
+        elif ok:
+            self.export_finished.emit(True, rows_written, "")
+        else:
+            self.export_finished.emit(False, rows_written, "Export failed")
+
+    def cancel(self):
+        self.cancelled = True
+
+
 class AdminLoginDialog(QDialog):
 
     def __init__(self, parent=None):
@@ -243,7 +620,7 @@ class AdminLoginDialog(QDialog):
 
 class EditEmployeeDialog(QDialog):
 
-    def __init__(self, parent=None, db_helper=None, extractor=None, employee_id=None, employee_name=None):
+    def __init__(self, parent=None, db_helper=None, rebuild_embeddings=None, employee_id=None, employee_name=None):
         super().__init__(parent)
         self.setWindowTitle("Edit Employee")
         self.setMinimumSize(600, 500)
@@ -253,7 +630,7 @@ class EditEmployeeDialog(QDialog):
             QMessageBox QLabel {{ color: {TEXT_PRIMARY}; }}
         """)
         self.db_helper = db_helper
-        self.extractor = extractor
+        self.rebuild_embeddings = rebuild_embeddings
         self.employee_id = employee_id
         self.image_paths = [None, None, None]
         self._setup_ui(employee_name)
@@ -421,12 +798,11 @@ class EditEmployeeDialog(QDialog):
             cursor.close()
 
             if any(p is not None for p in self.image_paths):
-                if self.db_helper.add_employee(self.employee_id, new_name, 
-                                              self.image_paths[0], self.image_paths[1], 
-                                              self.image_paths[2]):
-                    if self.extractor:
-                        self.extractor.embeddings_data = self.extractor.extract_embeddings_for_all_employees()
-                        self.extractor.save_embeddings(self.extractor.embeddings_data)
+                self.db_helper.add_employee(self.employee_id, new_name, 
+                                            self.image_paths[0], self.image_paths[1], 
+                                            self.image_paths[2])
+            if self.rebuild_embeddings:
+                self.rebuild_embeddings([self.employee_id])
 
             msg = QMessageBox(self)
             msg.setWindowTitle("Success")
@@ -466,7 +842,7 @@ class EditEmployeeDialog(QDialog):
 
 class ViewAllEmployeesDialog(QDialog):
 
-    def __init__(self, parent=None, db_helper=None, extractor=None, on_update=None):
+    def __init__(self, parent=None, db_helper=None, rebuild_embeddings=None, on_update=None):
         super().__init__(parent)
         self.setWindowTitle("Employee Management - Full Screen")
         screen = QApplication.primaryScreen()
@@ -480,13 +856,15 @@ class ViewAllEmployeesDialog(QDialog):
             QMessageBox QLabel {{ color: {TEXT_PRIMARY}; }}
         """)
         self.db_helper = db_helper
-        self.extractor = extractor
+        self.rebuild_embeddings = rebuild_embeddings
         self.on_update = on_update
         self.count_label = None
         self.employees_table = None
         self.selected_employee = None
         self.search_input = None
         self.last_selected_row = -1
+        self.pager = KeysetPager(self.fetch_employees_page)
+        self.search_timer = create_debounce_timer(self.search_employees)
         self._setup_ui()
 
     def _setup_ui(self):
@@ -518,7 +896,7 @@ class ViewAllEmployeesDialog(QDialog):
             }}
             QLineEdit:focus {{ border: 2px solid {ACCENT_BLUE}; }}
         """)
-        self.search_input.textChanged.connect(self.search_employees)
+        self.search_input.textChanged.connect(lambda: self.search_timer.start())
 
         clear_btn = QPushButton("✕ Clear")
         clear_btn.setFont(QFont("Segoe UI", 10, QFont.Bold))
@@ -541,11 +919,11 @@ class ViewAllEmployeesDialog(QDialog):
         search_layout.addStretch()
         layout.addLayout(search_layout)
 
-        table = QTableWidget()
-        table.setColumnCount(4) 
-        table.setHorizontalHeaderLabels(["Employee ID", "Employee Name", "Photos", "Select"])
+        table = QTableView()
+        self.employees_model = EmployeeTableModel(self.db_helper.get_employees_images, table)
+        table.setModel(self.employees_model)
         table.setStyleSheet(f"""
-            QTableWidget {{
+            QTableView {{
                 background-color: {DARK_SECONDARY};
                 color: {TEXT_PRIMARY};
                 gridline-color: {DARK_TERTIARY};
@@ -557,26 +935,31 @@ class ViewAllEmployeesDialog(QDialog):
                 font-weight: bold;
                 border: none;
             }}
-            QTableWidget::item {{
+            QTableView::item {{
                 padding: 10px;
             }}
-            QTableWidget::item:selected {{
+            QTableView::item:selected {{
                 background-color: {ACCENT_BLUE};
             }}
         """)
+        self.thumbnail_delegate = ThumbnailDelegate(table)
+        self.thumbnail_delegate.thumbnail_clicked.connect(self.on_thumbnail_clicked)
+        table.setItemDelegateForColumn(2, self.thumbnail_delegate)
+        table.setItemDelegateForColumn(3, CheckBoxDelegate(table))
+        table.verticalHeader().setDefaultSectionSize(50)
+        table.verticalHeader().setVisible(False)
         table.horizontalHeader().setStretchLastSection(False)
         table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
         table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
         table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
         table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeToContents)
-        table.setSelectionBehavior(QTableWidget.SelectRows)
-        table.setSelectionMode(QTableWidget.SingleSelection)
-        table.itemSelectionChanged.connect(self.on_employee_selected)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        table.setSelectionMode(QAbstractItemView.SingleSelection)
+        table.selectionModel().selectionChanged.connect(self.on_employee_selected)
 
         self.employees_table = table
         self.count_label = QLabel("0")
         self.count_label.setStyleSheet(f"color: {SUCCESS_GREEN}; font-weight: bold; font-size: 12px;")
-        self.load_employees()
         layout.addWidget(table, 1)
 
         status_layout = QHBoxLayout()
@@ -584,8 +967,11 @@ class ViewAllEmployeesDialog(QDialog):
         status_label.setStyleSheet(f"color: {TEXT_PRIMARY}; font-weight: bold;")
         status_layout.addWidget(status_label)
         status_layout.addWidget(self.count_label)
-        status_layout.addStretch()
+        pagination_bar, self.prev_btn, self.next_btn, self.page_label = create_pagination_bar(
+            self.previous_page, self.next_page)
+        status_layout.addLayout(pagination_bar)
         layout.addLayout(status_layout)
+        self.search_employees()
 
         action_layout = QHBoxLayout()
         action_layout.setSpacing(10)
@@ -650,68 +1036,50 @@ class ViewAllEmployeesDialog(QDialog):
 
         self.setLayout(layout)
 
-    def load_employees(self):
-        self.employees_table.setRowCount(0)
-        employees = self.db_helper.get_all_employees()
+    def fetch_employees_page(self, after_id, limit):
+        return self.db_helper.search_employees(self.search_input.text(), after_id, limit)
 
-        for row, emp in enumerate(employees):
-            self.employees_table.insertRow(row)
+    def load_employees(self):
+        self.show_employees(self.pager.reload())
 
-            id_item = QTableWidgetItem(emp['employee_id'])
-            id_item.setFont(QFont("Segoe UI", 10))
-            id_item.setForeground(QColor(ACCENT_BLUE))
-            self.employees_table.setItem(row, 0, id_item)
+    def show_employees(self, employees):
+        self.employees_model.set_records(employees)
 
-            name_item = QTableWidgetItem(emp['employee_name'])
-            name_item.setFont(QFont("Segoe UI", 10))
-            self.employees_table.setItem(row, 1, name_item)
+        if self.count_label:
+            self.count_label.setText(str(self.db_helper.count_employees(self.search_input.text())))
+        update_pagination_bar(self.pager, self.prev_btn, self.next_btn, self.page_label)
 
-            photos_widget = QWidget()
-            photos_layout = QHBoxLayout(photos_widget)
-            photos_layout.setSpacing(5)
-            photos_layout.setContentsMargins(5, 5, 5, 5)
-            
-            images = self.db_helper.get_employee_images(emp['employee_id'])
-            if images:
-                for i, img in enumerate(images[:3]):  
-                    if img is not None:
-                        rgb_image = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                        h, w, ch = rgb_image.shape
-                        bytes_per_line = ch * w
-                        qt_image = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
-                        pixmap = QPixmap.fromImage(qt_image)
-                        
-                   
-                        scaled_pixmap = pixmap.scaled(40, 40, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                        
-                        photo_label = QLabel()
-                        photo_label.setPixmap(scaled_pixmap)
-                        photo_label.setStyleSheet(f"border: 1px solid {ACCENT_BLUE}; border-radius: 3px;")
-                        photo_label.setCursor(Qt.PointingHandCursor)
-                        photo_label.mousePressEvent = lambda event, img_data=img, emp_name=emp['employee_name']: self.view_photo(img_data, emp_name)
-                        photos_layout.addWidget(photo_label)
-            
-            photos_layout.addStretch()
-            self.employees_table.setCellWidget(row, 2, photos_widget)
+        if self.last_selected_row >= 0 and self.last_selected_row < self.employees_model.rowCount():
+            self.employees_table.selectRow(self.last_selected_row)
 
-            checkbox = QCheckBox()
-            checkbox.setProperty("employee_id", emp['employee_id'])
-            self.employees_table.setCellWidget(row, 3, checkbox)
+    def on_thumbnail_clicked(self, row, position):
+        record = self.employees_model.record_at(row)
+        if record is None:
+            return
+        images = self.db_helper.get_employee_images(record['employee_id'])
+        if images and position < len(images) and images[position] is not None:
+            self.view_photo(images[position], record['employee_name'])
 
-        if self.count_label:
-            self.count_label.setText(str(len(employees)))
+    def next_page(self):
+        self.last_selected_row = -1
+        self.show_employees(self.pager.next())
 
-        if self.last_selected_row >= 0 and self.last_selected_row < self.employees_table.rowCount():
-            self.employees_table.selectRow(self.last_selected_row)
+    def previous_page(self):
+        self.last_selected_row = -1
+        self.show_employees(self.pager.previous())
 
     def view_photo(self, image_data, employee_name):
         dialog = ImageViewerDialog(self, image_data=image_data)
         dialog.setWindowTitle(f"Photo - {employee_name}")
         dialog.exec_()
 
+    def selected_row(self):
+        rows = self.employees_table.selectionModel().selectedRows()
+        return rows[0].row() if rows else -1
+
     def on_employee_selected(self):
-        if self.employees_table.currentRow() >= 0:
-            self.last_selected_row = self.employees_table.currentRow()
+        if self.selected_row() >= 0:
+            self.last_selected_row = self.selected_row()
             self.selected_employee = self.last_selected_row
             self.edit_btn.setEnabled(True)
             self.delete_btn.setEnabled(True)
@@ -721,78 +1089,18 @@ class ViewAllEmployeesDialog(QDialog):
             self.delete_btn.setEnabled(False)
 
     def search_employees(self):
-        search_text = self.search_input.text().lower().strip()
-        if not search_text:
-            self.load_employees()
-            return
-
-        self.employees_table.setRowCount(0)
-        employees = self.db_helper.get_all_employees()
-        count = 0
-
-        for emp in employees:
-            if search_text not in emp['employee_name'].lower() and search_text not in emp['employee_id'].lower():
-                continue
-
-            row = self.employees_table.rowCount()
-            self.employees_table.insertRow(row)
-
-            id_item = QTableWidgetItem(emp['employee_id'])
-            id_item.setForeground(QColor(ACCENT_BLUE))
-            self.employees_table.setItem(row, 0, id_item)
-
-            name_item = QTableWidgetItem(emp['employee_name'])
-            self.employees_table.setItem(row, 1, name_item)
-
-            # Photos
-            photos_widget = QWidget()
-            photos_layout = QHBoxLayout(photos_widget)
-            photos_layout.setSpacing(5)
-            photos_layout.setContentsMargins(5, 5, 5, 5)
-            
-            images = self.db_helper.get_employee_images(emp['employee_id'])
-            if images:
-                for i, img in enumerate(images[:3]):
-                    if img is not None:
-                        rgb_image = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                        h, w, ch = rgb_image.shape
-                        bytes_per_line = ch * w
-                        qt_image = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
-                        pixmap = QPixmap.fromImage(qt_image)
-                        scaled_pixmap = pixmap.scaled(40, 40, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                        
-                        photo_label = QLabel()
-                        photo_label.setPixmap(scaled_pixmap)
-                        photo_label.setStyleSheet(f"border: 1px solid {ACCENT_BLUE}; border-radius: 3px;")
-                        photo_label.setCursor(Qt.PointingHandCursor)
-                        photo_label.mousePressEvent = lambda event, img_data=img, emp_name=emp['employee_name']: self.view_photo(img_data, emp_name)
-                        photos_layout.addWidget(photo_label)
-            
-            photos_layout.addStretch()
-            self.employees_table.setCellWidget(row, 2, photos_widget)
-
-            checkbox = QCheckBox()
-            checkbox.setProperty("employee_id", emp['employee_id'])
-            self.employees_table.setCellWidget(row, 3, checkbox)
-            count += 1
-
-        if self.count_label:
-            self.count_label.setText(str(count))
+        self.search_timer.stop()
+        self.last_selected_row = -1
+        self.show_employees(self.pager.first())
 
     def clear_search(self):
         self.search_input.clear()
-        self.load_employees()
+        self.search_employees()
 
     def edit_selected_employee(self):
-        selected_count = 0
-        selected_employee = None
-        
-        for row in range(self.employees_table.rowCount()):
-            checkbox = self.employees_table.cellWidget(row, 3)
-            if checkbox and checkbox.isChecked():
-                selected_count += 1
-                if selected_count == 1:
-                    selected_employee = row
+        checked = self.employees_model.checked_records()
+        selected_count = len(checked)
+        selected_employee = checked[0] if checked else None
         
         if selected_count == 0:
             msg = QMessageBox(self)
@@ -833,22 +1141,23 @@ class ViewAllEmployeesDialog(QDialog):
             return
 
         if selected_employee is not None:
-            emp_id = self.employees_table.item(selected_employee, 0).text()
-            emp_name = self.employees_table.item(selected_employee, 1).text()
+            emp_id = selected_employee['employee_id']
+            emp_name = selected_employee['employee_name']
 
-            dialog = EditEmployeeDialog(self, self.db_helper, self.extractor, emp_id, emp_name)
+            dialog = EditEmployeeDialog(self, self.db_helper, self.rebuild_embeddings, emp_id, emp_name)
             if dialog.exec_() == QDialog.Accepted:
+                self.employees_model.invalidate_thumbnails(emp_id)
                 self.load_employees()
                 if self.on_update:
                     self.on_update()
 
     def delete_employee(self):
-        if self.employees_table.currentRow() < 0:
+        record = self.employees_model.record_at(self.selected_row())
+        if record is None:
             return
 
-        row = self.employees_table.currentRow()
-        emp_id = self.employees_table.item(row, 0).text()
-        emp_name = self.employees_table.item(row, 1).text()
+        emp_id = record['employee_id']
+        emp_name = record['employee_name']
 
         msg = QMessageBox(self)
         msg.setWindowTitle("Confirm Delete")
@@ -877,9 +1186,8 @@ class ViewAllEmployeesDialog(QDialog):
             self.db_helper.connection.commit()
             cursor.close()
 
-            if self.extractor:
-                self.extractor.embeddings_data = self.extractor.extract_embeddings_for_all_employees()
-                self.extractor.save_embeddings(self.extractor.embeddings_data)
+            if self.rebuild_embeddings:
+                self.rebuild_embeddings([emp_id])
 
             msg = QMessageBox(self)
             msg.setWindowTitle("Success")
@@ -987,9 +1295,125 @@ class DeadlineSettingsDialog(QDialog):
         self.accept()
 
 
+class ExportRangeDialog(QDialog):
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Export Attendance")
+        self.setMinimumSize(450, 300)
+        self.setStyleSheet(f"QDialog {{ background-color: {DARK_BG}; }}")
+        self.start_date = date.today()
+        self.end_date = date.today()
+        self._setup_ui()
+
+    def _setup_ui(self):
+        layout = QVBoxLayout()
+        layout.setSpacing(15)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        title = QLabel("Export Attendance Report")
+        title.setFont(QFont("Segoe UI", 14, QFont.Bold))
+        title.setAlignment(Qt.AlignCenter)
+        title.setStyleSheet(f"color: {TEXT_PRIMARY};")
+        layout.addWidget(title)
+
+        form_layout = QFormLayout()
+        from_label = QLabel("From:")
+        from_label.setStyleSheet(f"color: {TEXT_PRIMARY};")
+        self.from_edit = QDateEdit(QDate.currentDate())
+        self.from_edit.setCalendarPopup(True)
+        self.from_edit.setFont(QFont("Segoe UI", 11))
+        self.from_edit.setMinimumHeight(35)
+        form_layout.addRow(from_label, self.from_edit)
+
+        to_label = QLabel("To:")
+        to_label.setStyleSheet(f"color: {TEXT_PRIMARY};")
+        self.to_edit = QDateEdit(QDate.currentDate())
+        self.to_edit.setCalendarPopup(True)
+        self.to_edit.setFont(QFont("Segoe UI", 11))
+        self.to_edit.setMinimumHeight(35)
+        form_layout.addRow(to_label, self.to_edit)
+        layout.addLayout(form_layout)
+
+        presets_layout = QHBoxLayout()
+        for text, handler in (("Today", self.preset_today), ("This Month", self.preset_month),
+                              ("This Quarter", self.preset_quarter)):
+            preset_btn = QPushButton(text)
+            preset_btn.setFont(QFont("Segoe UI", 10))
+            preset_btn.setMinimumHeight(35)
+            preset_btn.setStyleSheet(f"""
+                QPushButton {{
+                    background-color: {DARK_TERTIARY};
+                    color: white;
+                    border: none;
+                    border-radius: 5px;
+                }}
+                QPushButton:hover {{ background-color: #4A4B4C; }}
+            """)
+            preset_btn.clicked.connect(handler)
+            presets_layout.addWidget(preset_btn)
+        layout.addLayout(presets_layout)
+
+        buttons_layout = QHBoxLayout()
+        export_btn = QPushButton("💾 Export")
+        export_btn.setFont(QFont("Segoe UI", 11, QFont.Bold))
+        export_btn.setMinimumHeight(40)
+        export_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {ACCENT_BLUE};
+                color: white;
+                border: none;
+                border-radius: 5px;
+            }}
+        """)
+        export_btn.clicked.connect(self.save_range)
+
+        cancel_btn = QPushButton("✕ Cancel")
+        cancel_btn.setFont(QFont("Segoe UI", 11, QFont.Bold))
+        cancel_btn.setMinimumHeight(40)
+        cancel_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {DARK_TERTIARY};
+                color: white;
+                border: none;
+                border-radius: 5px;
+            }}
+        """)
+        cancel_btn.clicked.connect(self.reject)
+
+        buttons_layout.addWidget(export_btn)
+        buttons_layout.addWidget(cancel_btn)
+        layout.addLayout(buttons_layout)
+        self.setLayout(layout)
+
+    def preset_today(self):
+        self.from_edit.setDate(QDate.currentDate())
+        self.to_edit.setDate(QDate.currentDate())
+
+    def preset_month(self):
+        today = QDate.currentDate()
+        self.from_edit.setDate(QDate(today.year(), today.month(), 1))
+        self.to_edit.setDate(today)
+
+    def preset_quarter(self):
+        today = QDate.currentDate()
+        first_month = ((today.month() - 1) // 3) * 3 + 1
+        self.from_edit.setDate(QDate(today.year(), first_month, 1))
+        self.to_edit.setDate(today)
+
+    def save_range(self):
+        start = self.from_edit.date()
+        end = self.to_edit.date()
+        if start > end:
+            start, end = end, start
+        self.start_date = date(start.year(), start.month(), start.day())
+        self.end_date = date(end.year(), end.month(), end.day())
+        self.accept()
+
+
 class AddEmployeeDialog(QDialog):
 
-    def __init__(self, parent=None, db_helper=None, extractor=None):
+    def __init__(self, parent=None, db_helper=None, rebuild_embeddings=None):
         super().__init__(parent)
         self.setWindowTitle("Add Employee")
         self.setMinimumSize(500, 420)
@@ -999,7 +1423,7 @@ class AddEmployeeDialog(QDialog):
             QMessageBox QLabel {{ color: {TEXT_PRIMARY}; }}
         """)
         self.db_helper = db_helper
-        self.extractor = extractor
+        self.rebuild_embeddings = rebuild_embeddings
         self.image_paths = [None, None, None]
         self._setup_ui()
 
@@ -1172,9 +1596,8 @@ class AddEmployeeDialog(QDialog):
         try:
             if self.db_helper.add_employee(emp_id, emp_name, self.image_paths[0], 
                                           self.image_paths[1], self.image_paths[2]):
-                if self.extractor:
-                    self.extractor.embeddings_data = self.extractor.extract_embeddings_for_all_employees()
-                    self.extractor.save_embeddings(self.extractor.embeddings_data)
+                if self.rebuild_embeddings:
+                    self.rebuild_embeddings([emp_id])
 
                 msg = QMessageBox(self)
                 msg.setWindowTitle("Success")
@@ -1214,7 +1637,7 @@ class AddEmployeeDialog(QDialog):
 
 class AttendanceSystemGUI(QMainWindow):
 
-    def __init__(self):
+    def __init__(self, engine=None):
         super().__init__()
         self.setWindowTitle("Employee Attendance System - Face Recognition")
         self.setGeometry(50, 50, 1400, 950)
@@ -1230,54 +1653,119 @@ class AttendanceSystemGUI(QMainWindow):
         self.stop_btn = None
         self.admin_btn = None
 
-        self.db_helper = DatabaseHelper(host="localhost", user="root", password="1234", database="attend")
-        if not self.db_helper.connect():
-            msg = QMessageBox(self)
-            msg.setWindowTitle("Error")
-            msg.setText("Failed to connect to database")
-            msg.setStyleSheet(f"""
-                QMessageBox {{ background-color: {DARK_BG}; }}
-                QMessageBox QLabel {{ color: {TEXT_PRIMARY}; }}
-                QPushButton {{ 
-                    color: {TEXT_PRIMARY}; 
-                    background-color: {ACCENT_BLUE};
-                    border: none;
-                    border-radius: 3px;
-                    padding: 5px;
-                    min-width: 50px;
-                }}
-            """)
-            msg.exec_()
-            sys.exit(1)
-
-        print("Loading face recognition model...")
-        self.extractor = InsightFaceEmbeddingExtractor(self.db_helper)
-        
-        self.embeddings_data = self.extractor.load_embeddings()
-        if self.embeddings_data is None or len(self.embeddings_data) == 0:
-            print("Extracting embeddings from database...")
-            self.embeddings_data = self.extractor.extract_embeddings_for_all_employees()
-            if self.embeddings_data and len(self.embeddings_data) > 0:
-                self.extractor.save_embeddings(self.embeddings_data)
-                print(f"Successfully extracted embeddings for {len(self.embeddings_data)} employees")
-            else:
-                print("Warning: No embeddings could be extracted from database!")
-                self.embeddings_data = {}
-        else:
-            print(f"Loaded embeddings for {len(self.embeddings_data)} employees")
-        
-        self.extractor.embeddings_data = self.embeddings_data
+        # The engine owns everything expensive (DB pool, model, gallery, ledger, jobs) and
+        # outlives this window, so restart_application only has to rebuild the widgets
+        self.engine = engine or AttendanceEngine()
+        self.db_helper = self.engine.db_helper
+        self.ledger = None
+        self.engine_ready = False
+        self.startup_timer = self.engine.startup_timer
+        self.engine_connections = []
+        self.restarting = False
 
-        self.session_daily_records = {}
         self.camera_thread = None
         self.status_timer = None
         self.deadline_time = time(12, 0)
         self.deadline_set = False
         self.admin_dialog = None
         self.current_table = None
+        self.export_thread = None
+        self.export_progress = None
+        self.attendance_pager = None
+        self.attendance_model = None
+        self.attendance_pagination = None
+        self.attendance_search_text = ""
+        self.attendance_search_timer = None
+        self.job_label = None
+        self.job_cancel_btn = None
+        self.admin_present_label = None
+        self.admin_absent_label = None
+
+        self.job_runner = self.engine.job_runner
 
         self.setup_ui()
         self.setup_timers()
+        self.startup_timer.mark("ui_built")
+
+        self.connect_engine(self.engine.status_changed, self.on_startup_status)
+        self.connect_engine(self.engine.database_ready, self.on_database_ready)
+        self.connect_engine(self.engine.engine_ready, self.on_engine_ready)
+        self.connect_engine(self.engine.startup_failed, self.on_startup_failed)
+        self.connect_engine(self.engine.gallery_changed, self.on_gallery_changed)
+        self.connect_engine(self.engine.profile_finished, self.on_profile_finished)
+        self.connect_engine(self.job_runner.job_progress, self.on_job_progress)
+        self.connect_engine(self.job_runner.job_failed, self.on_job_failed)
+        self.connect_engine(self.job_runner.job_cancelled, self.on_job_cancelled)
+
+        # The window is shown right away; on first start DB, model and gallery load in the
+        # background, after a restart the engine is usually ready already
+        self.recognition_label.setText(self.engine.startup_status)
+        self.recognition_label.setStyleSheet(f"color: {WARNING_ORANGE}; padding: 10px;")
+        if self.engine.database_loaded:
+            self.on_database_ready()
+        if self.engine.ready:
+            self.on_engine_ready()
+        if self.job_runner.is_running("embeddings"):
+            self.job_label.setText("Updating face gallery...")
+            self.job_cancel_btn.show()
+        self.engine.start()
+
+    def connect_engine(self, sig, slot):
+        sig.connect(slot)
+        self.engine_connections.append((sig, slot))
+
+    def detach_engine(self):
+        # Called when this window goes away; the engine keeps running for the next one
+        for sig, slot in self.engine_connections:
+            try:
+                sig.disconnect(slot)
+            except TypeError:
+                pass
+        self.engine_connections = []
+
+    def on_startup_status(self, text):
+        if not self.engine_ready:
+            self.recognition_label.setText(text)
+
+    def on_database_ready(self):
+        self.ledger = self.engine.ledger
+        self.admin_btn.setEnabled(True)
+        self.update_stats()
+
+    def on_engine_ready(self):
+        self.engine_ready = True
+        self.recognition_label.setText("Ready" if self.deadline_set else "Ready - admin must set deadline")
+        self.recognition_label.setStyleSheet(f"color: {SUCCESS_GREEN}; padding: 10px;")
+        self.update_start_button()
+
+    def on_startup_failed(self, phase, error):
+        msg = QMessageBox(self)
+        msg.setWindowTitle("Error")
+        if phase == "database":
+            msg.setText("Failed to connect to database")
+        elif phase == "embeddings":
+            msg.setText(f"Failed to extract face embeddings: {error}")
+        else:
+            msg.setText(f"Failed to load face recognition model: {error}")
+        msg.setStyleSheet(f"""
+            QMessageBox {{ background-color: {DARK_BG}; }}
+            QMessageBox QLabel {{ color: {TEXT_PRIMARY}; }}
+            QPushButton {{ 
+                color: {TEXT_PRIMARY}; 
+                background-color: {ACCENT_BLUE};
+                border: none;
+                border-radius: 3px;
+                padding: 5px;
+                min-width: 50px;
+            }}
+        """)
+        msg.exec_()
+        sys.exit(1)
+
+    def update_start_button(self):
+        running = self.camera_thread is not None and self.camera_thread.running
+        self.start_btn.setEnabled(self.engine_ready and self.deadline_set and not running
+                                  and not self.is_deadline_passed())
 
     def setup_ui(self):
         central_widget = QWidget()
@@ -1313,6 +1801,18 @@ class AttendanceSystemGUI(QMainWindow):
         self.camera_label.setStyleSheet(f"border: 2px solid {ACCENT_BLUE}; border-radius: 5px;")
         self.update_camera_icon()
         main_layout.addWidget(self.camera_label)
+        # Scaled RGB copy of the current frame, reused across repaints
+        self.display_buffers = ScratchBuffers()
+
+        # Optional per-stage latency overlay in the camera view's top-left corner
+        self.metrics_overlay = None
+        if self.engine.metrics.enabled and self.engine.settings['metrics']['overlay']:
+            self.metrics_overlay = QLabel(self.camera_label)
+            self.metrics_overlay.setFont(QFont("Consolas", 9))
+            self.metrics_overlay.setStyleSheet(
+                f"background-color: rgba(0, 0, 0, 160); color: {TEXT_PRIMARY}; padding: 6px;")
+            self.metrics_overlay.move(8, 8)
+            self.metrics_overlay.hide()
 
         self.recognition_label = QLabel("")
         self.recognition_label.setAlignment(Qt.AlignCenter)
@@ -1351,6 +1851,30 @@ class AttendanceSystemGUI(QMainWindow):
         stats_layout.addWidget(self.absent_label)
         main_layout.addLayout(stats_layout)
 
+        job_layout = QHBoxLayout()
+        self.job_label = QLabel("")
+        self.job_label.setFont(QFont("Segoe UI", 10))
+        self.job_label.setStyleSheet(f"color: {WARNING_ORANGE};")
+        self.job_cancel_btn = QPushButton("✕ Cancel")
+        self.job_cancel_btn.setFont(QFont("Segoe UI", 9, QFont.Bold))
+        self.job_cancel_btn.setMaximumWidth(100)
+        self.job_cancel_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {DARK_TERTIARY};
+                color: white;
+                border: none;
+                border-radius: 5px;
+                padding: 4px;
+            }}
+        """)
+        self.job_cancel_btn.clicked.connect(lambda: self.job_runner.cancel("embeddings"))
+        self.job_cancel_btn.hide()
+        job_layout.addStretch()
+        job_layout.addWidget(self.job_label)
+        job_layout.addWidget(self.job_cancel_btn)
+        job_layout.addStretch()
+        main_layout.addLayout(job_layout)
+
         buttons_layout = QHBoxLayout()
         buttons_layout.setSpacing(10)
 
@@ -1396,6 +1920,7 @@ class AttendanceSystemGUI(QMainWindow):
             }}
         """)
         self.admin_btn.clicked.connect(self.open_admin_panel)
+        self.admin_btn.setEnabled(False)
 
         buttons_layout.addWidget(self.start_btn)
         buttons_layout.addWidget(self.stop_btn)
@@ -1435,9 +1960,20 @@ class AttendanceSystemGUI(QMainWindow):
 
         return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
 
+    def update_metrics_overlay(self):
+        running = self.camera_thread is not None and self.camera_thread.running
+        if not running:
+            self.metrics_overlay.hide()
+            return
+        self.metrics_overlay.setText("\n".join(self.engine.metrics.format_lines()))
+        self.metrics_overlay.adjustSize()
+        self.metrics_overlay.show()
+
     def update_clock(self):
         now = datetime.now()
         self.clock_label.setText(f"{now.strftime('%H:%M:%S')} - {now.strftime('%d/%m/%Y')}")
+        if self.metrics_overlay is not None:
+            self.update_metrics_overlay()
 
         if self.deadline_set:
             if self.is_deadline_passed():
@@ -1452,44 +1988,40 @@ class AttendanceSystemGUI(QMainWindow):
             self.countdown_label.setText("No deadline set")
             self.countdown_label.setStyleSheet(f"color: {WARNING_ORANGE};")
 
-        if now.second == 0:
+        if self.ledger is None:
+            return
+        if self.ledger.ensure_current_day():
+            self.refresh_attendance_views()
+        elif now.second == 0:
             self.update_stats()
 
     def update_stats(self):
         # Check if UI elements are initialized
-        if not hasattr(self, 'present_label') or self.present_label is None:
+        if not hasattr(self, 'present_label') or self.present_label is None or self.ledger is None:
             return
-            
-        employees = self.db_helper.get_all_employees()
-        today = date.today()
-
-        present_count = 0
-        absent_count = 0
 
-        for emp in employees:
-            try:
-                cursor = self.db_helper.connection.cursor()
-                cursor.execute("""SELECT arrival_time FROM attendance 
-                               WHERE employee_id = %s AND attendance_date = %s""", 
-                             (emp['employee_id'], today))
-                result = cursor.fetchone()
-                cursor.close()
-
-                if result:
-                    present_count += 1
-                else:
-                    if self.is_deadline_passed():
-                        absent_count += 1
-            except:
-                pass
-
-        self.present_label.setText(f"Present: {present_count}")
+        self.present_label.setText(f"Present: {self.ledger.present_count()}")
         if self.is_deadline_passed():
-            self.absent_label.setText(f"Absent: {absent_count}")
+            self.absent_label.setText(f"Absent: {self.ledger.absent_count()}")
         else:
             self.absent_label.setText(f"Absent: 0")
 
+        if self.admin_present_label is not None and self.admin_dialog and self.admin_dialog.isVisible():
+            self.update_admin_stats(self.current_table, self.admin_present_label, self.admin_absent_label)
+
+    def refresh_attendance_views(self):
+        self.update_stats()
+        if self.admin_dialog and self.admin_dialog.isVisible():
+            self.populate_table_data(self.current_table)
+
+    def refresh_attendance(self):
+        self.ledger.refresh()
+        self.refresh_attendance_views()
+
     def start_recognition(self):
+        if not self.engine_ready:
+            return
+
         if not self.deadline_set:
             msg = QMessageBox(self)
             msg.setWindowTitle("No Deadline")
@@ -1528,25 +2060,20 @@ class AttendanceSystemGUI(QMainWindow):
             msg.exec_()
             return
 
-        self.session_daily_records = {}
-        employees = self.db_helper.get_all_employees()
-        today = date.today()
-
-        for emp in employees:
-            try:
-                cursor = self.db_helper.connection.cursor()
-                cursor.execute("""SELECT arrival_time FROM attendance 
-                               WHERE employee_id = %s AND attendance_date = %s""", 
-                             (emp['employee_id'], today))
-                result = cursor.fetchone()
-                cursor.close()
-                if result:
-                    self.session_daily_records[emp['employee_id']] = result[0]
-            except:
-                pass
-
-        self.camera_thread = InsightFaceCameraThread(self.extractor, self.embeddings_data, 
-                                                    self.session_daily_records)
+        self.ledger.ensure_current_day()
+        camera_settings = self.engine.settings['camera']
+        roi = roi_for_source(camera_settings['source'], camera_settings['roi_config'])
+        if camera_settings['transport'] == 'process':
+            self.camera_thread = ProcessCameraThread(
+                self.engine.settings, self.engine.embeddings_file, self.ledger,
+                camera_settings['source'], roi, self.engine.metrics)
+        else:
+            self.camera_thread = InsightFaceCameraThread(
+                self.engine.extractor, self.engine.embeddings_data, self.ledger,
+                AdaptiveDetectionController.from_settings(self.engine.settings['detection']),
+                FaceQualityGate.from_settings(self.engine.settings['quality']),
+                camera_settings['source'], roi, self.engine.metrics,
+                CaptureConfig.from_dict(camera_settings['capture']))
         self.camera_thread.frame_ready.connect(self.update_frame)
         self.camera_thread.face_recognized.connect(self.record_attendance)
         self.camera_thread.start()
@@ -1562,29 +2089,50 @@ class AttendanceSystemGUI(QMainWindow):
             self.camera_thread = None
 
         self.update_camera_icon()
-        self.start_btn.setEnabled(True if not self.is_deadline_passed() else False)
+        self.update_start_button()
         self.stop_btn.setEnabled(False)
         self.recognition_label.setText("Camera Stopped")
         self.recognition_label.setStyleSheet(f"color: {ERROR_RED}; padding: 10px;")
 
     def update_frame(self, frame):
         if self.is_deadline_passed():
+            if self.camera_thread:
+                self.camera_thread.release_frame(frame)
             self.stop_recognition()
             return
 
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_frame.shape
-        bytes_per_line = ch * w
-        qt_image = QImage(rgb_frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qt_image)
-        scaled = pixmap.scaled(self.camera_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.camera_label.setPixmap(scaled)
+        camera_thread = self.camera_thread
+        if camera_thread is None:
+            return
+        started = perf_time.perf_counter()
+        if camera_thread.paint(frame, self.render_frame):
+            self.startup_timer.first_frame()
+            self.engine.metrics.record('repaint', started)
+        camera_thread.frames_painted += 1
+
+    def render_frame(self, frame):
+        # Scale to the label, draw the ROI and convert to RGB inside one reused buffer: the
+        # one whole-frame copy between camera and screen in either transport. QPixmap.fromImage
+        # takes its own copy, so the buffer and the camera frame can be reused right after.
+        h, w = frame.shape[:2]
+        scale = min(self.camera_label.width() / w, self.camera_label.height() / h)
+        target_w, target_h = max(int(w * scale), 1), max(int(h * scale), 1)
+        display = self.display_buffers.get('display', (target_h, target_w, 3))
+        cv2.resize(frame, (target_w, target_h), dst=display,
+                   interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+        self.engine.metrics.incr('frame_copies')
+        if self.camera_thread.roi is not None:
+            self.camera_thread.roi.draw(display)
+        cv2.cvtColor(display, cv2.COLOR_BGR2RGB, dst=display)
+        qt_image = QImage(display.data, target_w, target_h, 3 * target_w, QImage.Format_RGB888)
+        self.camera_label.setPixmap(QPixmap.fromImage(qt_image))
 
     def record_attendance(self, employee_id, employee_name, similarity, face_info):
-        print(f"Face recognized: {employee_name} ({employee_id}) with similarity: {similarity:.3f}")
-        
+        log.info("Face recognized: %s (%s) with similarity %.3f", employee_name, employee_id, similarity)
+
         if self.db_helper.record_attendance(employee_id):
             arrival_time = datetime.now().strftime("%H:%M:%S")
+            self.ledger.mark_present(employee_id, arrival_time)
             self.recognition_label.setText(f"✓ Check-in Registered\n{employee_name}\n{arrival_time}")
             self.recognition_label.setStyleSheet(f"color: {SUCCESS_GREEN}; padding: 10px; font-weight: bold; font-size: 14px;")
 
@@ -1595,6 +2143,12 @@ class AttendanceSystemGUI(QMainWindow):
             self.status_timer.start(3000)
             self.update_stats()
 
+            if self.attendance_model is not None and self.admin_dialog and self.admin_dialog.isVisible():
+                self.attendance_model.update_record(employee_id, arrival_time=arrival_time, status="Present")
+        else:
+            # Let the camera report this employee again so the check-in can be retried
+            self.ledger.release_claim(employee_id)
+
     def clear_recognition(self):
         self.recognition_label.setText("Recognizing faces...")
         self.recognition_label.setStyleSheet(f"color: {SUCCESS_GREEN}; padding: 10px;")
@@ -1689,10 +2243,25 @@ class AttendanceSystemGUI(QMainWindow):
         """)
         deadline_btn.clicked.connect(self.open_deadline_settings)
 
+        refresh_btn = QPushButton("⟳ Refresh")
+        refresh_btn.setFont(QFont("Segoe UI", 10, QFont.Bold))
+        refresh_btn.setMinimumHeight(45)
+        refresh_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {DARK_TERTIARY};
+                color: white;
+                border: none;
+                border-radius: 8px;
+            }}
+            QPushButton:hover {{ background-color: #4A4B4C; }}
+        """)
+        refresh_btn.clicked.connect(self.refresh_attendance)
+
         buttons_layout.addWidget(add_btn)
         buttons_layout.addWidget(view_btn)
         buttons_layout.addWidget(delete_btn)
         buttons_layout.addWidget(deadline_btn)
+        buttons_layout.addWidget(refresh_btn)
         layout.addLayout(buttons_layout)
 
         search_layout = QHBoxLayout()
@@ -1712,7 +2281,11 @@ class AttendanceSystemGUI(QMainWindow):
             }}
             QLineEdit:focus {{ border: 2px solid {ACCENT_BLUE}; }}
         """)
-        search_input.textChanged.connect(lambda: self.search_attendance_records(table, search_input))
+        self.attendance_search_text = ""
+        self.attendance_pager = KeysetPager(self.fetch_attendance_page)
+        self.attendance_search_timer = create_debounce_timer(
+            lambda: self.search_attendance_records(table, search_input))
+        search_input.textChanged.connect(lambda: self.attendance_search_timer.start())
 
         clear_btn = QPushButton("✕ Clear")
         clear_btn.setFont(QFont("Segoe UI", 10, QFont.Bold))
@@ -1744,11 +2317,11 @@ class AttendanceSystemGUI(QMainWindow):
         date_label.setStyleSheet(f"color: {TEXT_SECONDARY};")
         layout.addWidget(date_label)
 
-        table = QTableWidget()
-        table.setColumnCount(5)
-        table.setHorizontalHeaderLabels(["Employee ID", "Name", "Arrival Time", "Status", "Select"])
+        table = QTableView()
+        self.attendance_model = AttendanceTableModel(table)
+        table.setModel(self.attendance_model)
         table.setStyleSheet(f"""
-            QTableWidget {{
+            QTableView {{
                 background-color: {DARK_SECONDARY};
                 color: {TEXT_PRIMARY};
                 gridline-color: {DARK_TERTIARY};
@@ -1759,10 +2332,13 @@ class AttendanceSystemGUI(QMainWindow):
                 padding: 8px;
                 font-weight: bold;
             }}
-            QTableWidget::item {{
+            QTableView::item {{
                 padding: 8px;
             }}
         """)
+        table.setItemDelegateForColumn(3, StatusDelegate(table))
+        table.setItemDelegateForColumn(4, CheckBoxDelegate(table))
+        table.verticalHeader().setVisible(False)
         table.horizontalHeader().setStretchLastSection(True)
         table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
         table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
@@ -1771,9 +2347,15 @@ class AttendanceSystemGUI(QMainWindow):
         table.horizontalHeader().setSectionResizeMode(4, QHeaderView.ResizeToContents)
 
         self.current_table = table
-        self.populate_table_data(table)
         layout.addWidget(table, 1)
 
+        pagination_bar, prev_btn, next_btn, page_label = create_pagination_bar(
+            lambda: self.show_attendance_rows(table, self.attendance_pager.previous()),
+            lambda: self.show_attendance_rows(table, self.attendance_pager.next()))
+        self.attendance_pagination = (prev_btn, next_btn, page_label)
+        layout.addLayout(pagination_bar)
+        self.show_attendance_rows(table, self.attendance_pager.first())
+
         stats_layout = QHBoxLayout()
         present_label = QLabel("Present: 0")
         present_label.setFont(QFont("Segoe UI", 10, QFont.Bold))
@@ -1799,6 +2381,8 @@ class AttendanceSystemGUI(QMainWindow):
         stats_layout.addWidget(absent_label)
         layout.addLayout(stats_layout)
 
+        self.admin_present_label = present_label
+        self.admin_absent_label = absent_label
         self.update_admin_stats(table, present_label, absent_label)
 
         export_layout = QHBoxLayout()
@@ -1831,8 +2415,37 @@ class AttendanceSystemGUI(QMainWindow):
         """)
         export_btn.clicked.connect(self.export_to_csv)
 
+        restart_btn = QPushButton("↻ Restart UI")
+        restart_btn.setFont(QFont("Segoe UI", 11, QFont.Bold))
+        restart_btn.setMinimumHeight(40)
+        restart_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {DARK_TERTIARY};
+                color: white;
+                border: none;
+                border-radius: 8px;
+            }}
+        """)
+        # Deferred so the admin dialog's exec_() loop unwinds before the window is replaced
+        restart_btn.clicked.connect(lambda: QTimer.singleShot(0, self.restart_application))
+
+        profile_btn = QPushButton("⏱ Capture Profile")
+        profile_btn.setFont(QFont("Segoe UI", 11, QFont.Bold))
+        profile_btn.setMinimumHeight(40)
+        profile_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {DARK_TERTIARY};
+                color: white;
+                border: none;
+                border-radius: 8px;
+            }}
+        """)
+        profile_btn.clicked.connect(self.capture_profile)
+
         export_layout.addWidget(clear_all_btn)
         export_layout.addStretch()
+        export_layout.addWidget(profile_btn)
+        export_layout.addWidget(restart_btn)
         export_layout.addWidget(export_btn)
         layout.addLayout(export_layout)
 
@@ -1853,148 +2466,42 @@ class AttendanceSystemGUI(QMainWindow):
         self.admin_dialog.setLayout(layout)
         self.admin_dialog.exec_()
 
-    def populate_table_data(self, table):
-        today = date.today()
-        employees = self.db_helper.get_all_employees()
+    def fetch_attendance_page(self, after_id, limit):
+        return self.ledger.search(self.attendance_search_text, after_id, limit,
+                                  include_absent=self.is_deadline_passed())
 
-        rows = []
-        for emp in employees:
-            try:
-                cursor = self.db_helper.connection.cursor()
-                cursor.execute("""SELECT arrival_time FROM attendance 
-                               WHERE employee_id = %s AND attendance_date = %s""", 
-                             (emp['employee_id'], today))
-                result = cursor.fetchone()
-                cursor.close()
-
-                if not self.is_deadline_passed():
-                    if result:
-                        rows.append((emp['employee_id'], emp['employee_name'], str(result[0]), "Present"))
-                else:
-                    if result:
-                        rows.append((emp['employee_id'], emp['employee_name'], str(result[0]), "Present"))
-                    else:
-                        rows.append((emp['employee_id'], emp['employee_name'], "-", "Absent"))
-            except:
-                pass
-
-        table.setRowCount(len(rows))
-
-        for row, (emp_id, emp_name, time_str, status) in enumerate(rows):
-            table.setItem(row, 0, QTableWidgetItem(emp_id))
-            table.setItem(row, 1, QTableWidgetItem(emp_name))
-            table.setItem(row, 2, QTableWidgetItem(time_str))
-
-            status_item = QTableWidgetItem(status)
-            if status == "Present":
-                status_item.setBackground(QColor(49, 162, 76))
-            else:
-                status_item.setBackground(QColor(228, 22, 58))
-            table.setItem(row, 3, status_item)
+    def populate_table_data(self, table):
+        if self.attendance_pager is None:
+            return
+        self.show_attendance_rows(table, self.attendance_pager.reload())
 
-            checkbox = QCheckBox()
-            checkbox.setProperty("employee_id", emp_id)
-            table.setCellWidget(row, 4, checkbox)
+    def show_attendance_rows(self, table, records):
+        table.model().set_records(records)
+        update_pagination_bar(self.attendance_pager, *self.attendance_pagination)
 
     def update_admin_stats(self, table, present_label, absent_label):
-        today = date.today()
-        employees = self.db_helper.get_all_employees()
-
-        present_count = 0
-        absent_count = 0
-
-        for emp in employees:
-            try:
-                cursor = self.db_helper.connection.cursor()
-                cursor.execute("""SELECT arrival_time FROM attendance 
-                               WHERE employee_id = %s AND attendance_date = %s""", 
-                             (emp['employee_id'], today))
-                result = cursor.fetchone()
-                cursor.close()
-
-                if result:
-                    present_count += 1
-                else:
-                    if self.is_deadline_passed():
-                        absent_count += 1
-            except:
-                pass
-
-        present_label.setText(f"Present: {present_count}")
+        present_label.setText(f"Present: {self.ledger.present_count()}")
         if self.is_deadline_passed():
-            absent_label.setText(f"Absent: {absent_count}")
+            absent_label.setText(f"Absent: {self.ledger.absent_count()}")
         else:
             absent_label.setText(f"Absent: 0")
 
     def search_attendance_records(self, table, search_input):
-        search_text = search_input.text().lower().strip()
-        if not search_text:
-            self.populate_table_data(table)
-            return
-
-        today = date.today()
-        employees = self.db_helper.get_all_employees()
-
-        rows = []
-        for emp in employees:
-            if search_text not in emp['employee_name'].lower() and search_text not in emp['employee_id'].lower():
-                continue
-
-            try:
-                cursor = self.db_helper.connection.cursor()
-                cursor.execute("""SELECT arrival_time FROM attendance 
-                               WHERE employee_id = %s AND attendance_date = %s""", 
-                             (emp['employee_id'], today))
-                result = cursor.fetchone()
-                cursor.close()
-
-                if not self.is_deadline_passed():
-                    if result:
-                        rows.append((emp['employee_id'], emp['employee_name'], str(result[0]), "Present"))
-                else:
-                    if result:
-                        rows.append((emp['employee_id'], emp['employee_name'], str(result[0]), "Present"))
-                    else:
-                        rows.append((emp['employee_id'], emp['employee_name'], "-", "Absent"))
-            except:
-                pass
-
-        table.setRowCount(len(rows))
-
-        for row, (emp_id, emp_name, time_str, status) in enumerate(rows):
-            table.setItem(row, 0, QTableWidgetItem(emp_id))
-            table.setItem(row, 1, QTableWidgetItem(emp_name))
-            table.setItem(row, 2, QTableWidgetItem(time_str))
-
-            status_item = QTableWidgetItem(status)
-            if status == "Present":
-                status_item.setBackground(QColor(49, 162, 76))
-            else:
-                status_item.setBackground(QColor(228, 22, 58))
-            table.setItem(row, 3, status_item)
-
-            checkbox = QCheckBox()
-            checkbox.setProperty("employee_id", emp_id)
-            table.setCellWidget(row, 4, checkbox)
+        self.attendance_search_timer.stop()
+        self.attendance_search_text = search_input.text()
+        self.show_attendance_rows(table, self.attendance_pager.first())
 
     def clear_search_attendance(self, table, search_input):
         search_input.clear()
-        self.populate_table_data(table)
+        self.search_attendance_records(table, search_input)
 
     def delete_selected_records(self):
         if not self.current_table:
             return
 
-        selected = []
-        employee_names = []
-        
-        for row in range(self.current_table.rowCount()):
-            checkbox = self.current_table.cellWidget(row, 4)
-            if checkbox and checkbox.isChecked():
-                emp_id = self.current_table.item(row, 0).text()
-                emp_name = self.current_table.item(row, 1).text()
-                selected.append(emp_id)
-                employee_names.append(emp_name)
+        checked = self.current_table.model().checked_records()
+        selected = [record['employee_id'] for record in checked]
+        employee_names = [record['employee_name'] for record in checked]
 
         if not selected:
             msg = QMessageBox(self.admin_dialog)
@@ -2044,6 +2551,7 @@ class AttendanceSystemGUI(QMainWindow):
                              (emp_id, today))
             self.db_helper.connection.commit()
             cursor.close()
+            self.ledger.remove(selected)
 
             msg = QMessageBox(self.admin_dialog)
             msg.setWindowTitle("Success")
@@ -2063,17 +2571,6 @@ class AttendanceSystemGUI(QMainWindow):
             msg.exec_()
             
             self.populate_table_data(self.current_table)
-            
-            for i in range(self.admin_dialog.layout().count()):
-                item = self.admin_dialog.layout().itemAt(i)
-                if isinstance(item, QHBoxLayout):
-                    if item.count() >= 2:
-                        widget1 = item.itemAt(0).widget()
-                        widget2 = item.itemAt(1).widget()
-                        if isinstance(widget1, QLabel) and "Present" in widget1.text() and isinstance(widget2, QLabel) and "Absent" in widget2.text():
-                            self.update_admin_stats(self.current_table, widget1, widget2)
-                            break
-            
             self.update_stats()
                 
         except Exception as e:
@@ -2122,6 +2619,7 @@ class AttendanceSystemGUI(QMainWindow):
             cursor.execute("DELETE FROM attendance")
             self.db_helper.connection.commit()
             cursor.close()
+            self.ledger.clear()
         
             self.deadline_set = False
             self.deadline_time = time(12, 0)
@@ -2170,22 +2668,30 @@ class AttendanceSystemGUI(QMainWindow):
             msg.exec_()
 
     def restart_application(self):
+        # Rebuilds only the window; the engine keeps its DB pool, model sessions and gallery
+        started = perf_time.perf_counter()
         try:
-            # Clean up resources properly
-            if hasattr(self, 'camera_thread') and self.camera_thread:
+            if self.admin_dialog and self.admin_dialog.isVisible():
+                self.admin_dialog.reject()
+            if self.camera_thread:
                 self.camera_thread.stop()
                 self.camera_thread = None
-            
-            if hasattr(self, 'clock_timer') and self.clock_timer:
-                self.clock_timer.stop()
-            
-            if hasattr(self, 'db_helper') and self.db_helper:
-                self.db_helper.disconnect()
-            
-            # Create new instance
-            new_window = AttendanceSystemGUI()
+
+            new_window = AttendanceSystemGUI(engine=self.engine)
+            if self.deadline_set:
+                new_window.deadline_time = self.deadline_time
+                new_window.deadline_set = True
+                new_window.update_clock()
+                new_window.update_start_button()
+            # Show the new window before closing this one so Qt never sees zero windows and quits
             new_window.show()
-            
+            # Keep a reference so the new window is not garbage collected
+            QApplication.instance().main_window = new_window
+
+            self.restarting = True
+            self.close()
+            print(f"[restart] UI rebuilt in {(perf_time.perf_counter() - started) * 1000:.0f} ms")
+
         except Exception as e:
             print(f"Error during restart: {e}")
             # Fallback: show error message and exit
@@ -2194,14 +2700,58 @@ class AttendanceSystemGUI(QMainWindow):
             msg.setText(f"Failed to restart application: {str(e)}")
             msg.exec_()
 
+    def rebuild_embeddings(self, employee_ids=None):
+        if self.engine.rebuild_embeddings(employee_ids):
+            self.job_label.setText("Updating face gallery...")
+            self.job_cancel_btn.show()
+
+    def on_job_progress(self, name, done, total):
+        if name == "embeddings" and total:
+            self.job_label.setText(f"Updating face gallery... {done}/{total}")
+
+    def on_gallery_changed(self, result):
+        if self.camera_thread:
+            self.camera_thread.set_embeddings(result)
+        self.job_label.setText(f"Face gallery updated ({len(result)} employees)")
+        self.job_cancel_btn.hide()
+        QTimer.singleShot(5000, lambda: self.job_label.setText("")
+                          if not self.job_runner.is_running("embeddings") else None)
+
+    def on_job_failed(self, name, error):
+        self.job_label.setText(f"Gallery update failed: {error}")
+        self.job_cancel_btn.hide()
+
+    def on_job_cancelled(self, name):
+        if not self.job_runner.is_running(name):
+            self.job_label.setText("Gallery update cancelled")
+            self.job_cancel_btn.hide()
+
+    def capture_profile(self):
+        capture = self.engine.capture_profile()
+        if capture is None:
+            if active_capture() is not None:
+                QMessageBox.information(self.admin_dialog, "Profiling", "A profile is already being captured.")
+            else:
+                QMessageBox.warning(self.admin_dialog, "Profiling",
+                                    "Could not start profiling; see the log for details.")
+            return
+        self.job_label.setText(f"Profiling for {capture.duration:.0f} s...")
+        QMessageBox.information(self.admin_dialog, "Profiling",
+                                f"Profiling the running system for {capture.duration:.0f} seconds.\n"
+                                f"Results will be written to {capture.stem}.*")
+
+    def on_profile_finished(self, summary_path):
+        self.job_label.setText(f"Profile saved: {summary_path}")
+        QTimer.singleShot(10000, lambda: self.job_label.setText("")
+                          if self.job_label.text().startswith("Profile saved") else None)
+
     def add_new_employee(self):
-        dialog = AddEmployeeDialog(self.admin_dialog, self.db_helper, self.extractor)
+        dialog = AddEmployeeDialog(self.admin_dialog, self.db_helper, self.rebuild_embeddings)
         if dialog.exec_() == QDialog.Accepted:
-            self.embeddings_data = self.extractor.embeddings_data
-            self.populate_table_data(self.current_table)
+            self.refresh_attendance()
 
     def view_all_employees(self):
-        dialog = ViewAllEmployeesDialog(self.admin_dialog, self.db_helper, self.extractor, self.update_stats)
+        dialog = ViewAllEmployeesDialog(self.admin_dialog, self.db_helper, self.rebuild_embeddings, self.refresh_attendance)
         dialog.exec_()
 
     def open_deadline_settings(self):
@@ -2209,90 +2759,110 @@ class AttendanceSystemGUI(QMainWindow):
         if dialog.exec_() == QDialog.Accepted:
             self.deadline_time = dialog.deadline_time
             self.deadline_set = True
-            self.start_btn.setEnabled(True)
+            self.update_start_button()
             self.update_clock()
             self.update_stats()
 
     def export_to_csv(self):
+        range_dialog = ExportRangeDialog(self.admin_dialog)
+        if range_dialog.exec_() != QDialog.Accepted:
+            return
+
+        start_date, end_date = range_dialog.start_date, range_dialog.end_date
+        default_name = (f"attendance_{start_date}.csv" if start_date == end_date
+                        else f"attendance_{start_date}_to_{end_date}.csv")
         file_path, _ = QFileDialog.getSaveFileName(
-            self.admin_dialog, "Save Report", f"attendance_{date.today()}.csv", "CSV Files (*.csv)"
+            self.admin_dialog, "Save Report", default_name, "CSV Files (*.csv)"
         )
 
         if not file_path:
             return
 
-        try:
-            employees = self.db_helper.get_all_employees()
-            today = date.today()
+        self.export_progress = QProgressDialog("Exporting attendance...", "Cancel", 0, 0, self.admin_dialog)
+        self.export_progress.setWindowTitle("Export")
+        self.export_progress.setWindowModality(Qt.WindowModal)
+        self.export_progress.setMinimumDuration(0)
 
-            with open(file_path, 'w', newline='', encoding='utf-8-sig') as f:
-                writer = csv.writer(f)
-                writer.writerow(["Employee ID", "Name", "Arrival Time", "Status"])
-
-                for emp in employees:
-                    try:
-                        cursor = self.db_helper.connection.cursor()
-                        cursor.execute("""SELECT arrival_time FROM attendance 
-                                       WHERE employee_id = %s AND attendance_date = %s""", 
-                                     (emp['employee_id'], today))
-                        result = cursor.fetchone()
-                        cursor.close()
-
-                        if result:
-                            writer.writerow([emp['employee_id'], emp['employee_name'], str(result[0]), "Present"])
-                        else:
-                            if self.is_deadline_passed():
-                                writer.writerow([emp['employee_id'], emp['employee_name'], "-", "Absent"])
-                    except:
-                        pass
+        self.export_thread = AttendanceExportThread(self.db_helper, file_path, start_date, end_date,
+                                                    self.is_deadline_passed())
+        self.export_thread.progress.connect(self.on_export_progress)
+        self.export_thread.export_finished.connect(self.on_export_finished)
+        self.export_progress.canceled.connect(self.export_thread.cancel)
+        self.export_thread.start()
 
-            msg = QMessageBox(self.admin_dialog)
-            msg.setWindowTitle("Success")
-            msg.setText("Report exported successfully!")
-            msg.setStyleSheet(f"""
-                QMessageBox {{ background-color: {DARK_BG}; }}
-                QMessageBox QLabel {{ color: {TEXT_PRIMARY}; }}
-                QPushButton {{ 
-                    color: {TEXT_PRIMARY}; 
-                    background-color: {ACCENT_BLUE};
-                    border: none;
-                    border-radius: 3px;
-                    padding: 5px;
-                    min-width: 50px;
-                }}
-            """)
-            msg.exec_()
-        except Exception as e:
-            msg = QMessageBox(self.admin_dialog)
-            msg.setWindowTitle("Error")
-            msg.setText(str(e))
-            msg.setStyleSheet(f"""
-                QMessageBox {{ background-color: {DARK_BG}; }}
-                QMessageBox QLabel {{ color: {TEXT_PRIMARY}; }}
-                QPushButton {{ 
-                    color: {TEXT_PRIMARY}; 
-                    background-color: {ACCENT_BLUE};
-                    border: none;
-                    border-radius: 3px;
-                    padding: 5px;
-                    min-width: 50px;
-                }}
-            """)
-            msg.exec_()
+    def on_export_progress(self, done, total):
+        if self.export_progress is None:
+            return
+        self.export_progress.setMaximum(max(total, 1))
+        self.export_progress.setValue(min(done, max(total, 1)))
+        self.export_progress.setLabelText(f"Exporting attendance... {done}/{total} employees")
+
+    def on_export_finished(self, ok, rows_written, error):
+        if self.export_progress is not None:
+            self.export_progress.reset()
+            self.export_progress = None
+        self.export_thread = None
+
+        parent = self.admin_dialog if self.admin_dialog and self.admin_dialog.isVisible() else self
+        msg = QMessageBox(parent)
+        msg.setWindowTitle("Success" if ok else "Error")
+        msg.setText(f"Report exported successfully!\n{rows_written} rows written." if ok else error)
+        msg.setStyleSheet(f"""
+            QMessageBox {{ background-color: {DARK_BG}; }}
+            QMessageBox QLabel {{ color: {TEXT_PRIMARY}; }}
+            QPushButton {{ 
+                color: {TEXT_PRIMARY}; 
+                background-color: {ACCENT_BLUE};
+                border: none;
+                border-radius: 3px;
+                padding: 5px;
+                min-width: 50px;
+            }}
+        """)
+        msg.exec_()
 
     def closeEvent(self, event):
+        self.detach_engine()
+        if self.export_thread:
+            self.export_thread.cancel()
+            self.export_thread.wait()
         if self.camera_thread:
             self.camera_thread.stop()
+            self.camera_thread = None
         self.clock_timer.stop()
-        self.db_helper.disconnect()
+        if self.status_timer:
+            self.status_timer.stop()
+        if not self.restarting:
+            self.engine.shutdown()
         event.accept()
 
 
 def main():
-    app = QApplication(sys.argv)
-    window = AttendanceSystemGUI()
+    parser = argparse.ArgumentParser(description="Face recognition attendance kiosk")
+    parser.add_argument('--profile', type=float, metavar='SECONDS',
+                        help="capture a profile of all threads for this many seconds")
+    parser.add_argument('--profile-delay', type=float, default=0, metavar='SECONDS',
+                        help="wait this long after the window opens before profiling")
+    args, qt_args = parser.parse_known_args()
+
+    settings = load_settings()
+    log_listener = setup_logging(settings['logging'])
+    app = QApplication(sys.argv[:1] + qt_args)
+    engine = AttendanceEngine(settings=settings)
+    window = AttendanceSystemGUI(engine)
+    app.main_window = window
     window.show()
-    sys.exit(app.exec_())
+    window.startup_timer.mark("window_shown")
+
+    if hasattr(signal, 'SIGUSR1'):
+        # `kill -USR1 <pid>` profiles a running kiosk. Python runs the handler the next
+        # time the event loop calls into Python, at the latest on the one-second clock tick.
+        signal.signal(signal.SIGUSR1, lambda signum, frame: engine.capture_profile())
+    if args.profile:
+        QTimer.singleShot(int(args.profile_delay * 1000), lambda: engine.capture_profile(args.profile))
+    exit_code = app.exec_()
+    log_listener.stop()
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,169 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+from database_helper import DatabaseHelper
+from startup_loader import StartupLoader, StartupTimer
+from background_jobs import JobRunner
+from app_settings import load_settings
+from pipeline_metrics import PipelineMetrics
+from metrics_exporter import MetricsExporter
+from profiling import start_capture
+from app_logging import get_logger
+
+log = get_logger('engine')
+
+DB_POOL_SIZE = 5
+
+
+class AttendanceEngine(QObject):
+    status_changed = pyqtSignal(str)
+    database_ready = pyqtSignal()
+    engine_ready = pyqtSignal()
+    startup_failed = pyqtSignal(str, str)
+    gallery_changed = pyqtSignal(object)
+    profile_finished = pyqtSignal(str)
+
+    # Application-scoped state: the DB connection pool, the ONNX model sessions, the
+    # face gallery, today's ledger and the background job runner. It is created once
+    # per process; restarting the UI builds a new window around the same engine.
+
+    def __init__(self, db_helper=None, embeddings_file='embeddings_insightface.pkl', settings=None):
+        super().__init__()
+        self.settings = settings or load_settings()
+        self.metrics = PipelineMetrics.from_settings(self.settings['metrics'])
+        self.exporter = MetricsExporter.from_settings(self.metrics, self.settings['metrics'])
+        self.db_helper = db_helper or DatabaseHelper(host="localhost", user="root", password="1234",
+                                                     database="attend", pool_size=DB_POOL_SIZE)
+        self.db_helper.metrics = self.metrics
+        self.embeddings_file = embeddings_file
+        self.extractor = None
+        self.embeddings_data = {}
+        self.ledger = None
+        self.database_loaded = False
+        self.ready = False
+        self.startup_status = "Starting up... connecting to database and loading model"
+        self.startup_timer = StartupTimer()
+        self.startup_loader = None
+
+        self.job_runner = JobRunner()
+        self.job_runner.job_finished.connect(self.on_job_finished)
+        self.job_runner.job_failed.connect(self.on_job_failed)
+        self.inflight_rebuild = None
+        self.rebuild_generation = 0
+        self.deferred_rebuild = None
+
+    def start(self):
+        if self.startup_loader is not None:
+            return
+        self.startup_loader = StartupLoader(self.db_helper, self.embeddings_file, timer=self.startup_timer,
+                                            settings=self.settings)
+        self.startup_loader.status_changed.connect(self.on_startup_status)
+        self.startup_loader.phase_finished.connect(self.on_startup_phase)
+        self.startup_loader.database_ready.connect(self.on_database_ready)
+        self.startup_loader.engine_ready.connect(self.on_engine_ready)
+        self.startup_loader.startup_failed.connect(self.startup_failed)
+        self.startup_loader.start()
+        if self.exporter is not None:
+            self.exporter.start()
+
+    def on_startup_status(self, text):
+        self.startup_status = text
+        self.status_changed.emit(text)
+
+    def on_startup_phase(self, name, elapsed_ms):
+        if name == "embeddings":
+            self.metrics.set_gauge('embedding_store_load_seconds', elapsed_ms / 1000)
+        elif name == "model":
+            self.metrics.set_gauge('model_load_seconds', elapsed_ms / 1000)
+
+    def on_database_ready(self, db_helper, ledger):
+        self.ledger = ledger
+        self.database_loaded = True
+        self.database_ready.emit()
+
+    def on_engine_ready(self, extractor, embeddings_data):
+        self.extractor = extractor
+        self.embeddings_data = embeddings_data
+        self.ready = True
+        self.metrics.set_gauge('gallery_size', len(embeddings_data))
+        log.info("Loaded embeddings for %d employees", len(embeddings_data))
+        self.engine_ready.emit()
+
+        if self.deferred_rebuild is not None:
+            full, employee_ids = self.deferred_rebuild
+            self.deferred_rebuild = None
+            self.rebuild_embeddings(None if full else employee_ids)
+
+    def rebuild_embeddings(self, employee_ids=None):
+        # employee_ids=None rebuilds the whole gallery; otherwise only those employees are
+        # re-extracted. A job still running is superseded and its work folded into this one.
+        # Returns False when the request was deferred until the model has loaded.
+        full = employee_ids is None
+        employee_ids = set(employee_ids or ())
+        if not self.ready:
+            # Admin changes made while the model is still loading are applied once it is ready
+            if self.deferred_rebuild is not None:
+                full = full or self.deferred_rebuild[0]
+                employee_ids |= self.deferred_rebuild[1]
+            self.deferred_rebuild = (full, employee_ids)
+            return False
+        # Until a rebuild's result has been applied its work is folded into the next one,
+        # even if the job has already finished and only its signal is still queued
+        if self.inflight_rebuild:
+            full = full or self.inflight_rebuild[0]
+            employee_ids |= self.inflight_rebuild[1]
+        self.inflight_rebuild = (full, employee_ids)
+        self.rebuild_generation += 1
+        generation = self.rebuild_generation
+        base = self.embeddings_data
+        extractor = self.extractor
+
+        def run_rebuild(job):
+            worker_db = self.db_helper.clone()
+            if worker_db is None:
+                raise RuntimeError("Failed to connect to database")
+            try:
+                if full:
+                    data = extractor.extract_embeddings_for_all_employees(
+                        db_helper=worker_db, progress_callback=job.report_progress,
+                        cancel_check=lambda: job.cancelled)
+                else:
+                    job.report_progress(0, len(employee_ids))
+                    data = extractor.update_embeddings_for_employees(base, employee_ids, db_helper=worker_db)
+                job.check_cancelled()
+                extractor.save_embeddings(data, self.embeddings_file)
+                return generation, data
+            finally:
+                worker_db.disconnect()
+
+        self.job_runner.submit("embeddings", run_rebuild)
+        return True
+
+    def on_job_finished(self, name, result):
+        if name != "embeddings" or result is None:
+            return
+        generation, result = result
+        # A superseded job that still finished is applied, but the newer job's work stays pending
+        if generation == self.rebuild_generation:
+            self.inflight_rebuild = None
+        self.embeddings_data = result
+        self.extractor.embeddings_data = result
+        self.metrics.set_gauge('gallery_size', len(result))
+        self.gallery_changed.emit(result)
+
+    def on_job_failed(self, name, error):
+        # Cancelled jobs keep their work pending: they were superseded or the app is closing
+        if name == "embeddings" and not self.job_runner.is_running(name):
+            self.inflight_rebuild = None
+
+    def capture_profile(self, duration=None):
+        # Profiles the live process (camera, GUI, DB and worker threads) without
+        # stopping anything. Returns the capture, or None if one is already running.
+        profiling_settings = self.settings['profiling']
+        return start_capture(duration or profiling_settings['duration_s'], profiling_settings['output_dir'],
+                             profiling_settings['interval_ms'] / 1000,
+                             on_finished=lambda capture: self.profile_finished.emit(capture.summary_path))
+
+    def shutdown(self):
+        if self.exporter is not None:
+            self.exporter.stop()
+        self.job_runner.shutdown()
+        self.db_helper.disconnect()
@@ -0,0 +1,87 @@
+import os
+import csv
+from contextlib import closing
+from datetime import date, timedelta
+from mysql.connector import Error
+
+
+CSV_HEADER = ["Date", "Employee ID", "Name", "Arrival Time", "Status"]
+
+
+def export_attendance_range(db_helper, file_path, start_date, end_date, include_today_absent=True,
+                            progress_callback=None, cancel_check=None):
+
+    # Rows arrive ordered by (employee_id, attendance_date), so absent days can be filled
+    # in while walking each employee's rows without holding more than one employee in memory.
+    # No one is absent before the day they were added. The CSV is written next to
+    # file_path and only moved there once complete, so a cancelled or failed export
+    # never leaves a partial file under the chosen name.
+    today = date.today()
+    absent_until = min(end_date, today) if include_today_absent else min(end_date, today - timedelta(days=1))
+    total = db_helper.count_active_employees()
+    done = 0
+    rows_written = 0
+    tmp_path = file_path + '.tmp'
+
+    try:
+        # closing(): on cancel the generator is closed right away, which discards the rest
+        # of the unbuffered result so the connection can be used again
+        with open(tmp_path, 'w', newline='', encoding='utf-8-sig') as f, \
+                closing(db_helper.iter_attendance_range(start_date, end_date)) as attendance_rows:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADER)
+
+            current_id = None
+            current_name = None
+            first_day = start_date
+            next_day = start_date
+
+            def write_absent_until(last_day):
+                nonlocal next_day, rows_written
+                while next_day <= last_day:
+                    if first_day <= next_day <= absent_until:
+                        writer.writerow([next_day.isoformat(), current_id, current_name, "-", "Absent"])
+                        rows_written += 1
+                    next_day += timedelta(days=1)
+
+            for emp_id, emp_name, created_date, attendance_date, arrival_time, status in attendance_rows:
+                if emp_id != current_id:
+                    if current_id is not None:
+                        write_absent_until(end_date)
+                        done += 1
+                        if progress_callback and done % 50 == 0:
+                            progress_callback(done, total)
+                        if cancel_check and cancel_check():
+                            return False, rows_written
+                    current_id = emp_id
+                    current_name = emp_name
+                    first_day = max(start_date, created_date) if created_date else start_date
+                    next_day = first_day
+
+                if attendance_date is None:
+                    continue
+
+                write_absent_until(attendance_date - timedelta(days=1))
+                writer.writerow([attendance_date.isoformat(), emp_id, emp_name, str(arrival_time),
+                                 status or "Present"])
+                rows_written += 1
+                next_day = max(next_day, attendance_date + timedelta(days=1))
+
+            if current_id is not None:
+                write_absent_until(end_date)
+                done += 1
+
+        os.replace(tmp_path, file_path)
+        if progress_callback:
+            progress_callback(done, total)
+        print(f"Exported {rows_written} attendance rows ({start_date} to {end_date}) to {file_path}")
+        return True, rows_written
+    except (Error, OSError) as e:
+        print(f"Error exporting attendance: {e}")
+        return False, rows_written
+    finally:
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError as e:
+                print(f"Error removing {tmp_path}: {e}")
@@ -0,0 +1,128 @@
+import threading
+from bisect import bisect_right
+from datetime import date
+from app_logging import get_logger
+
+log = get_logger('ledger')
+
+
+class DailyAttendanceLedger:
+
+    # In-memory view of today's attendance. Loaded with one bulk query per day and then
+    # kept current by the check-ins the app itself writes, so the stats labels, the
+    # camera de-duplication and the admin table never poll the database.
+
+    def __init__(self, db_helper):
+
+        self.db_helper = db_helper
+        self.lock = threading.RLock()
+        self.day = None
+        self.names = {}
+        self.sorted_ids = []
+        self.search_keys = {}
+        self.arrivals = {}
+        self.claimed = set()
+
+    def load(self, day=None):
+
+        day = day or date.today()
+        report = self.db_helper.get_daily_attendance(day)
+        with self.lock:
+            self.day = day
+            self.names = {row['employee_id']: row['employee_name'] for row in report}
+            self.sorted_ids = sorted(self.names)
+            self.search_keys = {emp_id: (emp_id.lower(), name.lower()) for emp_id, name in self.names.items()}
+            self.arrivals = {row['employee_id']: row['arrival_time'] for row in report
+                             if row['status'] == 'Present'}
+            self.claimed = set()
+        log.info("Attendance ledger loaded for %s: %d/%d present", day, len(self.arrivals), len(self.names))
+
+    def refresh(self):
+
+        self.load(date.today())
+
+    def ensure_current_day(self):
+
+        # Returns True when the day rolled over and the ledger was reloaded
+        if self.day == date.today():
+            return False
+        self.load(date.today())
+        return True
+
+    def __contains__(self, employee_id):
+
+        with self.lock:
+            return employee_id in self.arrivals or employee_id in self.claimed
+
+    def claim(self, employee_id):
+
+        # Called from the camera thread: True only for the first sighting of the day
+        with self.lock:
+            if employee_id in self.arrivals or employee_id in self.claimed:
+                return False
+            self.claimed.add(employee_id)
+            return True
+
+    def release_claim(self, employee_id):
+
+        with self.lock:
+            self.claimed.discard(employee_id)
+
+    def mark_present(self, employee_id, arrival_time):
+
+        with self.lock:
+            self.arrivals[employee_id] = arrival_time
+            self.claimed.discard(employee_id)
+
+    def remove(self, employee_ids):
+
+        with self.lock:
+            for employee_id in employee_ids:
+                self.arrivals.pop(employee_id, None)
+                self.claimed.discard(employee_id)
+
+    def clear(self):
+
+        with self.lock:
+            self.arrivals = {}
+            self.claimed = set()
+
+    def present_count(self):
+
+        with self.lock:
+            return sum(1 for employee_id in self.arrivals if employee_id in self.names)
+
+    def absent_count(self):
+
+        with self.lock:
+            return len(self.names) - self.present_count()
+
+    def _record(self, employee_id):
+
+        arrival_time = self.arrivals.get(employee_id)
+        return {
+            'employee_id': employee_id,
+            'employee_name': self.names[employee_id],
+            'arrival_time': arrival_time if arrival_time is not None else '-',
+            'status': 'Present' if arrival_time is not None else 'Absent'
+        }
+
+    def search(self, search_text='', after_id=None, limit=50, include_absent=True):
+
+        # Prefix match on ID or name (as DatabaseHelper._search_filter does), ordered by
+        # employee_id, starting after the keyset cursor
+        search_text = (search_text or '').strip().lower()
+        with self.lock:
+            start = bisect_right(self.sorted_ids, after_id) if after_id is not None else 0
+            records = []
+            for employee_id in self.sorted_ids[start:]:
+                if search_text:
+                    id_key, name_key = self.search_keys[employee_id]
+                    if not id_key.startswith(search_text) and not name_key.startswith(search_text):
+                        continue
+                if not include_absent and employee_id not in self.arrivals:
+                    continue
+                records.append(self._record(employee_id))
+                if len(records) >= limit:
+                    break
+            return records
@@ -0,0 +1,98 @@
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class BackgroundJob:
+
+    def __init__(self, name, fn, runner):
+        self.name = name
+        self.fn = fn
+        self.runner = runner
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def report_progress(self, done, total):
+        self.runner.job_progress.emit(self.name, int(done), int(total))
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled(self.name)
+
+
+class JobRunner(QObject):
+    job_progress = pyqtSignal(str, int, int)
+    job_finished = pyqtSignal(str, object)
+    job_failed = pyqtSignal(str, str)
+    job_cancelled = pyqtSignal(str)
+
+    # Signals are emitted from the worker thread; Qt queues them to the thread
+    # the runner lives in, so connected slots run on the GUI thread
+
+    def __init__(self, max_workers=1, parent=None):
+        super().__init__(parent)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, name, fn):
+        # fn(job) runs on the worker; a newer job with the same name supersedes the old one
+        with self.lock:
+            previous = self.jobs.get(name)
+            if previous is not None:
+                previous.cancel()
+            job = BackgroundJob(name, fn, self)
+            self.jobs[name] = job
+            job.future = self.executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        try:
+            job.check_cancelled()
+            result = job.fn(job)
+            job.check_cancelled()
+        except JobCancelled:
+            self._forget(job)
+            self.job_cancelled.emit(job.name)
+            return
+        except Exception as e:
+            traceback.print_exc()
+            self._forget(job)
+            self.job_failed.emit(job.name, str(e))
+            return
+        self._forget(job)
+        self.job_finished.emit(job.name, result)
+
+    def _forget(self, job):
+        with self.lock:
+            if self.jobs.get(job.name) is job:
+                del self.jobs[job.name]
+
+    def is_running(self, name):
+        with self.lock:
+            return name in self.jobs
+
+    def cancel(self, name):
+        with self.lock:
+            job = self.jobs.get(name)
+        if job is not None:
+            job.cancel()
+
+    def shutdown(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        for job in jobs:
+            job.cancel()
+        self.executor.shutdown(wait=True)
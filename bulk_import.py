@@ -0,0 +1,299 @@
+import os
+import sys
+import csv
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from database_helper import DatabaseHelper
+from database_schema import SchemaManager
+from insightface_embeddings import InsightFaceEmbeddingExtractor
+from app_settings import load_settings
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+# executemany sends a batch as one multi-row INSERT, which must fit max_allowed_packet.
+# Escaped BLOBs can take up to twice their size in the statement, hence the halving;
+# the fallback is half of the 4 MB default of older servers.
+PACKET_SHARE = 0.5
+DEFAULT_MAX_BATCH_BYTES = 2 * 2 ** 20
+REPORT_HEADER = ["Employee ID", "Name", "Status", "Reason"]
+
+
+class ImportRow:
+
+    __slots__ = ('employee_id', 'employee_name', 'image_paths', 'source')
+
+    def __init__(self, employee_id, employee_name, image_paths, source):
+        self.employee_id = employee_id
+        self.employee_name = employee_name
+        self.image_paths = image_paths
+        self.source = source
+
+
+def read_directory(root):
+
+    # One folder per employee: "<employee_id>_<employee name>" (or just "<employee_id>")
+    rows = []
+    for entry in sorted(os.listdir(root)):
+        folder = os.path.join(root, entry)
+        if not os.path.isdir(folder):
+            continue
+        employee_id, _, employee_name = entry.partition('_')
+        images = sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                        if name.lower().endswith(IMAGE_EXTENSIONS))
+        rows.append(ImportRow(employee_id.strip(), employee_name.strip() or employee_id.strip(), images, folder))
+    return rows
+
+
+def read_manifest(csv_path):
+
+    # Columns: employee_id, employee_name, image1, image2, image3 (paths relative to the CSV)
+    base_dir = os.path.dirname(os.path.abspath(csv_path))
+    rows = []
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        for line_number, record in enumerate(csv.DictReader(f), start=2):
+            images = []
+            for key in ('image1', 'image2', 'image3'):
+                path = (record.get(key) or '').strip()
+                if path:
+                    images.append(path if os.path.isabs(path) else os.path.join(base_dir, path))
+            rows.append(ImportRow((record.get('employee_id') or '').strip(),
+                                  (record.get('employee_name') or '').strip(),
+                                  images, f"{csv_path}:{line_number}"))
+    return rows
+
+
+class ImportState:
+
+    # Lets an interrupted import continue where it stopped. A batch is marked pending
+    # before its INSERT and completed once the gallery has been saved, so a crash in
+    # between leaves rows we can recognise as ours on the next run.
+
+    def __init__(self, path):
+        self.path = path
+        self.completed = set()
+        self.pending = set()
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+            self.completed = set(state.get('completed', []))
+            self.pending = set(state.get('pending', []))
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'completed': sorted(self.completed), 'pending': sorted(self.pending)}, f)
+        os.replace(tmp_path, self.path)
+
+    def mark_pending(self, employee_ids):
+        self.pending = set(employee_ids)
+        self._save()
+
+    def mark_completed(self, employee_ids):
+        self.completed.update(employee_ids)
+        self.pending = set()
+        self._save()
+
+
+class BulkImporter:
+
+
+    def __init__(self, db_helper, extractor, embeddings_file='embeddings_insightface.pkl',
+                 workers=4, batch_size=100, state_path=None, max_batch_bytes=None):
+
+        self.db_helper = db_helper
+        self.extractor = extractor
+        self.embeddings_file = embeddings_file
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.state = ImportState(state_path)
+        self.report = []
+
+    def _fail(self, row, reason):
+        self.report.append((row.employee_id, row.employee_name, 'failed', reason))
+
+    def _validate(self, rows):
+
+        valid = []
+        self.recovered = set()
+        seen = set()
+        pending_ids = [row.employee_id for row in rows
+                       if row.employee_id and row.employee_id not in self.state.completed]
+        existing = self.db_helper.existing_employee_ids(pending_ids)
+
+        for row in rows:
+            if row.employee_id in self.state.completed:
+                self.report.append((row.employee_id, row.employee_name, 'skipped', 'already imported'))
+            elif not row.employee_id or not row.employee_name:
+                self._fail(row, f"missing ID or name ({row.source})")
+            elif row.employee_id in seen:
+                self._fail(row, "duplicate ID in import")
+            elif row.employee_id in existing and row.employee_id not in self.state.pending:
+                self._fail(row, "duplicate ID (already in database)")
+            elif not row.image_paths:
+                self._fail(row, "no images")
+            elif len(row.image_paths) > 3:
+                self._fail(row, f"{len(row.image_paths)} images (at most 3 allowed)")
+            else:
+                missing = [path for path in row.image_paths if not os.path.exists(path)]
+                if missing:
+                    self._fail(row, f"image not found: {missing[0]}")
+                else:
+                    if row.employee_id in existing:
+                        # Inserted by an interrupted run; only its embeddings are missing
+                        self.recovered.add(row.employee_id)
+                    valid.append(row)
+            seen.add(row.employee_id)
+        return valid
+
+    def _embed(self, row):
+
+        images = [cv2.imread(path) for path in row.image_paths]
+        if all(img is None for img in images):
+            return row, None, "image unreadable"
+        entry = self.extractor.build_employee_embedding(images, row.employee_name)
+        if entry is None:
+            return row, None, "no face detected"
+        return row, entry, None
+
+    def _read_image_bytes(self, row):
+
+        data = []
+        for path in row.image_paths:
+            with open(path, 'rb') as f:
+                data.append(f.read())
+        data.extend([None] * (3 - len(data)))
+        return (row.employee_id, row.employee_name) + tuple(data)
+
+    def _resolve_max_batch_bytes(self):
+
+        if self.max_batch_bytes is None:
+            packet = self.db_helper.max_allowed_packet()
+            self.max_batch_bytes = int(packet * PACKET_SHARE) if packet else DEFAULT_MAX_BATCH_BYTES
+        return self.max_batch_bytes
+
+    def _byte_chunks(self, rows, data):
+
+        # Consecutive runs of rows whose images add up to at most max_batch_bytes; a row
+        # that is larger on its own still goes in a chunk by itself
+        limit = self._resolve_max_batch_bytes()
+        chunk_rows, chunk_data, chunk_bytes = [], [], 0
+        for row, values in zip(rows, data):
+            size = sum(len(value) for value in values[2:] if value)
+            if chunk_rows and chunk_bytes + size > limit:
+                yield chunk_rows, chunk_data
+                chunk_rows, chunk_data, chunk_bytes = [], [], 0
+            chunk_rows.append(row)
+            chunk_data.append(values)
+            chunk_bytes += size
+        if chunk_rows:
+            yield chunk_rows, chunk_data
+
+    def _insert(self, rows):
+
+        inserted = []
+        data = [self._read_image_bytes(row) for row in rows]
+        for chunk_rows, chunk_data in self._byte_chunks(rows, data):
+            ok, error = self.db_helper.add_employees_batch(chunk_data)
+            if ok:
+                inserted.extend(chunk_rows)
+                continue
+
+            # Retry one by one so a single bad row does not fail the whole chunk
+            for row, values in zip(chunk_rows, chunk_data):
+                ok, error = self.db_helper.add_employees_batch([values])
+                if ok:
+                    inserted.append(row)
+                elif getattr(error, 'errno', None) == 1062:
+                    self._fail(row, "duplicate ID (already in database)")
+                else:
+                    self._fail(row, f"database error: {error}")
+        return inserted
+
+    def run(self, rows):
+
+        rows = self._validate(rows)
+        # A plain dict so imported employees can be added to it as they are inserted
+        embeddings_data = dict(self.extractor.load_embeddings(self.embeddings_file) or {})
+        total = len(rows)
+        print(f"Importing {total} employees with {self.workers} workers...")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for start in range(0, total, self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                embedded = {}
+                for row, entry, reason in pool.map(self._embed, batch):
+                    if entry is None:
+                        self._fail(row, reason)
+                    else:
+                        embedded[row.employee_id] = entry
+
+                ready = [row for row in batch if row.employee_id in embedded]
+                self.state.mark_pending(row.employee_id for row in ready)
+                inserted = [row for row in ready if row.employee_id in self.recovered]
+                inserted += self._insert([row for row in ready if row.employee_id not in self.recovered])
+                for row in inserted:
+                    embeddings_data[row.employee_id] = embedded[row.employee_id]
+                    self.report.append((row.employee_id, row.employee_name, 'imported', ''))
+
+                if inserted:
+                    self.extractor.save_embeddings(embeddings_data, self.embeddings_file)
+                self.state.mark_completed(row.employee_id for row in inserted)
+                print(f"Progress: {min(start + self.batch_size, total)}/{total}")
+
+        return embeddings_data
+
+    def write_report(self, path):
+
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(REPORT_HEADER)
+            writer.writerows(self.report)
+
+    def summary(self):
+
+        counts = {}
+        for _, _, status, _ in self.report:
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import employees from a folder tree or CSV manifest")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--dir', help="folder with one '<id>_<name>' subfolder of photos per employee")
+    source.add_argument('--csv', help="CSV with employee_id, employee_name, image1, image2, image3 columns")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--max-batch-mb', type=float,
+                        help="image bytes per INSERT (default: half the server's max_allowed_packet)")
+    parser.add_argument('--report', default='import_report.csv')
+    parser.add_argument('--state', default='import_state.json', help="progress file used to resume")
+    parser.add_argument('--embeddings', default='embeddings_insightface.pkl')
+    args = parser.parse_args()
+
+    rows = read_directory(args.dir) if args.dir else read_manifest(args.csv)
+
+    db_helper = DatabaseHelper(host="localhost", user="root", password="1234", database="attend")
+    if not db_helper.connect():
+        sys.exit(1)
+    SchemaManager(db_helper).ensure_schema()
+
+    extractor = InsightFaceEmbeddingExtractor.from_settings(db_helper, load_settings())
+    importer = BulkImporter(db_helper, extractor, args.embeddings, args.workers, args.batch_size, args.state,
+                            int(args.max_batch_mb * 2 ** 20) if args.max_batch_mb else None)
+    try:
+        importer.run(rows)
+    finally:
+        importer.write_report(args.report)
+        db_helper.disconnect()
+
+    print(f"Import finished: {importer.summary()} - report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
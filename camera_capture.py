@@ -0,0 +1,181 @@
+import sys
+import time
+import cv2
+from app_logging import get_logger
+from pipeline_metrics import NULL_METRICS
+
+log = get_logger('capture')
+
+BACKENDS = {
+    'any': cv2.CAP_ANY,
+    'v4l2': cv2.CAP_V4L2,
+    'dshow': cv2.CAP_DSHOW,
+    'msmf': cv2.CAP_MSMF,
+    'avfoundation': cv2.CAP_AVFOUNDATION,
+    'gstreamer': cv2.CAP_GSTREAMER,
+    'ffmpeg': cv2.CAP_FFMPEG,
+}
+
+
+def default_backend():
+    # V4L2 on Linux; DirectShow on Windows, which opens far faster than Media Foundation
+    # and negotiates MJPG on most USB cameras
+    if sys.platform.startswith('linux'):
+        return 'v4l2'
+    if sys.platform == 'win32':
+        return 'dshow'
+    return 'any'
+
+
+def decode_fourcc(value):
+    code = int(value)
+    if code <= 0:
+        return None
+    return ''.join(chr((code >> shift) & 0xFF) for shift in (0, 8, 16, 24)).strip('\x00')
+
+
+class CaptureConfig:
+
+    # What to ask a camera device for. None leaves a property at the driver's default.
+    # The device may accept something else; open_capture reads back what it got.
+    # buffer_size 1 keeps the driver from queueing stale frames behind a slow loop.
+
+    __slots__ = ('backend', 'fourcc', 'width', 'height', 'fps', 'buffer_size',
+                 'reopen_backoff_s', 'max_failed_reads')
+
+    def __init__(self, backend='auto', fourcc='MJPG', width=None, height=None, fps=30, buffer_size=1,
+                 reopen_backoff_s=(0.5, 10.0), max_failed_reads=30):
+        if backend != 'auto' and backend not in BACKENDS:
+            raise ValueError(f"Unknown capture backend: {backend}")
+        if fourcc is not None and len(fourcc) != 4:
+            raise ValueError(f"FOURCC must be four characters: {fourcc!r}")
+        self.backend = default_backend() if backend == 'auto' else backend
+        self.fourcc = fourcc
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.buffer_size = buffer_size
+        self.reopen_backoff_s = tuple(reopen_backoff_s)
+        self.max_failed_reads = int(max_failed_reads)
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(**{key: values[key] for key in cls.__slots__ if key in values})
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def requested(self):
+        return {'fourcc': self.fourcc, 'width': self.width, 'height': self.height, 'fps': self.fps,
+                'buffer_size': self.buffer_size}
+
+
+def probe_capture(camera):
+
+    # What the open device actually delivers; drivers silently round or ignore requests
+    return {
+        'backend': camera.getBackendName(),
+        'fourcc': decode_fourcc(camera.get(cv2.CAP_PROP_FOURCC)),
+        'width': int(camera.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        'height': int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        'fps': round(camera.get(cv2.CAP_PROP_FPS), 2),
+        'buffer_size': int(camera.get(cv2.CAP_PROP_BUFFERSIZE)),
+    }
+
+
+def open_capture(source, config):
+
+    # Returns (camera, accepted) or (None, None). Device indexes use the configured
+    # backend; files and stream URLs are left to OpenCV to pick one, and are not
+    # configured since their format is fixed.
+    is_device = isinstance(source, int)
+    backend = BACKENDS[config.backend] if is_device else cv2.CAP_ANY
+    started = time.perf_counter()
+    camera = cv2.VideoCapture(source, backend)
+    if not camera.isOpened():
+        camera.release()
+        return None, None
+
+    if is_device:
+        # FOURCC first: V4L2 only offers some resolutions and rates in some formats
+        if config.fourcc:
+            camera.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*config.fourcc))
+        if config.width:
+            camera.set(cv2.CAP_PROP_FRAME_WIDTH, config.width)
+        if config.height:
+            camera.set(cv2.CAP_PROP_FRAME_HEIGHT, config.height)
+        if config.fps:
+            camera.set(cv2.CAP_PROP_FPS, config.fps)
+        if config.buffer_size is not None:
+            camera.set(cv2.CAP_PROP_BUFFERSIZE, config.buffer_size)
+
+    accepted = probe_capture(camera)
+    accepted['open_ms'] = round((time.perf_counter() - started) * 1000)
+    if is_device:
+        differs = {key: (value, accepted[key]) for key, value in config.requested().items()
+                   if value is not None and accepted[key] != value}
+        if differs:
+            log.warning("Camera %s did not accept %s", source,
+                        ", ".join(f"{key}={wanted} (got {got})" for key, (wanted, got) in differs.items()))
+    log.info("Camera %s opened: %s", source, accepted, extra={'capture': accepted})
+    return camera, accepted
+
+
+class CameraSource:
+
+    # A cv2.VideoCapture that reopens itself. After max_failed_reads failed reads in a
+    # row (unplugged, driver reset, end of a file) the device is released and reopened,
+    # waiting reopen_backoff_s[0] at first and doubling up to reopen_backoff_s[1].
+    # read() never blocks for longer than POLL_S, so the camera thread can still stop.
+
+    POLL_S = 0.1
+
+    def __init__(self, source, config, metrics=NULL_METRICS):
+        self.source = source
+        self.config = config
+        self.metrics = metrics
+        self.camera = None
+        self.accepted = None
+        self.failed_reads = 0
+        self.backoff_s = config.reopen_backoff_s[0]
+        self.next_open = 0.0
+
+    def open(self):
+        self.camera, self.accepted = open_capture(self.source, self.config)
+        if self.camera is None:
+            log.warning("Cannot open camera %s; retrying in %.1f s", self.source, self.backoff_s)
+            self.next_open = time.monotonic() + self.backoff_s
+            self.backoff_s = min(self.backoff_s * 2, self.config.reopen_backoff_s[1])
+            return False
+        self.failed_reads = 0
+        return True
+
+    def read(self, image=None):
+        if self.camera is None:
+            wait = self.next_open - time.monotonic()
+            if wait > 0:
+                time.sleep(min(wait, self.POLL_S))
+                return False, None
+            self.metrics.incr('camera_reopens')
+            if not self.open():
+                return False, None
+
+        ret, frame = self.camera.read() if image is None else self.camera.read(image=image)
+        if ret:
+            self.failed_reads = 0
+            self.backoff_s = self.config.reopen_backoff_s[0]
+            return True, frame
+        self.failed_reads += 1
+        if self.failed_reads >= self.config.max_failed_reads:
+            log.warning("Camera %s returned no frame %d times in a row; reopening in %.1f s",
+                        self.source, self.failed_reads, self.backoff_s)
+            self.camera.release()
+            self.camera = None
+            self.next_open = time.monotonic() + self.backoff_s
+            self.backoff_s = min(self.backoff_s * 2, self.config.reopen_backoff_s[1])
+        return False, None
+
+    def release(self):
+        if self.camera is not None:
+            self.camera.release()
+            self.camera = None
@@ -0,0 +1,171 @@
+import sys
+from collections.abc import Mapping
+import numpy as np
+
+EMBEDDING_DIM = 512
+# Keys every gallery entry has, as built by InsightFaceEmbeddingExtractor.build_employee_embedding
+ENTRY_KEYS = ('avg_embedding', 'all_embeddings', 'employee_name', 'face_info', 'num_faces')
+
+
+class GalleryRecord(Mapping):
+
+    # One employee's entry. Reads like the old per-employee dict, but only holds its
+    # row index; embeddings come back as views into the gallery's arrays and face_info
+    # dicts are rebuilt from the packed metadata when someone asks for them.
+
+    __slots__ = ('gallery', 'index', 'employee_name')
+
+    def __init__(self, gallery, index, employee_name):
+        self.gallery = gallery
+        self.index = index
+        self.employee_name = employee_name
+
+    def __getitem__(self, key):
+        gallery, index = self.gallery, self.index
+        if key == 'avg_embedding':
+            return gallery.avg[index]
+        if key == 'all_embeddings':
+            return gallery.templates[gallery.offsets[index]:gallery.offsets[index + 1]]
+        if key == 'employee_name':
+            return self.employee_name
+        if key == 'num_faces':
+            return int(gallery.offsets[index + 1] - gallery.offsets[index])
+        if key == 'face_info':
+            return [gallery.face_info(row) for row in range(gallery.offsets[index], gallery.offsets[index + 1])]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(ENTRY_KEYS)
+
+    def __len__(self):
+        return len(ENTRY_KEYS)
+
+    def __repr__(self):
+        return f"<GalleryRecord {self.employee_name!r} faces={self['num_faces']}>"
+
+
+class CompactGallery(Mapping):
+
+    # Read-only {employee_id: entry} gallery stored column-wise: one contiguous float32
+    # matrix of unit-norm average embeddings (what the matcher multiplies against), one
+    # of all templates with per-employee offsets, and the face metadata packed into
+    # fixed-width arrays. Galleries are replaced, never edited, so there is no __setitem__;
+    # build a new one with from_dict({**old, emp_id: entry}).
+
+    def __init__(self, ids, names, avg, templates, offsets, faces):
+        self.avg = avg
+        self.templates = templates
+        self.offsets = offsets
+        self.faces = faces
+        self.records = {emp_id: GalleryRecord(self, index, name)
+                        for index, (emp_id, name) in enumerate(zip(ids, names))}
+
+    @classmethod
+    def from_dict(cls, embeddings_data):
+        # Accepts the pickled dict-of-dicts format, another CompactGallery or a mix of both
+        if isinstance(embeddings_data, CompactGallery):
+            return embeddings_data
+        ids = list(embeddings_data)
+        dim = EMBEDDING_DIM
+        if ids:
+            dim = np.asarray(embeddings_data[ids[0]]['avg_embedding']).shape[-1]
+        names, counts, face_infos = [], [], []
+        avg = np.empty((len(ids), dim), dtype=np.float32)
+        template_rows = []
+        for index, emp_id in enumerate(ids):
+            entry = embeddings_data[emp_id]
+            names.append(sys.intern(str(entry['employee_name'])))
+            avg[index] = entry['avg_embedding']
+            templates = np.asarray(entry['all_embeddings'], dtype=np.float32).reshape(-1, dim)
+            template_rows.append(templates)
+            counts.append(len(templates))
+            infos = list(entry.get('face_info') or [])
+            face_infos.extend(infos[:len(templates)] + [None] * (len(templates) - len(infos)))
+
+        norms = np.linalg.norm(avg, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        avg /= norms
+        templates = np.ascontiguousarray(np.concatenate(template_rows) if template_rows
+                                         else np.zeros((0, dim), dtype=np.float32))
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(ids, names, avg, templates, offsets, pack_face_info(face_infos))
+
+    def __getitem__(self, emp_id):
+        return self.records[emp_id]
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, emp_id):
+        return emp_id in self.records
+
+    @property
+    def nbytes(self):
+        return self.avg.nbytes + self.templates.nbytes + self.offsets.nbytes + \
+            sum(array.nbytes for array in self.faces.values())
+
+    def face_info(self, row):
+        faces = self.faces
+        if not faces['present'][row]:
+            return None
+        kps = faces['kps'][row]
+        return {
+            'bbox': faces['bbox'][row],
+            'kps': None if np.isnan(kps).all() else kps,
+            'det_score': float(faces['det_score'][row]),
+            'gender': None if faces['gender'][row] < 0 else int(faces['gender'][row]),
+            'age': None if faces['age'][row] < 0 else int(faces['age'][row]),
+            'det_size': tuple(int(size) for size in faces['det_size'][row]),
+            'det_attempts': int(faces['det_attempts'][row]),
+        }
+
+    def to_dict(self):
+        # The plain dict-of-dicts format, for pickling; older builds read it unchanged
+        return {emp_id: dict(record, all_embeddings=list(record['all_embeddings']))
+                for emp_id, record in self.records.items()}
+
+
+def pack_face_info(face_infos):
+
+    # face_info dicts (or None) -> fixed-width arrays; missing values are NaN / -1 / 0
+    count = len(face_infos)
+    faces = {
+        'present': np.zeros(count, dtype=bool),
+        'bbox': np.full((count, 4), np.nan, dtype=np.float32),
+        'kps': np.full((count, 5, 2), np.nan, dtype=np.float32),
+        'det_score': np.zeros(count, dtype=np.float32),
+        'gender': np.full(count, -1, dtype=np.int8),
+        'age': np.full(count, -1, dtype=np.int16),
+        'det_size': np.zeros((count, 2), dtype=np.int16),
+        'det_attempts': np.zeros(count, dtype=np.int8),
+    }
+    for row, info in enumerate(face_infos):
+        if not info:
+            continue
+        faces['present'][row] = True
+        if info.get('bbox') is not None:
+            faces['bbox'][row] = np.asarray(info['bbox'], dtype=np.float32)[:4]
+        if info.get('kps') is not None:
+            faces['kps'][row] = np.asarray(info['kps'], dtype=np.float32)[:5]
+        faces['det_score'][row] = info.get('det_score') or 0.0
+        if info.get('gender') is not None:
+            faces['gender'][row] = int(info['gender'])
+        if info.get('age') is not None:
+            faces['age'][row] = int(info['age'])
+        if info.get('det_size') is not None:
+            faces['det_size'][row] = info['det_size']
+        faces['det_attempts'][row] = info.get('det_attempts') or 0
+    return faces
+
+
+def gallery_to_dict(embeddings_data):
+
+    # Any gallery (dict, CompactGallery, or a dict holding GalleryRecords) as plain dicts
+    if isinstance(embeddings_data, CompactGallery):
+        return embeddings_data.to_dict()
+    return {emp_id: entry if isinstance(entry, dict) else dict(entry, all_embeddings=list(entry['all_embeddings']))
+            for emp_id, entry in embeddings_data.items()}
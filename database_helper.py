@@ -1,30 +1,50 @@
+import time
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, pooling
 import cv2
 import numpy as np
 from datetime import datetime, date
+from pipeline_metrics import NULL_METRICS
 
 
 class DatabaseHelper:
 
 
-    def __init__(self, host='localhost', user='root', password='1234', database='attend'):
+    def __init__(self, host='localhost', user='root', password='1234', database='attend', pool_size=None,
+                 metrics=NULL_METRICS):
 
         self.host = host
         self.user = user
         self.password = password
         self.database = database
+        self.pool_size = pool_size
+        self.pool = None
+        self.metrics = metrics
         self.connection = None
+        self.use_fulltext = False
+
+    def _open_connection(self):
+
+        # With a pool_size the helper and its clones borrow from one shared pool, and
+        # disconnect() hands the connection back instead of closing the socket
+        if not self.pool_size:
+            return mysql.connector.connect(host=self.host, user=self.user,
+                                           password=self.password, database=self.database)
+        if self.pool is None:
+            self.pool = pooling.MySQLConnectionPool(
+                pool_name=f"attend_{id(self)}", pool_size=self.pool_size, pool_reset_session=True,
+                host=self.host, user=self.user, password=self.password, database=self.database)
+        try:
+            return self.pool.get_connection()
+        except pooling.PoolError:
+            # Every pooled connection is busy; a short-lived extra one is better than failing
+            return mysql.connector.connect(host=self.host, user=self.user,
+                                           password=self.password, database=self.database)
 
     def connect(self):
 
         try:
-            self.connection = mysql.connector.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.database
-            )
+            self.connection = self._open_connection()
             if self.connection.is_connected():
                 return True
         except Error as e:
@@ -35,6 +55,16 @@ class DatabaseHelper:
         if self.connection and self.connection.is_connected():
             self.connection.close()
 
+    def clone(self):
+
+        # MySQL connections must not be shared between threads, so workers get their own
+        helper = DatabaseHelper(self.host, self.user, self.password, self.database, self.pool_size, self.metrics)
+        helper.pool = self.pool
+        helper.use_fulltext = self.use_fulltext
+        if helper.connect():
+            return helper
+        return None
+
     def add_employee(self, employee_id, employee_name, image1_path, image2_path, image3_path):
 
         try:
@@ -85,6 +115,9 @@ class DatabaseHelper:
             if result:
                 images = []
                 for img_data in result:
+                    if img_data is None:
+                        images.append(None)
+                        continue
                     # Decode binary image data
                     nparr = np.frombuffer(img_data, np.uint8)
                     img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
@@ -97,6 +130,7 @@ class DatabaseHelper:
 
     def record_attendance(self, employee_id):
 
+        started = time.perf_counter()
         try:
             cursor = self.connection.cursor()
             today = date.today()
@@ -116,9 +150,12 @@ class DatabaseHelper:
             cursor.execute(query, (employee_id, employee_name, today, current_time, current_time, employee_name))
             self.connection.commit()
             cursor.close()
+            self.metrics.record('db_write', started)
+            self.metrics.incr('db_writes')
             print(f"Attendance recorded for {employee_name} ({employee_id}) at {current_time}")
             return True
         except Error as e:
+            self.metrics.incr('db_write_failed')
             print(f"Error recording attendance: {e}")
             return False
 
@@ -164,4 +201,173 @@ class DatabaseHelper:
             return daily_report
         except Error as e:
             print(f"Error getting daily attendance: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    def count_active_employees(self):
+
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("SELECT COUNT(*) FROM employees WHERE is_active = TRUE")
+            count = cursor.fetchone()[0]
+            cursor.close()
+            return count
+        except Error as e:
+            print(f"Error counting employees: {e}")
+            return 0
+
+    def iter_attendance_range(self, start_date, end_date, batch_size=1000):
+
+        # Unbuffered cursor: rows are pulled from the server in batches instead of
+        # being materialized client-side, so memory does not grow with the range
+        query = """SELECT e.employee_id, e.employee_name, DATE(e.created_at), a.attendance_date, a.arrival_time,
+                          a.status
+                   FROM employees e
+                   LEFT JOIN attendance a
+                     ON a.employee_id = e.employee_id
+                    AND a.attendance_date BETWEEN %s AND %s
+                   WHERE e.is_active = TRUE
+                   ORDER BY e.employee_id, a.attendance_date"""
+        cursor = self.connection.cursor(buffered=False)
+        try:
+            cursor.execute(query, (start_date, end_date))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            try:
+                # Stopped before the last row (export cancelled): the rest of the result
+                # has to be read off the connection before it accepts another query
+                if self.connection.unread_result:
+                    self.connection.consume_results()
+                cursor.close()
+            except Error as e:
+                print(f"Error closing attendance range cursor: {e}")
+
+    def _search_filter(self, search_text, id_column='employee_id', name_column='employee_name'):
+
+        # Prefix matching keeps the ID primary key and the name index usable;
+        # with a FULLTEXT index, word prefixes anywhere in the name also match
+        search_text = (search_text or '').strip()
+        if not search_text:
+            return "", ()
+
+        escaped = search_text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        prefix = escaped + '%'
+        if self.use_fulltext:
+            words = ' '.join(f"+{word}*" for word in search_text.split() if word.isalnum())
+            if words:
+                return (f" AND ({id_column} LIKE %s OR MATCH({name_column}) AGAINST (%s IN BOOLEAN MODE))",
+                        (prefix, words))
+        return f" AND ({id_column} LIKE %s OR {name_column} LIKE %s)", (prefix, prefix)
+
+    def search_employees(self, search_text='', after_id=None, limit=50):
+
+        try:
+            cursor = self.connection.cursor(dictionary=True)
+            where, params = self._search_filter(search_text)
+            if after_id is not None:
+                where += " AND employee_id > %s"
+                params += (after_id,)
+            query = f"""SELECT employee_id, employee_name FROM employees
+                        WHERE is_active = TRUE{where}
+                        ORDER BY employee_id LIMIT %s"""
+            cursor.execute(query, params + (limit,))
+            employees = cursor.fetchall()
+            cursor.close()
+            return employees
+        except Error as e:
+            print(f"Error searching employees: {e}")
+            return []
+
+    def count_employees(self, search_text=''):
+
+        try:
+            cursor = self.connection.cursor()
+            where, params = self._search_filter(search_text)
+            cursor.execute(f"SELECT COUNT(*) FROM employees WHERE is_active = TRUE{where}", params)
+            count = cursor.fetchone()[0]
+            cursor.close()
+            return count
+        except Error as e:
+            print(f"Error counting employees: {e}")
+            return 0
+
+    def get_employees_images(self, employee_ids):
+
+        if not employee_ids:
+            return {}
+
+        try:
+            cursor = self.connection.cursor()
+            placeholders = ', '.join(['%s'] * len(employee_ids))
+            cursor.execute(f"""SELECT employee_id, image1, image2, image3 FROM employees
+                               WHERE employee_id IN ({placeholders}) AND is_active = TRUE""",
+                           tuple(employee_ids))
+            rows = cursor.fetchall()
+            cursor.close()
+
+            images_by_id = {}
+            for row in rows:
+                images = []
+                for img_data in row[1:]:
+                    if img_data is None:
+                        images.append(None)
+                        continue
+                    nparr = np.frombuffer(img_data, np.uint8)
+                    images.append(cv2.imdecode(nparr, cv2.IMREAD_COLOR))
+                images_by_id[row[0]] = images
+            return images_by_id
+        except Error as e:
+            print(f"Error fetching employee images: {e}")
+            return {}
+
+    def existing_employee_ids(self, employee_ids, chunk_size=500):
+
+        existing = set()
+        employee_ids = list(employee_ids)
+        try:
+            cursor = self.connection.cursor()
+            for start in range(0, len(employee_ids), chunk_size):
+                chunk = employee_ids[start:start + chunk_size]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(f"SELECT employee_id FROM employees WHERE employee_id IN ({placeholders})",
+                               tuple(chunk))
+                existing.update(row[0] for row in cursor.fetchall())
+            cursor.close()
+        except Error as e:
+            print(f"Error checking employee IDs: {e}")
+        return existing
+
+    def max_allowed_packet(self):
+
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("SELECT @@max_allowed_packet")
+            value = cursor.fetchone()[0]
+            cursor.close()
+            return int(value)
+        except Error as e:
+            print(f"Error reading max_allowed_packet: {e}")
+            return None
+
+    def add_employees_batch(self, rows):
+
+        # rows: (employee_id, employee_name, image1_bytes, image2_bytes, image3_bytes)
+        try:
+            cursor = self.connection.cursor()
+            query = """INSERT INTO employees 
+                      (employee_id, employee_name, image1, image2, image3) 
+                      VALUES (%s, %s, %s, %s, %s)"""
+            cursor.executemany(query, rows)
+            self.connection.commit()
+            cursor.close()
+            return True, None
+        except Error as e:
+            try:
+                self.connection.rollback()
+            except Error:
+                pass
+            return False, e
@@ -0,0 +1,325 @@
+import sys
+import csv
+import argparse
+from datetime import date, datetime
+from mysql.connector import Error
+from database_helper import DatabaseHelper
+
+
+SCHEMA_VERSION = 1
+
+TABLES = {
+    'employees': """
+        CREATE TABLE IF NOT EXISTS employees (
+            employee_id VARCHAR(50) NOT NULL,
+            employee_name VARCHAR(100) NOT NULL,
+            image1 LONGBLOB,
+            image2 LONGBLOB,
+            image3 LONGBLOB,
+            is_active BOOLEAN NOT NULL DEFAULT TRUE,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (employee_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    'attendance': """
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INT NOT NULL AUTO_INCREMENT,
+            employee_id VARCHAR(50) NOT NULL,
+            employee_name VARCHAR(100) NOT NULL,
+            attendance_date DATE NOT NULL,
+            arrival_time TIME,
+            status VARCHAR(20) NOT NULL DEFAULT 'present',
+            PRIMARY KEY (id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    'schema_version': """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (version)
+        ) ENGINE=InnoDB""",
+}
+
+# Columns that older databases may be missing, added in place by migrate()
+COLUMNS = {
+    'employees': {
+        'is_active': "BOOLEAN NOT NULL DEFAULT TRUE",
+    },
+    'attendance': {
+        'employee_name': "VARCHAR(100) NOT NULL DEFAULT ''",
+        'status': "VARCHAR(20) NOT NULL DEFAULT 'present'",
+    },
+}
+
+# (table, index name, definition, columns)
+# uq_attendance_employee_date is what ON DUPLICATE KEY UPDATE in record_attendance relies on.
+# idx_attendance_date_cover lets the daily report read everything it needs from the index alone.
+INDEXES = [
+    ('attendance', 'uq_attendance_employee_date',
+     "UNIQUE KEY uq_attendance_employee_date (employee_id, attendance_date)",
+     ('employee_id', 'attendance_date')),
+    ('attendance', 'idx_attendance_date_cover',
+     "KEY idx_attendance_date_cover (attendance_date, employee_id, arrival_time, status)",
+     ('attendance_date', 'employee_id', 'arrival_time', 'status')),
+    ('employees', 'idx_employees_active',
+     "KEY idx_employees_active (is_active, employee_id, employee_name)",
+     ('is_active', 'employee_id', 'employee_name')),
+    ('employees', 'idx_employees_name',
+     "KEY idx_employees_name (employee_name)",
+     ('employee_name',)),
+]
+
+# Optional: lets admin search match word prefixes anywhere in a name, not just at the start
+FULLTEXT_INDEX = ('employees', 'ft_employees_name', "FULLTEXT KEY ft_employees_name (employee_name)")
+
+HOT_QUERIES = {
+    'active_employees':
+        ("SELECT employee_id, employee_name FROM employees WHERE is_active = TRUE", lambda: ()),
+    'daily_attendance':
+        ("SELECT employee_id, arrival_time, status FROM attendance WHERE attendance_date = %s",
+         lambda: (date.today(),)),
+    'employee_attendance_today':
+        ("SELECT arrival_time FROM attendance WHERE employee_id = %s AND attendance_date = %s",
+         lambda: ('EMP001', date.today())),
+    'search_employees':
+        ("SELECT employee_id, employee_name FROM employees WHERE is_active = TRUE "
+         "AND (employee_id LIKE %s OR employee_name LIKE %s) ORDER BY employee_id LIMIT 50",
+         lambda: ('EMP%', 'EMP%')),
+    'employee_images':
+        ("SELECT image1, image2, image3 FROM employees WHERE employee_id = %s AND is_active = TRUE",
+         lambda: ('EMP001',)),
+}
+
+
+class SchemaManager:
+
+
+    def __init__(self, db_helper):
+
+        self.db_helper = db_helper
+
+    def _fetchall(self, query, params=()):
+
+        cursor = self.db_helper.connection.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+
+    def _execute(self, query, params=()):
+
+        cursor = self.db_helper.connection.cursor()
+        cursor.execute(query, params)
+        self.db_helper.connection.commit()
+        cursor.close()
+
+    def existing_columns(self, table):
+
+        rows = self._fetchall("""SELECT COLUMN_NAME FROM information_schema.COLUMNS
+                                 WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s""", (table,))
+        return {row[0] for row in rows}
+
+    def existing_indexes(self, table):
+
+        rows = self._fetchall("""SELECT INDEX_NAME, COLUMN_NAME, NON_UNIQUE FROM information_schema.STATISTICS
+                                 WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+                                 ORDER BY INDEX_NAME, SEQ_IN_INDEX""", (table,))
+        indexes = {}
+        for index_name, column_name, non_unique in rows:
+            columns, unique = indexes.get(index_name, ((), not int(non_unique)))
+            indexes[index_name] = (columns + (column_name,), unique)
+        return indexes
+
+    def _has_index(self, table, index_name, definition, columns):
+
+        indexes = self.existing_indexes(table)
+        if index_name in indexes:
+            return True
+        # An index with another name but the same leading columns serves lookups just as
+        # well. Uniqueness is different: a unique key on more columns does not make these
+        # columns unique, so only one on exactly these columns counts.
+        if definition.startswith('UNIQUE'):
+            return any(unique and index_columns == tuple(columns) for index_columns, unique in indexes.values())
+        return any(index_columns[:len(columns)] == tuple(columns) for index_columns, _ in indexes.values())
+
+    def create_tables(self):
+
+        for table, statement in TABLES.items():
+            self._execute(statement)
+
+    def find_duplicate_attendance(self):
+
+        # Rows that block the unique key: every row but the earliest per employee and day
+        cursor = self.db_helper.connection.cursor(dictionary=True)
+        cursor.execute("""SELECT DISTINCT a1.id, a1.employee_id, a1.employee_name, a1.attendance_date,
+                                 a1.arrival_time, a1.status
+                          FROM attendance a1
+                          JOIN attendance a2
+                            ON a1.employee_id = a2.employee_id
+                           AND a1.attendance_date = a2.attendance_date
+                           AND a1.id > a2.id
+                          ORDER BY a1.attendance_date, a1.employee_id, a1.id""")
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+
+    def remove_duplicate_attendance(self, backup_path=None):
+
+        # Only run on request (database_schema.py --dedupe-attendance); the removed rows
+        # are written to backup_path first so they can be restored
+        rows = self.find_duplicate_attendance()
+        if not rows:
+            print("No duplicate attendance rows")
+            return 0
+        if backup_path:
+            with open(backup_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+            print(f"Backed up {len(rows)} duplicate attendance row(s) to {backup_path}")
+        ids = [row['id'] for row in rows]
+        for start in range(0, len(ids), 1000):
+            chunk = ids[start:start + 1000]
+            self._execute(f"DELETE FROM attendance WHERE id IN ({', '.join(['%s'] * len(chunk))})", tuple(chunk))
+        print(f"Removed {len(rows)} duplicate attendance row(s), kept the earliest per employee and day")
+        return len(rows)
+
+    def migrate(self):
+
+        try:
+            self.create_tables()
+
+            for table, columns in COLUMNS.items():
+                present = self.existing_columns(table)
+                for column, definition in columns.items():
+                    if column not in present:
+                        print(f"Adding column {table}.{column}")
+                        self._execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+            for table, index_name, definition, columns in INDEXES:
+                if self._has_index(table, index_name, definition, columns):
+                    continue
+                if index_name == 'uq_attendance_employee_date' and 'id' in self.existing_columns('attendance'):
+                    # The unique key cannot be added while duplicates exist. Attendance history
+                    # is never deleted implicitly; leave the index missing and say how to fix it.
+                    duplicates = self.find_duplicate_attendance()
+                    if duplicates:
+                        print(f"Warning: {len(duplicates)} duplicate attendance row(s) prevent creating "
+                              f"{index_name}; review them with 'python database_schema.py --find-duplicates' "
+                              f"and remove them with --dedupe-attendance")
+                        continue
+                print(f"Creating index {index_name} on {table}")
+                self._execute(f"ALTER TABLE {table} ADD {definition}")
+
+            self._execute("INSERT IGNORE INTO schema_version (version) VALUES (%s)", (SCHEMA_VERSION,))
+            return True
+        except Error as e:
+            print(f"Schema migration error: {e}")
+            return False
+
+    def verify_indexes(self):
+
+        missing = []
+        try:
+            for table, index_name, definition, columns in INDEXES:
+                if not self._has_index(table, index_name, definition, columns):
+                    missing.append((table, index_name))
+        except Error as e:
+            print(f"Error verifying indexes: {e}")
+            return missing
+
+        for table, index_name in missing:
+            print(f"Warning: index {index_name} is missing on table {table}")
+        return missing
+
+    def has_fulltext_index(self):
+
+        table, index_name, definition = FULLTEXT_INDEX
+        try:
+            return index_name in self.existing_indexes(table)
+        except Error as e:
+            print(f"Error checking fulltext index: {e}")
+            return False
+
+    def create_fulltext_index(self):
+
+        table, index_name, definition = FULLTEXT_INDEX
+        if self.has_fulltext_index():
+            return True
+        try:
+            print(f"Creating index {index_name} on {table}")
+            self._execute(f"ALTER TABLE {table} ADD {definition}")
+            return True
+        except Error as e:
+            print(f"Error creating fulltext index: {e}")
+            return False
+
+    def explain_hot_queries(self):
+
+        plans = {}
+        for name, (query, params) in HOT_QUERIES.items():
+            try:
+                cursor = self.db_helper.connection.cursor(dictionary=True)
+                cursor.execute(f"EXPLAIN {query}", params())
+                plans[name] = cursor.fetchall()
+                cursor.close()
+            except Error as e:
+                print(f"Error explaining {name}: {e}")
+                plans[name] = []
+        return plans
+
+    def print_explain(self):
+
+        for name, rows in self.explain_hot_queries().items():
+            print(f"{name}:")
+            for row in rows:
+                scan = " (FULL SCAN)" if row.get('type') == 'ALL' else ""
+                print(f"  table={row.get('table')} type={row.get('type')} key={row.get('key')} "
+                      f"rows={row.get('rows')} extra={row.get('Extra')}{scan}")
+
+    def ensure_schema(self, fulltext=False):
+
+        ok = self.migrate()
+        if fulltext:
+            self.create_fulltext_index()
+        self.verify_indexes()
+        self.db_helper.use_fulltext = self.has_fulltext_index()
+        return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or migrate the attendance schema")
+    parser.add_argument('--verify', action='store_true', help="only report missing indexes")
+    parser.add_argument('--fulltext', action='store_true', help="also create the fulltext name index")
+    parser.add_argument('--explain', action='store_true', help="print query plans for the hot queries")
+    parser.add_argument('--find-duplicates', action='store_true',
+                        help="list attendance rows that block the unique (employee, date) key")
+    parser.add_argument('--dedupe-attendance', action='store_true',
+                        help="delete those rows, keeping the earliest per employee and day, then migrate")
+    parser.add_argument('--backup', help="CSV file for the removed rows (default: a timestamped file)")
+    args = parser.parse_args()
+
+    db_helper = DatabaseHelper(host="localhost", user="root", password="1234", database="attend")
+    if not db_helper.connect():
+        sys.exit(1)
+
+    manager = SchemaManager(db_helper)
+    if args.find_duplicates:
+        rows = manager.find_duplicate_attendance()
+        for row in rows:
+            print(f"  id={row['id']} {row['employee_id']} {row['attendance_date']} "
+                  f"{row['arrival_time']} {row['status']}")
+        print(f"{len(rows)} duplicate attendance row(s)")
+    elif args.verify:
+        missing = manager.verify_indexes()
+        print("All indexes present" if not missing else f"{len(missing)} index(es) missing")
+    else:
+        if args.dedupe_attendance:
+            backup = args.backup or f"attendance_duplicates_{datetime.now():%Y%m%d_%H%M%S}.csv"
+            manager.remove_duplicate_attendance(backup)
+        manager.ensure_schema(fulltext=args.fulltext)
+    if args.explain:
+        manager.print_explain()
+    db_helper.disconnect()
+
+
+if __name__ == "__main__":
+    main()
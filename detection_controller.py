@@ -0,0 +1,102 @@
+from collections import deque
+from app_logging import get_logger
+
+log = get_logger('detection')
+
+
+class AdaptiveDetectionController:
+
+    # Picks the detector input size per frame. Among the candidate sizes that still keep
+    # the smallest recently seen face above min_face_px at detection scale, it uses the
+    # largest one whose measured latency fits the target FPS; when faces are large and
+    # the CPU is slow that is the smallest candidate. A frame with no face at a reduced
+    # size may be retried at the largest size so people further away are not missed.
+
+    def __init__(self, candidate_sizes=(320, 480, 640), target_fps=10.0, min_face_px=32,
+                 window_frames=60, switch_interval=15, fallback_interval=5, smoothing=0.2):
+        self.sizes = sorted(int(size) for size in candidate_sizes)
+        self.budget_ms = 1000.0 / target_fps
+        self.min_face_px = min_face_px
+        self.switch_interval = switch_interval
+        # 0 turns the full-size retry on empty frames off
+        self.fallback_interval = max(int(fallback_interval), 0)
+        self.smoothing = smoothing
+        self.latency_ms = {}
+        self.face_heights = deque(maxlen=window_frames)
+        self.current = self.sizes[-1]
+        self.frames_since_switch = 0
+        self.empty_frames = 0
+        self.offered = 1
+
+    @classmethod
+    def from_settings(cls, detection_settings):
+        if not detection_settings.get('adaptive'):
+            return None
+        return cls(detection_settings['candidate_sizes'], detection_settings['target_fps'],
+                   detection_settings['min_face_px'], detection_settings['window_frames'],
+                   detection_settings['switch_interval'], detection_settings['fallback_interval'])
+
+    def sizes_to_try(self):
+        # The current size, plus the largest one as a fallback on some empty frames
+        sizes = [(self.current, self.current)]
+        if self.fallback_interval and self.current != self.sizes[-1] \
+                and self.empty_frames % self.fallback_interval == 0:
+            sizes.append((self.sizes[-1], self.sizes[-1]))
+        self.offered = len(sizes)
+        return sizes
+
+    def _estimated_latency(self, size):
+        if size in self.latency_ms:
+            return self.latency_ms[size]
+        # Detector cost grows with input area; scale from the closest measured size
+        if not self.latency_ms:
+            return 0.0
+        measured = min(self.latency_ms, key=lambda known: abs(known - size))
+        return self.latency_ms[measured] * (size / measured) ** 2
+
+    def _smallest_useful_size(self, frame_long_side):
+        heights = [height for height in self.face_heights if height is not None]
+        if not heights:
+            # Nothing seen recently: keep the largest size so distant faces are found
+            return self.sizes[-1]
+        smallest_face = min(heights)
+        for size in self.sizes:
+            if smallest_face * size / frame_long_side >= self.min_face_px:
+                return size
+        return self.sizes[-1]
+
+    def observe(self, frame_shape, latency_ms, face_info):
+        # latency_ms covers the whole detect + recognise call for this frame; face_info
+        # carries the size that found the face and how many sizes were tried. Its bbox
+        # must be in the coordinates of frame_shape, as the extractor returns it.
+        face_info = face_info or {}
+        attempts = face_info.get('det_attempts', self.offered)
+        if attempts == 1:
+            size = face_info.get('det_size', (self.current, self.current))[0]
+            previous = self.latency_ms.get(size)
+            self.latency_ms[size] = latency_ms if previous is None else \
+                previous + self.smoothing * (latency_ms - previous)
+
+        # Faces the quality gate found too small are background, not a reason to size up
+        bbox = face_info.get('bbox') if face_info.get('quality_reject') != 'small' else None
+        if bbox is not None:
+            self.face_heights.append(float(bbox[3] - bbox[1]))
+            self.empty_frames = 0
+        else:
+            self.face_heights.append(None)
+            self.empty_frames += 1
+
+        self.frames_since_switch += 1
+        if self.frames_since_switch < self.switch_interval:
+            return
+        frame_long_side = max(frame_shape[0], frame_shape[1])
+        floor = self._smallest_useful_size(frame_long_side)
+        target = floor
+        for candidate in self.sizes:
+            if candidate >= floor and self._estimated_latency(candidate) <= self.budget_ms:
+                target = candidate
+        if target != self.current:
+            log.info("Detection size %d -> %d (latency %.0f ms, budget %.0f ms)", self.current, target,
+                     self.latency_ms.get(self.current, 0), self.budget_ms)
+            self.current = target
+            self.frames_since_switch = 0
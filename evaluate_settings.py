@@ -0,0 +1,236 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import cv2
+from app_settings import load_settings
+from bulk_import import read_directory
+from face_quality import FaceQualityGate
+from insightface_embeddings import InsightFaceEmbeddingExtractor
+from model_runtime import RuntimeProfile
+from pipeline_metrics import PipelineMetrics
+
+FAR_TARGETS = (1e-1, 1e-2, 1e-3, 1e-4)
+ROC_THRESHOLDS = np.linspace(0.0, 1.0, 201)
+
+
+def config_name(config):
+    return (f"{config['model']}_det{config['det_size']}_t{config['det_thresh']:g}"
+            f"{'_quality' if config['quality'] else ''}")
+
+
+def build_gallery(extractor, enrollment_rows):
+
+    # Same per-employee logic as extract_embeddings_for_all_employees, from files
+    gallery = {}
+    for row in enrollment_rows:
+        images = [cv2.imread(path) for path in row.image_paths]
+        entry = extractor.build_employee_embedding(images, row.employee_name)
+        if entry is not None:
+            gallery[row.employee_id] = entry
+    return gallery
+
+
+def evaluate_config(config, enrollment_rows, probes, settings):
+
+    # Runs in a worker process: loads its own model, enrolls, then recognises every probe
+    # through recognize_face_from_embedding and keeps all gallery scores per probe
+    profile = RuntimeProfile.from_dict(dict(settings['runtime'], intra_op_threads=config['threads']))
+    extractor = InsightFaceEmbeddingExtractor(None, model_name=config['model'],
+                                              det_size=(config['det_size'], config['det_size']),
+                                              det_thresh=config['det_thresh'], warmup_runs=1,
+                                              optimized_cache_dir=settings['model']['optimized_cache_dir'],
+                                              runtime_profile=profile)
+    gallery = build_gallery(extractor, enrollment_rows)
+    if not gallery:
+        raise RuntimeError("No faces found in the enrollment set")
+    quality_gate = FaceQualityGate.from_settings(dict(settings['quality'], enabled=True)) \
+        if config['quality'] else None
+    metrics = PipelineMetrics(window=max(len(probes), 1), dump_interval=0)
+
+    outcomes = []
+    started = time.perf_counter()
+    for employee_id, path in probes:
+        img = cv2.imread(path)
+        if img is None:
+            continue
+        results, _, _, face_info = extractor.recognize_face_from_embedding(
+            img, gallery, return_all=True, quality_gate=quality_gate, metrics=metrics)
+        if isinstance(results, list):
+            outcomes.append((employee_id, {r['emp_id']: float(r['similarity']) for r in results}, None))
+        else:
+            # No face, or skipped by the quality gate (then face_info says why)
+            reason = 'quality' if face_info and face_info.get('quality_reject') else 'no_face'
+            outcomes.append((employee_id, None, reason))
+    elapsed = time.perf_counter() - started
+
+    return {
+        'config': config,
+        'gallery_size': len(gallery),
+        'enrolled': sorted(gallery),
+        'outcomes': outcomes,
+        'seconds': elapsed,
+        'stages': metrics.snapshot()['stages'],
+    }
+
+
+def score_report(result, thresholds):
+
+    # Verification view: a probe against its own employee is a genuine pair, against
+    # anyone else an impostor pair. Identification view: what the kiosk would decide
+    # at each recognition threshold.
+    enrolled = set(result['enrolled'])
+    genuine, impostor = [], []
+    for employee_id, scores, _ in result['outcomes']:
+        if scores is None:
+            continue
+        for emp_id, score in scores.items():
+            (genuine if emp_id == employee_id else impostor).append(score)
+    genuine, impostor = np.asarray(genuine), np.asarray(impostor)
+
+    tar_at_far = {}
+    for far in FAR_TARGETS:
+        # Too few impostor pairs to estimate this FAR
+        if len(impostor) * far < 1 or not len(genuine):
+            tar_at_far[far] = None
+            continue
+        cut = np.quantile(impostor, 1 - far)
+        tar_at_far[far] = float(np.mean(genuine > cut))
+    roc = [(float(np.mean(impostor > t)) if len(impostor) else 0.0,
+            float(np.mean(genuine > t)) if len(genuine) else 0.0, float(t)) for t in ROC_THRESHOLDS]
+
+    total = len(result['outcomes'])
+    undetected = sum(1 for _, _, reason in result['outcomes'] if reason == 'no_face')
+    quality_skipped = sum(1 for _, _, reason in result['outcomes'] if reason == 'quality')
+    decisions = {}
+    for threshold in thresholds:
+        correct = wrong = rejected = 0
+        for employee_id, scores, _ in result['outcomes']:
+            best = max(scores.items(), key=lambda item: item[1]) if scores else None
+            if best is None or best[1] <= threshold:
+                rejected += 1
+            elif best[0] == employee_id:
+                correct += 1
+            else:
+                # Includes strangers (not enrolled) being accepted as someone
+                wrong += 1
+        decisions[threshold] = {
+            'correct_rate': correct / total if total else 0.0,
+            'false_accept_rate': wrong / total if total else 0.0,
+            'rejection_rate': rejected / total if total else 0.0,
+        }
+
+    return {
+        'name': config_name(result['config']),
+        'config': result['config'],
+        'probes': total,
+        'strangers': sum(1 for employee_id, _, _ in result['outcomes'] if employee_id not in enrolled),
+        'fps': total / result['seconds'] if result['seconds'] else 0.0,
+        'no_face_rate': undetected / total if total else 0.0,
+        'quality_skip_rate': quality_skipped / total if total else 0.0,
+        'tar_at_far': tar_at_far,
+        'decisions': decisions,
+        'stages': result['stages'],
+        'roc': roc,
+    }
+
+
+def print_table(reports, thresholds):
+
+    far_columns = "".join(f" {'TAR@' + format(far, 'g'):>10}" for far in FAR_TARGETS)
+    print(f"\n{'config':<36} {'fps':>6} {'det p50':>8} {'no face':>8} {'qual':>6}{far_columns}")
+    for report in reports:
+        det = report['stages'].get('detection', {}).get('p50')
+        tars = "".join(f" {'-' if tar is None else format(tar, '.3f'):>10}" for tar in report['tar_at_far'].values())
+        print(f"{report['name']:<36} {report['fps']:6.1f} {'-' if det is None else format(det, '.1f'):>8} "
+              f"{report['no_face_rate']:8.3f} {report['quality_skip_rate']:6.3f}{tars}")
+
+    print(f"\n{'config':<36} {'threshold':>9} {'correct':>8} {'false acc':>9} {'rejected':>9}")
+    for report in reports:
+        for threshold in thresholds:
+            decision = report['decisions'][threshold]
+            print(f"{report['name']:<36} {threshold:9.2f} {decision['correct_rate']:8.3f} "
+                  f"{decision['false_accept_rate']:9.3f} {decision['rejection_rate']:9.3f}")
+
+
+def write_outputs(reports, out_dir):
+
+    os.makedirs(out_dir, exist_ok=True)
+    for report in reports:
+        with open(os.path.join(out_dir, f"roc_{report['name']}.csv"), 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['far', 'tar', 'threshold'])
+            writer.writerows(report['roc'])
+    summary = [{key: value for key, value in report.items() if key != 'roc'} for report in reports]
+    with open(os.path.join(out_dir, 'results.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, default=str)
+    print(f"\nResults and ROC curves written to {out_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare recognition settings for accuracy and speed on labeled photos")
+    parser.add_argument('--enroll', required=True, help="folder of '<id>_<name>' subfolders used to build the gallery")
+    parser.add_argument('--probes', required=True,
+                        help="folder of '<id>_<name>' subfolders to recognise; ids not enrolled count as strangers")
+    parser.add_argument('--models', nargs='+', help="model packs (default: the configured one)")
+    parser.add_argument('--det-sizes', type=int, nargs='+', default=[320, 480, 640])
+    parser.add_argument('--det-threshes', type=float, nargs='+', help="default: the configured one")
+    parser.add_argument('--quality', nargs='+', choices=['on', 'off'], default=['off'],
+                        help="evaluate with and/or without the face quality gate")
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.4, 0.45, 0.5, 0.55, 0.6],
+                        help="recognition thresholds to report decisions for")
+    parser.add_argument('--workers', type=int, default=2,
+                        help="configurations evaluated in parallel, one model instance each")
+    parser.add_argument('--min-tar', type=float, help="accuracy bar: minimum TAR at --at-far")
+    parser.add_argument('--at-far', type=float, default=1e-3, choices=FAR_TARGETS)
+    parser.add_argument('--out-dir', default='evaluation')
+    args = parser.parse_args()
+
+    settings = load_settings()
+    enrollment_rows = [row for row in read_directory(args.enroll) if row.image_paths]
+    probes = [(row.employee_id, path) for row in read_directory(args.probes) for path in row.image_paths]
+    if not enrollment_rows or not probes:
+        parser.error("the enrollment and probe folders need images")
+    print(f"{len(enrollment_rows)} employees to enroll, {len(probes)} probe images")
+
+    # Cores are split between the workers so parallel runs do not distort each other's timings
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    configs = [{'model': model, 'det_size': det_size, 'det_thresh': det_thresh, 'quality': quality == 'on',
+                'threads': threads}
+               for model, det_size, det_thresh, quality in itertools.product(
+                   args.models or [settings['model']['name']], args.det_sizes,
+                   args.det_threshes or [settings['model']['det_thresh']], args.quality)]
+
+    reports = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(evaluate_config, config, enrollment_rows, probes, settings) for config in configs]
+        for config, future in zip(configs, futures):
+            try:
+                reports.append(score_report(future.result(), args.thresholds))
+                print(f"Finished {config_name(config)}")
+            except Exception as e:
+                print(f"Failed {config_name(config)}: {e}")
+    if not reports:
+        sys.exit(1)
+
+    reports.sort(key=lambda report: report['fps'], reverse=True)
+    print_table(reports, args.thresholds)
+    write_outputs(reports, args.out_dir)
+
+    if args.min_tar is not None:
+        passing = [report for report in reports
+                   if report['tar_at_far'][args.at_far] is not None and report['tar_at_far'][args.at_far] >= args.min_tar]
+        if not passing:
+            print(f"\nNo configuration reaches TAR {args.min_tar} at FAR {args.at_far:g}")
+            sys.exit(1)
+        print(f"\nFastest configuration with TAR >= {args.min_tar} at FAR {args.at_far:g}: {passing[0]['name']} "
+              f"({passing[0]['fps']:.1f} fps)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import math
+from collections import Counter
+import numpy as np
+import cv2
+
+BLUR_SAMPLE_HEIGHT = 64
+
+
+def face_pose(kps):
+
+    # Rough pose from the detector's 5 points (left eye, right eye, nose, left and right
+    # mouth corner), no extra model needed:
+    #   yaw   - nose offset from the eye midpoint, in inter-eye distances (0 = frontal)
+    #   pitch - nose height between the eye line (0) and the mouth line (1), ~0.5 frontal
+    #   roll  - angle of the eye line in degrees
+    left_eye, right_eye, nose, left_mouth, right_mouth = np.asarray(kps, dtype=np.float32)[:5]
+    eye_mid = (left_eye + right_eye) / 2
+    mouth_mid = (left_mouth + right_mouth) / 2
+    eye_vector = right_eye - left_eye
+    eye_distance = float(np.hypot(eye_vector[0], eye_vector[1])) or 1.0
+    roll = math.degrees(math.atan2(eye_vector[1], eye_vector[0]))
+    # Project the nose onto the eye axis so a tilted head does not read as a turned one
+    axis = eye_vector / eye_distance
+    yaw = float(np.dot(nose - eye_mid, axis)) / eye_distance
+    face_height = float(mouth_mid[1] - eye_mid[1]) or 1.0
+    pitch = float(nose[1] - eye_mid[1]) / face_height
+    return yaw, pitch, roll
+
+
+def blur_score(image, bbox):
+
+    # Variance of the Laplacian on the face crop, scaled to a fixed height so the score
+    # does not depend on how large the face is in the frame
+    h, w = image.shape[:2]
+    x1, y1 = max(int(bbox[0]), 0), max(int(bbox[1]), 0)
+    x2, y2 = min(int(bbox[2]), w), min(int(bbox[3]), h)
+    if x2 - x1 < 2 or y2 - y1 < 2:
+        return 0.0
+    gray = cv2.cvtColor(image[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+    scale = BLUR_SAMPLE_HEIGHT / gray.shape[0]
+    gray = cv2.resize(gray, (max(int(gray.shape[1] * scale), 1), BLUR_SAMPLE_HEIGHT), interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+class FaceQualityGate:
+
+    # Runs between detection and recognition; a face that fails any check never reaches
+    # the recognition model. Checks are ordered cheapest first and stop at the first failure.
+
+    REASONS = ('det_score', 'small', 'pose', 'blur')
+
+    def __init__(self, min_det_score=0.6, min_face_px=48, max_yaw=0.35, pitch_range=(0.2, 0.8),
+                 max_roll_deg=25.0, min_blur_var=40.0):
+        self.min_det_score = min_det_score
+        self.min_face_px = min_face_px
+        self.max_yaw = max_yaw
+        self.pitch_range = tuple(pitch_range)
+        self.max_roll_deg = max_roll_deg
+        self.min_blur_var = min_blur_var
+        self.counts = Counter()
+
+    @classmethod
+    def from_settings(cls, quality_settings):
+        if not quality_settings.get('enabled'):
+            return None
+        return cls(quality_settings['min_det_score'], quality_settings['min_face_px'],
+                   quality_settings['max_yaw'], quality_settings['pitch_range'],
+                   quality_settings['max_roll_deg'], quality_settings['min_blur_var'])
+
+    def check(self, image, bbox, kps, det_score):
+        # Returns None when the face may be recognised, otherwise the reason it was skipped
+        reason = self._reason(image, bbox, kps, det_score)
+        self.counts[reason or 'passed'] += 1
+        return reason
+
+    def _reason(self, image, bbox, kps, det_score):
+        if det_score < self.min_det_score:
+            return 'det_score'
+        if min(bbox[2] - bbox[0], bbox[3] - bbox[1]) < self.min_face_px:
+            return 'small'
+        if kps is not None:
+            yaw, pitch, roll = face_pose(kps)
+            if abs(yaw) > self.max_yaw or not self.pitch_range[0] <= pitch <= self.pitch_range[1] \
+                    or abs(roll) > self.max_roll_deg:
+                return 'pose'
+        if blur_score(image, bbox) < self.min_blur_var:
+            return 'blur'
+        return None
+
+    def snapshot(self):
+        return dict(self.counts)
+
+    def summary(self):
+        skipped = ", ".join(f"{reason} {self.counts[reason]}" for reason in self.REASONS if self.counts[reason])
+        return f"passed {self.counts['passed']}, skipped: {skipped or 'none'}"
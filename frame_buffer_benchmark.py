@@ -0,0 +1,165 @@
+import gc
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import cv2
+from insightface.utils import face_align
+from frame_buffers import BufferPool, ScratchBuffers
+
+# ArcFace input: 112x112 crop, (x - 127.5) / 127.5
+REC_SIZE = 112
+REC_MEAN = 127.5
+REC_STD = 127.5
+# The camera label's minimum size
+DISPLAY_SIZE = (800, 600)
+# Roughly where SCRFD puts the five landmarks on a centred face in a 1280x720 frame
+KPS = np.array([[590, 320], [690, 320], [640, 380], [600, 430], [680, 430]], dtype=np.float32)
+
+
+class SyntheticCamera:
+
+    # Stands in for cv2.VideoCapture: read() decodes into a new array, read(image=)
+    # into the caller's, which is what OpenCV does when the shapes match
+    def __init__(self, width, height, rng):
+        self.frames = [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(4)]
+        self.index = 0
+
+    def read(self, image=None):
+        source = self.frames[self.index]
+        self.index = (self.index + 1) % len(self.frames)
+        if image is None or image.shape != source.shape:
+            return True, source.copy()
+        np.copyto(image, source)
+        return True, image
+
+
+def display_size(frame):
+    h, w = frame.shape[:2]
+    scale = min(DISPLAY_SIZE[0] / w, DISPLAY_SIZE[1] / h)
+    return max(int(w * scale), 1), max(int(h * scale), 1)
+
+
+def fresh(state, array, *buffers):
+
+    # Counts array as a new allocation unless it lives in one of the buffers it was asked
+    # to fill; both paths pass every array-producing call through here
+    if not any(buffer is not None and np.may_share_memory(array, buffer) for buffer in buffers):
+        state['allocations'] += 1
+    return array
+
+
+def allocating_frame(camera, state):
+
+    # The loop as it was: every step returns a fresh array
+    _, frame = camera.read()
+    fresh(state, frame)
+    scale = 800 / max(frame.shape[:2])
+    small = fresh(state, cv2.resize(frame, (int(frame.shape[1] * scale), int(frame.shape[0] * scale))))
+    aligned = fresh(state, face_align.norm_crop(small, KPS * scale, REC_SIZE))
+    fresh(state, cv2.dnn.blobFromImage([aligned], 1.0 / REC_STD, (REC_SIZE, REC_SIZE), (REC_MEAN,) * 3,
+                                       swapRB=True))
+    rgb = fresh(state, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    fresh(state, cv2.resize(rgb, display_size(rgb), interpolation=cv2.INTER_AREA))
+
+
+def pooled_frame(camera, state):
+
+    # The loop now: pooled camera frames, scratch buffers for everything per frame. The
+    # buffers' own allocations are counted by the pool and ScratchBuffers; a frame the
+    # camera had to allocate is counted by fresh() (the app also adopts it into the pool)
+    pool, scratch, display_buffers = state['pool'], state['scratch'], state['display']
+    buffer = pool.acquire(state['shape']) if state['shape'] else None
+    _, frame = camera.read() if buffer is None else camera.read(image=buffer)
+    fresh(state, frame, buffer)
+    if buffer is None or not np.may_share_memory(frame, buffer):
+        pool.release(buffer)
+        state['shape'] = frame.shape
+    scale = 800 / max(frame.shape[:2])
+    new_size = (int(frame.shape[1] * scale), int(frame.shape[0] * scale))
+    resized = scratch.get('resize', (new_size[1], new_size[0], 3))
+    small = fresh(state, cv2.resize(frame, new_size, dst=resized), resized)
+    aligned = scratch.get('aligned', (REC_SIZE, REC_SIZE, 3))
+    fresh(state, cv2.warpAffine(small, face_align.estimate_norm(KPS * scale, REC_SIZE), (REC_SIZE, REC_SIZE),
+                                dst=aligned, borderValue=0.0), aligned)
+    blob = scratch.get('rec_blob', (1, 3, REC_SIZE, REC_SIZE), np.float32)
+    fresh(state, np.subtract(aligned[:, :, ::-1].transpose(2, 0, 1), np.float32(REC_MEAN), out=blob[0],
+                             dtype=np.float32), blob)
+    blob *= np.float32(1.0 / REC_STD)
+    width, height = display_size(frame)
+    display = display_buffers.get('display', (height, width, 3))
+    fresh(state, cv2.resize(frame, (width, height), dst=display, interpolation=cv2.INTER_AREA), display)
+    fresh(state, cv2.cvtColor(display, cv2.COLOR_BGR2RGB, dst=display), display)
+    # What the UI does once the frame is painted
+    pool.release(frame)
+
+
+def run(name, step, camera, frames, warmup):
+
+    state = {'pool': BufferPool(), 'scratch': ScratchBuffers(), 'display': ScratchBuffers(), 'shape': None,
+             'allocations': 0}
+    for _ in range(warmup):
+        step(camera, state)
+
+    timings = np.empty(frames)
+    gc.collect()
+    collections = sum(stats['collections'] for stats in gc.get_stats())
+    tracemalloc.start()
+    allocated = 0
+    for i in range(frames):
+        started = time.perf_counter()
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        step(camera, state)
+        _, peak = tracemalloc.get_traced_memory()
+        # Bytes allocated and freed again inside one frame
+        allocated += max(peak - before, 0)
+        timings[i] = (time.perf_counter() - started) * 1000
+    tracemalloc.stop()
+    collections = sum(stats['collections'] for stats in gc.get_stats()) - collections
+
+    p50, p99 = np.percentile(timings, (50, 99))
+    # Over warm-up and timed frames: arrays the calls allocated plus buffers the pools made
+    buffer_allocations = state['allocations'] + state['pool'].allocations + state['scratch'].allocations + \
+        state['display'].allocations
+    return {'path': name, 'p50_ms': float(p50), 'p99_ms': float(p99),
+            'transient_kb_per_frame': allocated / frames / 1024, 'gc_collections': collections,
+            'buffer_allocations': buffer_allocations}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare per-frame allocations of the allocating and the preallocated camera pipeline")
+    parser.add_argument('--source', help="camera index or video file; default: synthetic frames")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    if args.source is None:
+        camera = SyntheticCamera(args.width, args.height, np.random.default_rng(0))
+    else:
+        camera = cv2.VideoCapture(int(args.source) if args.source.isdigit() else args.source)
+        if not camera.isOpened():
+            parser.error(f"cannot open {args.source}")
+
+    rows = [run('allocating', allocating_frame, camera, args.frames, args.warmup),
+            run('pooled', pooled_frame, camera, args.frames, args.warmup)]
+    print(f"{'path':<12} {'p50 ms':>8} {'p99 ms':>8} {'KB/frame':>10} {'gc runs':>8} {'allocations':>12}")
+    for row in rows:
+        print(f"{row['path']:<12} {row['p50_ms']:8.2f} {row['p99_ms']:8.2f} {row['transient_kb_per_frame']:10.1f} "
+              f"{row['gc_collections']:>8} {row['buffer_allocations']:>12}")
+    print("Detection (SCRFD) and the ONNX sessions are not included; they allocate their own outputs.")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'source': args.source or 'synthetic', 'frames': args.frames, 'results': rows}, f, indent=2)
+    if isinstance(camera, cv2.VideoCapture):
+        camera.release()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import threading
+import numpy as np
+
+
+class BufferPool:
+
+    # Reusable frame arrays, keyed by shape and dtype. The camera loop reads into an
+    # acquired frame and whoever finishes with it last (normally the GUI after painting)
+    # releases it. A frame that is never released is just garbage collected; the pool
+    # then allocates a replacement, which shows up in `allocations`.
+
+    def __init__(self, max_per_shape=4):
+        self.max_per_shape = max_per_shape
+        self.free = {}
+        self.lock = threading.Lock()
+        self.allocations = 0
+        self.reuses = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        key = (tuple(shape), np.dtype(dtype))
+        with self.lock:
+            free = self.free.get(key)
+            if free:
+                self.reuses += 1
+                return free.pop()
+            self.allocations += 1
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, array):
+        # Only arrays that own their memory; a view would keep some other buffer alive
+        if array is None or array.base is not None or not array.flags.c_contiguous:
+            return
+        key = (array.shape, array.dtype)
+        with self.lock:
+            free = self.free.setdefault(key, [])
+            if len(free) < self.max_per_shape:
+                free.append(array)
+
+    def adopt(self, array):
+        # For arrays the pool did not hand out, e.g. the first frame from the camera
+        with self.lock:
+            self.allocations += 1
+        return array
+
+
+class ScratchBuffers(threading.local):
+
+    # Per-thread scratch arrays reused across calls: get('resize', shape) hands back the
+    # same array every time until the shape changes. Thread-local because one extractor
+    # serves the camera thread and the gallery rebuild worker at the same time.
+
+    def __init__(self):
+        self.buffers = {}
+        self.allocations = 0
+
+    def get(self, name, shape, dtype=np.uint8):
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+            buffer = self.buffers[name] = np.empty(shape, dtype=dtype)
+            self.allocations += 1
+        return buffer
@@ -0,0 +1,247 @@
+import time
+import queue
+import numpy as np
+from multiprocessing import shared_memory
+from app_logging import get_logger
+
+log = get_logger('transport')
+
+# Ring readers: the inference process and the GUI-side bridge that paints the frame
+INFERENCE_READER = 0
+DISPLAY_READER = 1
+READERS = 2
+
+
+def _attach_shared_memory(name):
+
+    # Only the creating process may unlink the block. Before Python 3.13 attaching
+    # always registers it with the resource tracker; spawned workers share the parent's
+    # tracker, where that registration is a no-op, so it must not be undone here.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class FrameRing:
+
+    # `slots` frame buffers of up to max_bytes each in one shared-memory block, after
+    # an int64 header: the sequence number last written to each slot, then the slot
+    # each reader currently holds (-1 for none). Frames never go through a pipe; the
+    # control queue only carries (seq, slot, shape) and a few counters. The writer skips held slots, and
+    # a reader checks the slot's sequence number again after use in case the writer
+    # lapped it anyway.
+
+    def __init__(self, shm, slots, max_bytes, readers, owner):
+        self.shm = shm
+        self.slots = slots
+        self.max_bytes = max_bytes
+        self.readers = readers
+        self.owner = owner
+        header_len = slots + readers
+        self.header = np.ndarray((header_len,), dtype=np.int64, buffer=shm.buf)
+        self.data_offset = header_len * 8
+        self.next = 0
+
+    @classmethod
+    def create(cls, slots, max_bytes, readers=READERS):
+        header_len = slots + readers
+        shm = shared_memory.SharedMemory(create=True, size=header_len * 8 + slots * max_bytes)
+        ring = cls(shm, slots, max_bytes, readers, owner=True)
+        ring.header[:slots] = -1
+        ring.header[slots:] = -1
+        return ring
+
+    @classmethod
+    def attach(cls, name, slots, max_bytes, readers=READERS):
+        return cls(_attach_shared_memory(name), slots, max_bytes, readers, owner=False)
+
+    @property
+    def spec(self):
+        # What a worker process needs to attach, all picklable
+        return self.shm.name, self.slots, self.max_bytes, self.readers
+
+    def view(self, slot, shape, dtype=np.uint8):
+        # A zero-copy array over the slot
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf,
+                          offset=self.data_offset + slot * self.max_bytes)
+
+    def acquire_slot(self):
+        # Writer side: the next slot in turn that no reader holds. With more slots than
+        # readers there is always one.
+        held = set(self.header[self.slots:].tolist())
+        for _ in range(self.slots):
+            slot = self.next
+            self.next = (self.next + 1) % self.slots
+            if slot not in held:
+                return slot
+        raise RuntimeError("Every frame ring slot is held by a reader")
+
+    def begin_write(self, shape, dtype=np.uint8):
+        # Returns (slot, writable view); the slot reads as invalid until commit()
+        if int(np.prod(shape)) * np.dtype(dtype).itemsize > self.max_bytes:
+            raise ValueError(f"Frame of shape {tuple(shape)} does not fit a {self.max_bytes}-byte ring slot")
+        slot = self.acquire_slot()
+        self.header[slot] = -1
+        return slot, self.view(slot, shape, dtype)
+
+    def commit(self, slot, seq):
+        self.header[slot] = seq
+
+    def write(self, frame, seq):
+        slot, target = self.begin_write(frame.shape, frame.dtype)
+        np.copyto(target, frame)
+        self.commit(slot, seq)
+        return slot
+
+    def hold(self, reader, slot, seq):
+        # Reader side: returns False if the slot no longer holds frame `seq`
+        self.header[self.slots + reader] = slot
+        return self.header[slot] == seq
+
+    def still_valid(self, slot, seq):
+        return self.header[slot] == seq
+
+    def release(self, reader):
+        self.header[self.slots + reader] = -1
+
+    def close(self):
+        # Arrays over the buffer must be gone before the mapping can be closed
+        self.header = None
+        try:
+            self.shm.close()
+        except BufferError:
+            log.warning("Frame ring %s still has live views; leaving it mapped", self.shm.name)
+        if self.owner:
+            self.shm.unlink()
+
+
+def capture_main(source, capture_settings, metrics_enabled, ring_spec, frames_queue, stop_event):
+
+    # Capture process: decode frames into the ring and announce them. Once the frame
+    # size is known the camera decodes straight into a ring slot, so there is no copy;
+    # only the first frame and one after a resolution change are copied in. Each
+    # announcement carries the capture timings and counters (frame_copies, capture_failed,
+    # camera_reopens) since the previous one. When inference falls behind the queue is
+    # full and the frame is dropped here; its metrics go out with the next announcement.
+    from camera_capture import CaptureConfig, CameraSource
+    from pipeline_metrics import FrameMetrics, NULL_METRICS
+    ring = FrameRing.attach(*ring_spec)
+    metrics = FrameMetrics() if metrics_enabled else NULL_METRICS
+    camera = CameraSource(source, CaptureConfig.from_dict(capture_settings), metrics)
+    camera.open()
+    seq = 0
+    dropped = 0
+    shape = None
+    try:
+        while not stop_event.is_set():
+            started = time.perf_counter()
+            try:
+                if shape is None:
+                    ret, frame = camera.read()
+                    if ret:
+                        slot = ring.write(frame, seq + 1)
+                        metrics.incr('frame_copies')
+                else:
+                    slot, target = ring.begin_write(shape)
+                    ret, frame = camera.read(image=target)
+                    if ret and not np.may_share_memory(frame, target):
+                        # The camera changed resolution and OpenCV allocated a new frame
+                        slot = ring.write(frame, seq + 1)
+                        metrics.incr('frame_copies')
+                    elif ret:
+                        ring.commit(slot, seq + 1)
+            except ValueError as e:
+                log.error("%s", e)
+                break
+            metrics.record('capture', started)
+            if not ret:
+                metrics.incr('capture_failed')
+                time.sleep(0.01)
+                continue
+            seq += 1
+            shape = frame.shape
+            capture_metrics = metrics.take()
+            try:
+                frames_queue.put_nowait((seq, slot, shape, dropped, capture_metrics))
+                dropped = 0
+            except queue.Full:
+                dropped += 1
+                metrics.merge(capture_metrics)
+    finally:
+        camera.release()
+        ring.close()
+
+
+def inference_main(settings, embeddings_file, source, ring_spec, frames_queue, results_queue, commands_queue,
+                   stop_event):
+
+    # Inference process: owns its own model sessions, gallery, detection controller and
+    # quality gate, so none of their NumPy work holds the GUI process's GIL. Each frame's
+    # stage timings and counters, with those of the capture process, go back with its
+    # result for the GUI's PipelineMetrics.
+    from app_logging import setup_logging
+    from pipeline_metrics import FrameMetrics, NULL_METRICS
+    from insightface_embeddings import InsightFaceEmbeddingExtractor, load_embeddings_file
+    from detection_controller import AdaptiveDetectionController
+    from face_quality import FaceQualityGate
+    from roi import roi_for_source
+
+    log_listener = setup_logging(settings['logging'])
+    ring = FrameRing.attach(*ring_spec)
+    try:
+        extractor = InsightFaceEmbeddingExtractor.from_settings(None, settings)
+        gallery = load_embeddings_file(embeddings_file) or {}
+        controller = AdaptiveDetectionController.from_settings(settings['detection'])
+        quality_gate = FaceQualityGate.from_settings(settings['quality'])
+        roi = roi_for_source(source, settings['camera']['roi_config'])
+        metrics = FrameMetrics() if settings['metrics']['enabled'] else NULL_METRICS
+        results_queue.put(('ready', len(gallery)))
+
+        while not stop_event.is_set():
+            try:
+                if commands_queue.get_nowait() == 'reload_gallery':
+                    gallery = load_embeddings_file(embeddings_file) or {}
+            except queue.Empty:
+                pass
+            try:
+                seq, slot, shape, dropped, capture_metrics = frames_queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            metrics.merge(capture_metrics)
+            # Always work on the newest frame; older announced ones count as dropped
+            while True:
+                try:
+                    seq, slot, shape, more_dropped, capture_metrics = frames_queue.get_nowait()
+                    dropped += more_dropped + 1
+                    metrics.merge(capture_metrics)
+                except queue.Empty:
+                    break
+
+            if not ring.hold(INFERENCE_READER, slot, seq):
+                ring.release(INFERENCE_READER)
+                results_queue.put(('torn', seq, dropped, metrics.take()))
+                continue
+            started = time.perf_counter()
+            det_sizes = controller.sizes_to_try() if controller else None
+            employee_id, similarity, employee_name, face_info = extractor.recognize_face_from_embedding(
+                ring.view(slot, shape), gallery, det_sizes=det_sizes, quality_gate=quality_gate, roi=roi,
+                metrics=metrics)
+            latency_ms = (time.perf_counter() - started) * 1000
+            valid = ring.still_valid(slot, seq)
+            ring.release(INFERENCE_READER)
+            if not valid:
+                results_queue.put(('torn', seq, dropped, metrics.take()))
+                continue
+            if controller:
+                controller.observe(shape, latency_ms, face_info)
+            metrics.set_gauge('buffer_allocations', extractor.scratch.allocations)
+            results_queue.put(('frame', seq, slot, shape, dropped, latency_ms, employee_id,
+                               None if similarity is None else float(similarity), employee_name, face_info,
+                               metrics.take()))
+    except Exception as e:
+        log.exception("Inference process failed: %s", e)
+        results_queue.put(('failed', str(e)))
+    finally:
+        ring.close()
+        log_listener.stop()
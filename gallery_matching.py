@@ -0,0 +1,93 @@
+import numpy as np
+
+
+def _clip_similarity(similarity):
+    # Same range the original compare_embeddings reported
+    return max(0.0, min(1.0, similarity))
+
+
+class LoopMatcher:
+
+    # The original matcher: one cosine similarity per employee in Python, then a full
+    # sort. Kept as the reference that matching_benchmark compares the others against.
+
+    def __init__(self, embeddings_data):
+        self.embeddings_data = embeddings_data
+
+    def __len__(self):
+        return len(self.embeddings_data)
+
+    def match(self, query, top_k=None):
+        # [(employee_id, employee_name, similarity)], best first
+        query = query / np.linalg.norm(query)
+        results = []
+        for emp_id, data in self.embeddings_data.items():
+            template = data['avg_embedding']
+            similarity = float(np.dot(query, template / np.linalg.norm(template)))
+            results.append((emp_id, data['employee_name'], _clip_similarity(similarity)))
+        results.sort(key=lambda result: result[2], reverse=True)
+        return results if top_k is None else results[:top_k]
+
+
+class MatrixMatcher:
+
+    # The gallery as one contiguous float32 (n, 512) matrix of unit-norm templates, built
+    # once per gallery. A query is a single matrix-vector product; top-k uses
+    # argpartition so only k scores are sorted. With use_templates every stored face is
+    # a row and an employee scores as their best template instead of the average.
+
+    def __init__(self, embeddings_data, use_templates=False):
+        self.ids = list(embeddings_data)
+        self.names = [embeddings_data[emp_id]['employee_name'] for emp_id in self.ids]
+        self.offsets = None
+        if not self.ids:
+            self.matrix = np.zeros((0, 0), dtype=np.float32)
+            return
+        if hasattr(embeddings_data, 'templates'):
+            # A CompactGallery's average matrix is already unit-norm and contiguous; share it
+            if use_templates:
+                self.offsets = embeddings_data.offsets[:-1]
+                matrix = embeddings_data.templates
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                self.matrix = np.ascontiguousarray(matrix / norms, dtype=np.float32)
+            else:
+                self.matrix = embeddings_data.avg
+            return
+        if use_templates:
+            rows = [np.asarray(embeddings_data[emp_id]['all_embeddings'], dtype=np.float32) for emp_id in self.ids]
+            # reduceat needs each employee's rows to be contiguous and their start offsets
+            self.offsets = np.cumsum([0] + [len(templates) for templates in rows[:-1]])
+            matrix = np.concatenate(rows)
+        else:
+            matrix = np.stack([np.asarray(embeddings_data[emp_id]['avg_embedding'], dtype=np.float32)
+                               for emp_id in self.ids])
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        return self.matrix.nbytes
+
+    def scores(self, query):
+        query = np.asarray(query, dtype=np.float32)
+        scores = self.matrix @ (query / np.linalg.norm(query))
+        if self.offsets is not None:
+            scores = np.maximum.reduceat(scores, self.offsets)
+        return scores
+
+    def match(self, query, top_k=None):
+        # [(employee_id, employee_name, similarity)], best first
+        if not self.ids:
+            return []
+        scores = self.scores(query)
+        if top_k is None or top_k >= len(scores):
+            order = np.argsort(-scores, kind='stable')
+        else:
+            candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+            order = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(self.ids[i], self.names[i], _clip_similarity(float(scores[i]))) for i in order]
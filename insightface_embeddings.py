@@ -1,138 +1,353 @@
 import cv2
 import numpy as np
 from database_helper import DatabaseHelper
+import model_runtime
+from pipeline_metrics import NULL_METRICS
+from gallery_matching import MatrixMatcher
+from compact_gallery import CompactGallery, gallery_to_dict
+from frame_buffers import ScratchBuffers
+from app_logging import get_logger
 import pickle
 import os
-from insightface.app import FaceAnalysis
+import time
+import logging
+
+# Per-frame messages go through logging (rate-limited, off the camera thread) instead of print
+log = get_logger('recognition')
+
+
+def load_embeddings_file(filename='embeddings_insightface.pkl'):
+
+    # Module-level so the gallery can be loaded while the model is still being prepared.
+    # The file holds plain dicts; in memory the gallery is kept as a CompactGallery.
+    if os.path.exists(filename):
+        try:
+            with open(filename, 'rb') as f:
+                embeddings = CompactGallery.from_dict(pickle.load(f))
+            print(f"Embeddings loaded from {filename}")
+            return embeddings
+        except Exception as e:
+            print(f"Error loading embeddings: {e}")
+    else:
+        print(f"Embeddings file {filename} not found")
+    return None
 
 
 class InsightFaceEmbeddingExtractor:
 
 
-    def __init__(self, db_helper, model_name='buffalo_l'):
+    def __init__(self, db_helper, model_name='buffalo_l', det_size=(640, 640), det_thresh=0.5,
+                 warmup_runs=2, optimized_cache_dir=None, runtime_profile=None,
+                 model_variant=None, variants_dir='model_variants', require_approval=True,
+                 extra_det_sizes=()):
 
         self.db_helper = db_helper
+        self.det_size = tuple(det_size)
+        # Other detector input sizes used at runtime (adaptive detection); warmed up too
+        self.extra_det_sizes = [tuple(size) for size in extra_det_sizes if tuple(size) != self.det_size]
+        self.warmup_ms = None
+        self.runtime_profile = runtime_profile or model_runtime.RuntimeProfile()
+        self.runtime_profile.apply_opencv()
+        self.model_variant = None
 
         try:
-            self.app = FaceAnalysis(
-                name=model_name, 
-                providers=['CUDAExecutionProvider', 'CPUExecutionProvider']
-            )
-            self.app.prepare(ctx_id=0, det_thresh=0.5, det_size=(640, 640))
-            print("InsightFace model loaded successfully")
+            # insightface is imported inside model_runtime.load_face_analysis so importing this
+            # module stays cheap; it pulls in onnxruntime, most of the model-load phase at startup
+            root = '~/.insightface'
+            if model_variant:
+                # Quantized variants live in their own FaceAnalysis root, made by quantize_models.py
+                variant_root = model_runtime.variant_model_root(variants_dir, model_name, model_variant,
+                                                                require_approval)
+                if variant_root:
+                    root = variant_root
+                    model_name = f"{model_name}_{model_variant}"
+                    self.model_variant = model_variant
+            model_dir = os.path.join(os.path.expanduser(root), 'models', model_name)
+            cache_root = None
+            if optimized_cache_dir:
+                cache_root = model_runtime.cached_model_root(optimized_cache_dir, model_name, model_dir,
+                                                             self.runtime_profile)
+            self.app = model_runtime.load_face_analysis(model_name, cache_root or root, self.runtime_profile,
+                                                        cache_dir=optimized_cache_dir,
+                                                        pre_optimized=cache_root is not None)
+            # The sessions already run on the profile's providers. A negative ctx_id would make
+            # prepare() call set_providers, which builds every session a second time.
+            self.app.prepare(ctx_id=0, det_thresh=det_thresh, det_size=self.det_size)
+            print(f"InsightFace model {model_name} loaded successfully"
+                  + (" (optimized graph cache)" if cache_root else ""))
+            print(f"Runtime profile: {self.runtime_profile.describe()}")
         except Exception as e:
             print(f"Error loading InsightFace model: {e}")
             raise
 
+        if warmup_runs:
+            self.warm_up(warmup_runs)
+
         self.embeddings_cache = {}
         self.threshold = 0.50  
         self.face_info_cache = {}
+        self.matcher = None
+        self.matcher_gallery = None
+        # Resized frame, aligned crop and recognition input tensor, reused every frame
+        self.scratch = ScratchBuffers()
+
+    @classmethod
+    def from_settings(cls, db_helper, settings, warmup=True):
+
+        # settings as returned by app_settings.load_settings
+        model_settings = settings['model']
+        detection_settings = settings['detection']
+        extra_det_sizes = [(size, size) for size in detection_settings['candidate_sizes']] \
+            if detection_settings['adaptive'] else ()
+        return cls(db_helper, model_name=model_settings['name'], det_size=model_settings['det_size'],
+                   det_thresh=model_settings['det_thresh'],
+                   warmup_runs=model_settings['warmup_runs'] if warmup else 0,
+                   optimized_cache_dir=model_settings['optimized_cache_dir'],
+                   runtime_profile=model_runtime.RuntimeProfile.from_dict(settings['runtime']),
+                   model_variant=model_settings['variant'], variants_dir=model_settings['variants_dir'],
+                   extra_det_sizes=extra_det_sizes)
+
+    def warm_up(self, runs=2):
+
+        started = time.perf_counter()
+        timings = model_runtime.warm_up_models(self.app, self.det_size, runs, self.extra_det_sizes)
+        self.warmup_ms = (time.perf_counter() - started) * 1000
+        details = ", ".join(f"{task} {ms:.0f} ms" for task, ms in timings.items())
+        print(f"Model warm-up finished in {self.warmup_ms:.0f} ms (first run: {details})")
+        return self.warmup_ms
+
+    def _detect(self, image, det_size, roi):
+
+        if roi is None:
+            return self.app.det_model.detect(image, input_size=tuple(det_size), max_num=0, metric='default')
+
+        # Detect on the ROI's bounding rectangle at a proportionally smaller input, then
+        # shift boxes and keypoints back into frame coordinates
+        crop, (x, y) = roi.crop(image)
+        if crop.shape[0] < 2 or crop.shape[1] < 2:
+            return np.zeros((0, 5), dtype=np.float32), None
+        bboxes, kpss = self.app.det_model.detect(crop, input_size=roi.scale_det_size(det_size, image.shape),
+                                                 max_num=0, metric='default')
+        bboxes[:, 0:4] += (x, y, x, y)
+        if kpss is not None:
+            kpss += (x, y)
+        if not roi.is_rect and bboxes.shape[0] > 0:
+            inside = [roi.contains((b[0] + b[2]) / 2, (b[1] + b[3]) / 2, image.shape) for b in bboxes]
+            bboxes = bboxes[inside]
+            kpss = kpss[inside] if kpss is not None else None
+        return bboxes, kpss
+
+    def detect_largest_face(self, image, det_sizes=None, quality_gate=None, roi=None, metrics=NULL_METRICS):
+
+        # Same as FaceAnalysis.get, but the detector input size can be chosen per call and
+        # only the largest face goes through the landmark, attribute and recognition models.
+        # det_sizes are tried in order until one finds a face. A face rejected by
+        # quality_gate is returned without running any of the other models. With a roi,
+        # only faces inside it are detected; coordinates are always in the full frame.
+        # Returns (face or None, det_size used, number of sizes tried, reject reason).
+        from insightface.app.common import Face
+        from insightface.utils import face_align
+
+        det_sizes = list(det_sizes or [self.det_size])
+        for attempt, det_size in enumerate(det_sizes, start=1):
+            started = time.perf_counter()
+            bboxes, kpss = self._detect(image, det_size, roi)
+            metrics.record('detection', started)
+            if bboxes.shape[0] > 0:
+                break
+        else:
+            return None, tuple(det_sizes[-1]), len(det_sizes), None
+
+        areas = (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
+        i = int(np.argmax(areas))
+        face = Face(bbox=bboxes[i, 0:4], kps=kpss[i] if kpss is not None else None, det_score=bboxes[i, 4])
+        if quality_gate is not None:
+            reason = quality_gate.check(image, face.bbox, face.kps, face.det_score)
+            if reason:
+                return face, tuple(det_size), attempt, reason
+        for taskname, model in self.app.models.items():
+            if taskname == 'detection':
+                continue
+            started = time.perf_counter()
+            if taskname == 'recognition':
+                # ArcFaceONNX.get split in two so alignment and embedding are timed separately,
+                # writing the crop and the input tensor into reused buffers
+                size = model.input_size[0]
+                aligned = self.scratch.get('aligned', (size, size, 3))
+                cv2.warpAffine(image, face_align.estimate_norm(face.kps, size), (size, size), dst=aligned,
+                               borderValue=0.0)
+                metrics.record('alignment', started)
+                started = time.perf_counter()
+                face.embedding = self._embed(model, aligned).flatten()
+                metrics.record('embedding', started)
+            else:
+                model.get(image, face)
+                metrics.record('attributes', started)
+        return face, tuple(det_size), attempt, None
 
-    def extract_face_embedding(self, image):
+    def _embed(self, model, aligned):
+
+        # Same as ArcFaceONNX.get_feat (blobFromImage with swapRB, mean and 1/std), but
+        # the NCHW float tensor is filled in place instead of allocated per face
+        size = model.input_size[0]
+        blob = self.scratch.get('rec_blob', (1, 3, size, size), np.float32)
+        np.subtract(aligned[:, :, ::-1].transpose(2, 0, 1), np.float32(model.input_mean), out=blob[0],
+                    dtype=np.float32)
+        blob *= np.float32(1.0 / model.input_std)
+        return model.session.run(model.output_names, {model.input_name: blob})[0]
+
+    def extract_face_embedding(self, image, det_sizes=None, quality_gate=None, roi=None, metrics=NULL_METRICS):
 
         try:
+            scale = 1.0
             if image.shape[0] > 1000 or image.shape[1] > 1000:
+                started = time.perf_counter()
                 scale = 800 / max(image.shape[0], image.shape[1])
                 new_width = int(image.shape[1] * scale)
                 new_height = int(image.shape[0] * scale)
-                image = cv2.resize(image, (new_width, new_height))
+                resized = self.scratch.get('resize', (new_height, new_width) + image.shape[2:], image.dtype)
+                image = cv2.resize(image, (new_width, new_height), dst=resized)
+                metrics.record('resize', started)
+                metrics.incr('frame_copies')
 
-            faces = self.app.get(image)
+            face, det_size, attempts, reject_reason = self.detect_largest_face(image, det_sizes, quality_gate,
+                                                                               roi, metrics)
 
-            if len(faces) == 0:
-                print("No faces detected in image")
+            if face is None:
+                metrics.incr('no_face')
+                log.debug("No faces detected in image")
                 return None, None
 
-            face = max(faces, key=lambda f: f.bbox[2] * f.bbox[3])
+            metrics.incr('faces')
+            # Detection ran on the shrunk image; face_info is in the caller's frame coordinates
+            bbox = face.bbox / scale
+            kps = face.kps / scale if face.kps is not None else None
+            if reject_reason:
+                metrics.incr('quality_rejected')
+                return None, {'bbox': bbox, 'kps': kps, 'det_score': face.det_score,
+                              'det_size': det_size, 'det_attempts': attempts, 'quality_reject': reject_reason}
+
             embedding = face.embedding
 
             face_info = {
-                'bbox': face.bbox,
-                'kps': face.kps,
+                'bbox': bbox,
+                'kps': kps,
                 'det_score': face.det_score,
                 'gender': face.gender if hasattr(face, 'gender') else None,
-                'age': face.age if hasattr(face, 'age') else None
+                'age': face.age if hasattr(face, 'age') else None,
+                'det_size': det_size,
+                'det_attempts': attempts
             }
 
-            print(f"Face detected with confidence: {face.det_score:.3f}")
+            log.debug("Face detected with confidence: %.3f", face.det_score)
             return embedding, face_info
             
         except Exception as e:
-            print(f"Error extracting embedding: {e}")
+            log.exception("Error extracting embedding: %s", e)
             return None, None
 
-    def extract_embeddings_for_all_employees(self):
+    def extract_embeddings_for_all_employees(self, db_helper=None, progress_callback=None, cancel_check=None):
 
-        employees = self.db_helper.get_all_employees()
+        # db_helper lets a worker thread use its own connection; cancel_check returning
+        # True stops the extraction and None is returned instead of a partial gallery
+        db_helper = db_helper or self.db_helper
+        employees = db_helper.get_all_employees()
         embeddings_data = {}
         
         print(f"Starting embedding extraction for {len(employees)} employees...")
 
         for idx, employee in enumerate(employees):
+            if cancel_check and cancel_check():
+                print("Embedding extraction cancelled")
+                return None
+            if progress_callback:
+                progress_callback(idx, len(employees))
+
             emp_id = employee['employee_id']
             print(f"Processing employee {idx+1}/{len(employees)}: {emp_id} - {employee['employee_name']}")
             
-            images = self.db_helper.get_employee_images(emp_id)
+            images = db_helper.get_employee_images(emp_id)
 
             if not images:
                 print(f"  No images found for employee {emp_id}")
                 continue
 
-            employee_embeddings = []
-            valid_faces = []
-
-            for i, img in enumerate(images):
-                if img is not None:
-                    embedding, face_info = self.extract_face_embedding(img)
-                    if embedding is not None:
-                        employee_embeddings.append(embedding)
-                        valid_faces.append(face_info)
-                        print(f"  Image {i+1}: Face found and embedding extracted")
-                    else:
-                        print(f"  Image {i+1}: No face detected")
-                else:
-                    print(f"  Image {i+1}: Image data is None")
-
-            if employee_embeddings:
-                avg_embedding = np.mean(employee_embeddings, axis=0)
-                avg_embedding = avg_embedding / np.linalg.norm(avg_embedding)
-
-                embeddings_data[emp_id] = {
-                    'avg_embedding': avg_embedding,
-                    'all_embeddings': employee_embeddings,
-                    'employee_name': employee['employee_name'],
-                    'face_info': valid_faces,
-                    'num_faces': len(employee_embeddings)
-                }
-                print(f"  Successfully created embeddings from {len(employee_embeddings)} faces")
+            entry = self.build_employee_embedding(images, employee['employee_name'])
+            if entry is not None:
+                embeddings_data[emp_id] = entry
+                print(f"  Successfully created embeddings from {entry['num_faces']} faces")
             else:
                 print(f"  Warning: No valid faces found for employee {emp_id}")
 
+        if progress_callback:
+            progress_callback(len(employees), len(employees))
         print(f"Embedding extraction completed. Processed {len(embeddings_data)} employees successfully")
-        return embeddings_data
+        return CompactGallery.from_dict(embeddings_data)
+
+    def update_embeddings_for_employees(self, embeddings_data, employee_ids, db_helper=None):
+
+        # Returns a new gallery; the one passed in may still be in use by the camera thread
+        db_helper = db_helper or self.db_helper
+        updated = dict(embeddings_data or {})
+        names = {employee['employee_id']: employee['employee_name'] for employee in db_helper.get_all_employees()}
+
+        for emp_id in employee_ids:
+            updated.pop(emp_id, None)
+            if emp_id not in names:
+                print(f"Removed embeddings for employee {emp_id}")
+                continue
+            images = db_helper.get_employee_images(emp_id)
+            entry = self.build_employee_embedding(images, names[emp_id]) if images else None
+            if entry is not None:
+                updated[emp_id] = entry
+                print(f"Updated embeddings for employee {emp_id} from {entry['num_faces']} faces")
+            else:
+                print(f"Warning: No valid faces found for employee {emp_id}")
+        return CompactGallery.from_dict(updated)
+
+    def build_employee_embedding(self, images, employee_name):
+
+        employee_embeddings = []
+        valid_faces = []
+
+        for i, img in enumerate(images):
+            if img is not None:
+                embedding, face_info = self.extract_face_embedding(img)
+                if embedding is not None:
+                    employee_embeddings.append(embedding)
+                    valid_faces.append(face_info)
+                    print(f"  Image {i+1}: Face found and embedding extracted")
+                else:
+                    print(f"  Image {i+1}: No face detected")
+            else:
+                print(f"  Image {i+1}: Image data is None")
+
+        if not employee_embeddings:
+            return None
+
+        avg_embedding = np.mean(employee_embeddings, axis=0)
+        avg_embedding = avg_embedding / np.linalg.norm(avg_embedding)
+
+        return {
+            'avg_embedding': avg_embedding,
+            'all_embeddings': employee_embeddings,
+            'employee_name': employee_name,
+            'face_info': valid_faces,
+            'num_faces': len(employee_embeddings)
+        }
 
     def save_embeddings(self, embeddings_data, filename='embeddings_insightface.pkl'):
 
         try:
             with open(filename, 'wb') as f:
-                pickle.dump(embeddings_data, f)
+                pickle.dump(gallery_to_dict(embeddings_data), f)
             print(f"Embeddings saved to {filename}")
         except Exception as e:
             print(f"Error saving embeddings: {e}")
 
     def load_embeddings(self, filename='embeddings_insightface.pkl'):
 
-        if os.path.exists(filename):
-            try:
-                with open(filename, 'rb') as f:
-                    embeddings = pickle.load(f)
-                print(f"Embeddings loaded from {filename}")
-                return embeddings
-            except Exception as e:
-                print(f"Error loading embeddings: {e}")
-        else:
-            print(f"Embeddings file {filename} not found")
-        return None
+        return load_embeddings_file(filename)
 
     def compare_embeddings(self, embedding1, embedding2):
 
@@ -152,34 +367,41 @@ class InsightFaceEmbeddingExtractor:
             print(f"Error comparing embeddings: {e}")
             return 0.0
 
-    def recognize_face_from_embedding(self, frame, embeddings_data, return_all=False):
+    def gallery_matcher(self, embeddings_data):
+
+        # Galleries are replaced rather than edited in place, so the matrix is only
+        # rebuilt when a different gallery object comes in
+        if self.matcher is None or self.matcher_gallery is not embeddings_data \
+                or len(self.matcher) != len(embeddings_data):
+            self.matcher = MatrixMatcher(embeddings_data)
+            self.matcher_gallery = embeddings_data
+        return self.matcher
+
+    def recognize_face_from_embedding(self, frame, embeddings_data, return_all=False, det_sizes=None,
+                                      quality_gate=None, roi=None, metrics=NULL_METRICS):
 
         try:
-            frame_embedding, face_info = self.extract_face_embedding(frame)
+            frame_embedding, face_info = self.extract_face_embedding(frame, det_sizes, quality_gate, roi, metrics)
 
             if frame_embedding is None:
-                return None, None, None, None
+                # face_info is set when a face was found but skipped by the quality gate
+                return None, None, None, face_info
 
+            started = time.perf_counter()
             # Normalize the frame embedding
             frame_embedding = frame_embedding / np.linalg.norm(frame_embedding)
 
-            results = []
-
-            # Compare with all stored embeddings
-            for emp_id, data in embeddings_data.items():
-                similarity = self.compare_embeddings(frame_embedding, data['avg_embedding'])
-                results.append({
-                    'emp_id': emp_id,
-                    'employee_name': data['employee_name'],
-                    'similarity': similarity
-                })
-
-            results.sort(key=lambda x: x['similarity'], reverse=True)
+            # Only the best match is needed per frame, plus a few for the debug log
+            top_k = None if return_all else 3 if log.isEnabledFor(logging.DEBUG) else 1
+            results = [{'emp_id': emp_id, 'employee_name': employee_name, 'similarity': similarity}
+                       for emp_id, employee_name, similarity in
+                       self.gallery_matcher(embeddings_data).match(frame_embedding, top_k)]
+            metrics.record('gallery_scan', started)
 
-            if results:
-                print("Top matches:")
-                for i, result in enumerate(results[:3]):
-                    print(f"  {i+1}. {result['employee_name']} ({result['emp_id']}): {result['similarity']:.3f}")
+            if results and log.isEnabledFor(logging.DEBUG):
+                log.debug("Top matches: %s", ", ".join(
+                    f"{result['employee_name']} ({result['emp_id']}) {result['similarity']:.3f}"
+                    for result in results[:3]))
 
             if return_all:
                 return results, face_info, frame_embedding, None
@@ -187,15 +409,19 @@ class InsightFaceEmbeddingExtractor:
             best_result = results[0] if results else None
 
             if best_result and best_result['similarity'] > self.threshold:
-                print(f"✅ MATCH FOUND: {best_result['employee_name']} (Similarity: {best_result['similarity']:.3f})")
+                metrics.incr('matches')
+                log.info("Match: %s (%s) similarity %.3f", best_result['employee_name'], best_result['emp_id'],
+                         best_result['similarity'],
+                         extra={'employee_id': best_result['emp_id'], 'similarity': float(best_result['similarity'])})
                 return best_result['emp_id'], best_result['similarity'], best_result['employee_name'], face_info
             elif best_result:
-                print(f"❌ Below threshold: {best_result['similarity']:.3f} <= {self.threshold}")
+                metrics.incr('below_threshold')
+                log.debug("Below threshold: %.3f <= %.2f", best_result['similarity'], self.threshold)
 
             return None, None, None, face_info
             
         except Exception as e:
-            print(f"Error in face recognition: {e}")
+            log.exception("Error in face recognition: %s", e)
             return None, None, None, None
 
     def get_face_details(self, frame):
@@ -0,0 +1,150 @@
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+from gallery_matching import LoopMatcher, MatrixMatcher
+
+EMBEDDING_DIM = 512
+QUICK_SIZES = [100, 1000, 10000]
+
+
+def synthetic_gallery(size, templates, rng, noise=0.35):
+
+    # Same layout as embeddings_insightface.pkl. Each identity is a random unit vector;
+    # its templates are noisy copies, as several photos of one person would be.
+    # Templates are views into one array so a 1M gallery does not also pay for 3M objects.
+    centers = rng.standard_normal((size, EMBEDDING_DIM), dtype=np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    faces = rng.standard_normal((size, templates, EMBEDDING_DIM), dtype=np.float32)
+    faces *= noise / np.sqrt(EMBEDDING_DIM)
+    faces += centers[:, None, :]
+    faces /= np.linalg.norm(faces, axis=2, keepdims=True)
+    averages = faces.mean(axis=1)
+    averages /= np.linalg.norm(averages, axis=1, keepdims=True)
+    gallery = {}
+    for i in range(size):
+        gallery[f"EMP{i:07d}"] = {
+            'avg_embedding': averages[i],
+            'all_embeddings': faces[i],
+            'employee_name': f"Employee {i}",
+            'face_info': [],
+            'num_faces': templates,
+        }
+    return gallery, centers
+
+
+def synthetic_queries(centers, count, rng, impostor_share=0.2, noise=0.35):
+
+    # Mostly enrolled people seen again, plus some strangers who should match nobody
+    enrolled = rng.integers(0, len(centers), count)
+    queries = centers[enrolled] + noise / np.sqrt(EMBEDDING_DIM) * \
+        rng.standard_normal((count, EMBEDDING_DIM), dtype=np.float32)
+    impostors = rng.random(count) < impostor_share
+    queries[impostors] = rng.standard_normal((int(impostors.sum()), EMBEDDING_DIM), dtype=np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def build_matcher(name, gallery):
+
+    # Returns the matcher, build time and the peak memory allocated while building it
+    tracemalloc.start()
+    started = time.perf_counter()
+    if name == 'loop':
+        matcher = LoopMatcher(gallery)
+    elif name == 'matrix':
+        matcher = MatrixMatcher(gallery)
+    else:
+        matcher = MatrixMatcher(gallery, use_templates=True)
+    build_s = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return matcher, build_s, peak
+
+
+def time_queries(matcher, queries, top_k):
+
+    timings = np.empty(len(queries))
+    results = []
+    started = time.perf_counter()
+    for i, query in enumerate(queries):
+        query_started = time.perf_counter()
+        results.append(matcher.match(query, top_k))
+        timings[i] = (time.perf_counter() - query_started) * 1000
+    total_s = time.perf_counter() - started
+    p50, p95, p99 = np.percentile(timings, (50, 95, 99))
+    return {'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99),
+            'qps': len(queries) / total_s if total_s else float('inf')}, results
+
+
+def disagreements(reference, candidate):
+
+    # Queries where the best employee differs; ties at the clipped 0.0 floor are ignored
+    count = 0
+    for expected, actual in zip(reference, candidate):
+        if expected and expected[0][2] > 0 and (not actual or expected[0][0] != actual[0][0]):
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gallery matching on synthetic 512-d galleries")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000, 1000000],
+                        help="gallery sizes (identities) to test")
+    parser.add_argument('--templates', type=int, default=3, help="templates per identity")
+    parser.add_argument('--queries', type=int, default=200, help="timed queries per gallery and matcher")
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--matchers', nargs='+', default=['loop', 'matrix', 'matrix-templates'],
+                        choices=['loop', 'matrix', 'matrix-templates'])
+    parser.add_argument('--loop-max', type=int, default=100000,
+                        help="skip the loop matcher above this gallery size, it takes minutes there")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--quick', action='store_true',
+                        help=f"CI mode: sizes {QUICK_SIZES} and 50 queries")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+    if args.quick:
+        args.sizes, args.queries = QUICK_SIZES, 50
+
+    rows = []
+    failed = False
+    print(f"{'size':>8} {'matcher':<17} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries/s':>10} "
+          f"{'build s':>8} {'build MB':>9} {'top-1 diff':>10}")
+    for size in args.sizes:
+        rng = np.random.default_rng(args.seed)
+        gallery, centers = synthetic_gallery(size, args.templates, rng)
+        queries = synthetic_queries(centers, args.queries, rng)
+        reference = None
+        for name in args.matchers:
+            if name == 'loop' and size > args.loop_max:
+                continue
+            matcher, build_s, peak = build_matcher(name, gallery)
+            # One untimed query so lazy allocations and BLAS thread start-up are not measured
+            matcher.match(queries[0], args.top_k)
+            stats, results = time_queries(matcher, queries, args.top_k)
+            # The loop matcher is the reference; averaged-template matchers must agree with it
+            diff = None
+            if name == 'loop':
+                reference = results
+            elif reference is not None and name == 'matrix':
+                diff = disagreements(reference, results)
+                failed = failed or diff > 0
+            row = dict(stats, size=size, matcher=name, build_s=build_s, build_mb=peak / 2 ** 20, top1_diff=diff)
+            rows.append(row)
+            print(f"{size:>8} {name:<17} {row['p50_ms']:9.3f} {row['p95_ms']:9.3f} {row['p99_ms']:9.3f} "
+                  f"{row['qps']:10.0f} {build_s:8.2f} {row['build_mb']:9.1f} "
+                  f"{'-' if diff is None else diff:>10}")
+        del gallery, centers
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'templates': args.templates, 'queries': args.queries, 'top_k': args.top_k,
+                       'seed': args.seed, 'results': rows}, f, indent=2)
+    if failed:
+        print("Matrix matcher disagrees with the loop matcher on the best match")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import os
+import re
+import threading
+import tempfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pipeline_metrics import HISTOGRAM_BUCKETS_MS
+from app_logging import get_logger
+
+log = get_logger('exporter')
+
+PREFIX = 'attendance'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+TEXTFILE_NAME = 'attendance.prom'
+
+# HELP text for the counters and gauges the pipeline is known to set; anything else
+# is still exported, just without a description
+COUNTER_HELP = {
+    'frames': 'Frames read from the camera',
+    'capture_failed': 'Camera reads that returned no frame',
+    'camera_reopens': 'Attempts to reopen the camera after it stopped delivering frames',
+    'frames_dropped': 'Frames not sent to the UI because it was still painting earlier ones',
+    'frame_copies': 'Whole-frame copies and resizes between capture and display, counted the same in '
+                    'both camera transports',
+    'no_face': 'Frames where no face was detected',
+    'faces': 'Frames where a face was detected',
+    'quality_rejected': 'Faces skipped by the quality gate before recognition',
+    'matches': 'Faces matched to an employee above the threshold',
+    'below_threshold': 'Faces whose best match was below the threshold',
+    'db_writes': 'Attendance rows written',
+    'db_write_failed': 'Attendance writes that raised a database error',
+}
+GAUGE_HELP = {
+    'fps': 'Camera loop frames per second over the last second',
+    'frames_pending_paint': 'Frames sent to the UI and not yet painted',
+    'buffer_allocations': 'Frame and scratch buffers allocated by the camera loop (in process mode, the '
+                          'inference process) since it started',
+    'gallery_size': 'Employees in the loaded face gallery',
+    'embedding_store_load_seconds': 'Time to load the embeddings file at startup',
+    'model_load_seconds': 'Time to load the recognition model at startup',
+}
+
+
+def _metric_name(name):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def render_prometheus(export):
+
+    # Prometheus text exposition format for PipelineMetrics.export()
+    lines = []
+    for name, value in sorted(export['counters'].items()):
+        metric = f"{PREFIX}_{_metric_name(name)}_total"
+        if name in COUNTER_HELP:
+            lines.append(f"# HELP {metric} {COUNTER_HELP[name]}")
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    for name, value in sorted(export['gauges'].items()):
+        metric = f"{PREFIX}_{_metric_name(name)}"
+        if name in GAUGE_HELP:
+            lines.append(f"# HELP {metric} {GAUGE_HELP[name]}")
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {float(value):.6g}")
+
+    if export['histograms']:
+        metric = f"{PREFIX}_stage_latency_seconds"
+        lines.append(f"# HELP {metric} Latency of each recognition pipeline stage")
+        lines.append(f"# TYPE {metric} histogram")
+        for stage, (counts, total_ms) in export['histograms'].items():
+            cumulative = 0
+            for bound, count in zip(HISTOGRAM_BUCKETS_MS + (None,), counts):
+                cumulative += count
+                le = '+Inf' if bound is None else f"{bound / 1000:g}"
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {total_ms / 1000:.6f}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {cumulative}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_prometheus(self.server.metrics.export()).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would otherwise flood stderr
+        pass
+
+
+class MetricsExporter:
+
+    # Serves PipelineMetrics on http://<host>:<port>/metrics and/or rewrites a
+    # node_exporter textfile-collector file every interval. Both run on their own
+    # daemon threads and only read the metrics (a short lock to copy the counts), so a
+    # scrape costs the camera loop nothing beyond that copy.
+
+    def __init__(self, metrics, host='127.0.0.1', port=None, textfile_dir=None, textfile_interval=15.0):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.textfile_dir = textfile_dir
+        self.textfile_interval = textfile_interval
+        self.server = None
+        self.stopping = threading.Event()
+        self.threads = []
+
+    @classmethod
+    def from_settings(cls, metrics, metrics_settings):
+        if not metrics.enabled:
+            return None
+        exporter_settings = metrics_settings['exporter']
+        if not exporter_settings['http_port'] and not exporter_settings['textfile_dir']:
+            return None
+        return cls(metrics, exporter_settings['host'], exporter_settings['http_port'],
+                   exporter_settings['textfile_dir'], exporter_settings['textfile_interval_s'])
+
+    def start(self):
+        if self.port:
+            try:
+                self.server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+            except OSError as e:
+                log.warning("Metrics endpoint not started on %s:%s: %s", self.host, self.port, e)
+            else:
+                self.server.daemon_threads = True
+                self.server.metrics = self.metrics
+                self._spawn("metrics-http", self.server.serve_forever)
+                log.info("Serving metrics on http://%s:%d/metrics", self.host, self.port)
+        if self.textfile_dir:
+            self._spawn("metrics-textfile", self._textfile_loop)
+
+    def _spawn(self, name, target):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def write_textfile(self):
+        # Written to a temp file and renamed, so the collector never reads half a file
+        path = os.path.join(self.textfile_dir, TEXTFILE_NAME)
+        fd, tmp_path = tempfile.mkstemp(dir=self.textfile_dir, prefix='.attendance-', suffix='.prom')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(render_prometheus(self.metrics.export()))
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _textfile_loop(self):
+        while not self.stopping.is_set():
+            try:
+                self.write_textfile()
+            except OSError as e:
+                log.warning("Error writing metrics textfile to %s: %s", self.textfile_dir, e)
+            self.stopping.wait(self.textfile_interval)
+
+    def stop(self):
+        self.stopping.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.textfile_dir:
+            try:
+                self.write_textfile()
+            except OSError:
+                pass
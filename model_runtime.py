@@ -0,0 +1,238 @@
+import os
+import glob
+import json
+import time
+import platform
+import numpy as np
+import cv2
+
+CACHE_STAMP = 'cache.json'
+APPROVAL_FILE = 'approval.json'
+CPU_PROVIDERS = ['CPUExecutionProvider']
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': 'ORT_DISABLE_ALL',
+    'basic': 'ORT_ENABLE_BASIC',
+    'extended': 'ORT_ENABLE_EXTENDED',
+    'all': 'ORT_ENABLE_ALL',
+}
+EXECUTION_MODES = {
+    'sequential': 'ORT_SEQUENTIAL',
+    'parallel': 'ORT_PARALLEL',
+}
+
+
+class RuntimeProfile:
+
+    # How ONNX Runtime and OpenCV may use the CPU. Thread counts of 0 leave the choice
+    # to ORT; opencv_threads of None leaves OpenCV's own pool untouched.
+
+    __slots__ = ('intra_op_threads', 'inter_op_threads', 'execution_mode', 'graph_optimization',
+                 'opencv_threads', 'providers')
+
+    def __init__(self, intra_op_threads=0, inter_op_threads=0, execution_mode='sequential',
+                 graph_optimization='all', opencv_threads=None, providers=None):
+        if execution_mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution_mode: {execution_mode}")
+        if graph_optimization not in GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(f"Unknown graph_optimization: {graph_optimization}")
+        self.intra_op_threads = int(intra_op_threads)
+        self.inter_op_threads = int(inter_op_threads)
+        self.execution_mode = execution_mode
+        self.graph_optimization = graph_optimization
+        self.opencv_threads = opencv_threads
+        self.providers = list(providers or ['CUDAExecutionProvider', 'CPUExecutionProvider'])
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(**{key: values[key] for key in cls.__slots__ if key in values})
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def active_providers(self):
+        # The requested providers this onnxruntime build actually has, in order; the
+        # default list asks for CUDA first, which CPU-only installs silently skip
+        import onnxruntime as ort
+        available = set(ort.get_available_providers())
+        return [provider for provider in self.providers if provider in available] or list(CPU_PROVIDERS)
+
+    @property
+    def cpu_only(self):
+        return self.active_providers() == CPU_PROVIDERS
+
+    def session_options(self, optimized_model_filepath=None, pre_optimized=False):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.execution_mode = getattr(ort.ExecutionMode, EXECUTION_MODES[self.execution_mode])
+        # A graph that was optimized offline is loaded as-is
+        level = 'disable' if pre_optimized else self.graph_optimization
+        options.graph_optimization_level = getattr(ort.GraphOptimizationLevel, GRAPH_OPTIMIZATION_LEVELS[level])
+        if optimized_model_filepath:
+            options.optimized_model_filepath = optimized_model_filepath
+        return options
+
+    def apply_opencv(self):
+        if self.opencv_threads is not None:
+            cv2.setNumThreads(int(self.opencv_threads))
+
+    def describe(self):
+        return (f"intra={self.intra_op_threads} inter={self.inter_op_threads} {self.execution_mode} "
+                f"opt={self.graph_optimization} cv2={self.opencv_threads} providers={','.join(self.providers)}")
+
+
+def _input_feed(model, det_size):
+
+    # Zero tensor matching the model's first input; the detector's spatial dims are
+    # dynamic, so it gets the configured det_size (given as width, height)
+    model_input = model.session.get_inputs()[0]
+    shape = [dim if isinstance(dim, int) else 1 for dim in model_input.shape]
+    if model.taskname == 'detection':
+        shape = [1, shape[1] if len(shape) > 1 else 3, det_size[1], det_size[0]]
+    return {model_input.name: np.zeros(shape, dtype=np.float32)}
+
+
+def warm_up_models(app, det_size, runs=2, extra_det_sizes=()):
+
+    # ONNX Runtime allocates its arenas and picks kernels on the first run of each
+    # session; doing that here keeps it out of the first camera frame and enrollment.
+    # Returns {taskname: ms} for the first (cold) run of every model.
+    timings = {}
+    for taskname, model in app.models.items():
+        feed = _input_feed(model, det_size)
+        for run in range(max(runs, 1)):
+            started = time.perf_counter()
+            model.session.run(None, feed)
+            if run == 0:
+                timings[taskname] = (time.perf_counter() - started) * 1000
+
+    # ORT plans memory per input shape, so every detector size used at runtime is run once
+    detector = app.models.get('detection')
+    for size in extra_det_sizes:
+        if detector is not None:
+            detector.session.run(None, _input_feed(detector, size))
+
+    # One pass through FaceAnalysis itself covers the pre/post-processing code paths
+    app.get(np.zeros((det_size[1], det_size[0], 3), dtype=np.uint8))
+    return timings
+
+
+def _cache_key(model_dir, profile):
+
+    import onnxruntime as ort
+    sources = {}
+    for name in sorted(os.listdir(model_dir)):
+        if name.endswith('.onnx'):
+            stat = os.stat(os.path.join(model_dir, name))
+            sources[name] = [stat.st_size, int(stat.st_mtime)]
+    # Graphs optimized at ORT_ENABLE_ALL may contain CPU-specific kernels, so the cache
+    # is only valid for the same runtime version and optimization level on the same machine
+    return {'onnxruntime': ort.__version__, 'machine': platform.machine(),
+            'processor': platform.processor(), 'graph_optimization': profile.graph_optimization,
+            'sources': sources}
+
+
+def cached_model_root(cache_dir, model_name, model_dir, profile):
+
+    # Returns a FaceAnalysis root whose models/<model_name> holds optimized graphs for
+    # the models in model_dir, or None when there is no valid cache yet. Only CPU
+    # sessions are cached: GPU providers compile nodes that cannot be saved.
+    cache_model_dir = os.path.join(cache_dir, 'models', model_name)
+    stamp_path = os.path.join(cache_model_dir, CACHE_STAMP)
+    if not profile.cpu_only or not model_dir or not os.path.isdir(model_dir) or not os.path.exists(stamp_path):
+        return None
+    try:
+        with open(stamp_path, encoding='utf-8') as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if stamp != _cache_key(model_dir, profile):
+        return None
+    return cache_dir
+
+
+def load_face_analysis(model_name, root, profile, cache_dir=None, pre_optimized=False):
+
+    # FaceAnalysis.__init__ builds every session with default options, and
+    # model_zoo.get_model does not pass session options on. So the app is assembled
+    # here the way FaceAnalysis does it, with each session built once from the
+    # profile. With cache_dir and CPU-only sessions, ORT writes the optimized graphs
+    # there as they load, for cached_model_root to find next time.
+    import onnxruntime as ort
+    from insightface.app import FaceAnalysis
+    from insightface.model_zoo.model_zoo import ModelRouter
+    from insightface.utils import ensure_available
+
+    ort.set_default_logger_severity(3)
+    model_dir = ensure_available('models', model_name, root=root)
+    providers = profile.active_providers()
+    cache_model_dir = None
+    if cache_dir and not pre_optimized and providers == CPU_PROVIDERS:
+        cache_model_dir = os.path.join(cache_dir, 'models', model_name)
+        os.makedirs(cache_model_dir, exist_ok=True)
+
+    app = FaceAnalysis.__new__(FaceAnalysis)
+    app.model_dir = model_dir
+    app.models = {}
+    for onnx_file in sorted(glob.glob(os.path.join(model_dir, '*.onnx'))):
+        optimized_path = None
+        if cache_model_dir:
+            optimized_path = os.path.join(cache_model_dir, os.path.basename(onnx_file))
+        model = ModelRouter(onnx_file).get_model(
+            sess_options=profile.session_options(optimized_path, pre_optimized), providers=providers)
+        # Same rules as FaceAnalysis: unknown graphs are skipped, the first model per task wins
+        if model is None or model.taskname in app.models:
+            continue
+        app.models[model.taskname] = model
+    if 'detection' not in app.models:
+        raise RuntimeError(f"No detection model in {model_dir}")
+    app.det_model = app.models['detection']
+
+    # Stamped only if every session really ended up on the CPU provider
+    used = {provider for model in app.models.values() for provider in model.session.get_providers()}
+    if cache_model_dir and used == set(CPU_PROVIDERS):
+        tmp_path = os.path.join(cache_model_dir, CACHE_STAMP + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(_cache_key(model_dir, profile), f)
+        os.replace(tmp_path, os.path.join(cache_model_dir, CACHE_STAMP))
+        print(f"Optimized model graphs cached in {cache_model_dir}")
+    return app
+
+
+def apply_profile(app, profile):
+
+    # Rebuilds the sessions of an already loaded app with another profile, so
+    # runtime_tuner can compare profiles without reloading FaceAnalysis each time
+    import onnxruntime as ort
+
+    for model in app.models.values():
+        model.session = ort.InferenceSession(model.model_file, profile.session_options(),
+                                             providers=profile.active_providers())
+
+
+def variant_fingerprint(variant_dir):
+
+    # Ties an approval report to the exact model files it was measured on
+    return {name: os.path.getsize(os.path.join(variant_dir, name))
+            for name in sorted(os.listdir(variant_dir)) if name.endswith('.onnx')}
+
+
+def variant_model_root(variants_dir, model_name, variant, require_approval=True):
+
+    # Returns the FaceAnalysis root for <model_name>_<variant>, or None (use FP32) when
+    # the variant is missing or has not passed quantize_models.py's accuracy gate
+    variant_dir = os.path.join(variants_dir, 'models', f"{model_name}_{variant}")
+    if not os.path.isdir(variant_dir):
+        print(f"Model variant {variant} not found in {variants_dir}, using FP32 models")
+        return None
+    if require_approval:
+        try:
+            with open(os.path.join(variant_dir, APPROVAL_FILE), encoding='utf-8') as f:
+                approval = json.load(f)
+        except (OSError, ValueError):
+            approval = {}
+        if not approval.get('approved') or approval.get('files') != variant_fingerprint(variant_dir):
+            print(f"Model variant {variant} has not passed the accuracy gate, using FP32 models")
+            return None
+    return variants_dir
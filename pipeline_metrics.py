@@ -0,0 +1,223 @@
+import time
+import bisect
+import threading
+from collections import deque, Counter
+import numpy as np
+from app_logging import get_logger
+
+log = get_logger('metrics')
+
+# Hot-path stages in pipeline order, so reports read top to bottom like a frame does
+STAGES = ('capture', 'resize', 'detection', 'alignment', 'embedding', 'attributes',
+          'gallery_scan', 'frame', 'db_write', 'repaint', 'gil_lag')
+# Upper bounds of the exported latency histograms; counts are cumulative since start
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+
+class PipelineMetrics:
+
+    # Rolling latency samples per stage plus event counters. Callers take a timestamp
+    # with time.perf_counter() and hand it to record(), which keeps the hot path to one
+    # clock read, a deque append and a histogram bucket increment. Percentiles and
+    # exports are only computed when read, by whoever is reading.
+
+    enabled = True
+
+    def __init__(self, window=1000, dump_interval=60.0):
+        self.window = window
+        self.dump_interval = dump_interval
+        self.samples = {}
+        self.histograms = {}
+        self.counters = Counter()
+        self.gauges = {}
+        self.lock = threading.Lock()
+        self.last_dump = time.perf_counter()
+
+    @classmethod
+    def from_settings(cls, metrics_settings):
+        if not metrics_settings.get('enabled'):
+            return NULL_METRICS
+        return cls(metrics_settings['window'], metrics_settings['dump_interval_s'])
+
+    def record(self, stage, started):
+        self.observe(stage, (time.perf_counter() - started) * 1000)
+
+    def observe(self, stage, elapsed_ms):
+        # For durations measured elsewhere, e.g. in a worker process
+        with self.lock:
+            samples = self.samples.get(stage)
+            if samples is None:
+                samples = self.samples[stage] = deque(maxlen=self.window)
+            samples.append(elapsed_ms)
+            # Created once per stage; reset() clears samples but never the histograms
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                # [count per bucket (last one is +Inf), total ms]
+                histogram = self.histograms[stage] = [[0] * (len(HISTOGRAM_BUCKETS_MS) + 1), 0.0]
+            histogram[0][bisect.bisect_left(HISTOGRAM_BUCKETS_MS, elapsed_ms)] += 1
+            histogram[1] += elapsed_ms
+
+    def incr(self, counter, amount=1):
+        with self.lock:
+            self.counters[counter] += amount
+
+    def merge(self, frame_metrics):
+        # Replays what a FrameMetrics collected: ([(stage, ms)], {counter: amount}, {gauge: value})
+        stages, counters, gauges = frame_metrics
+        for stage, elapsed_ms in stages:
+            self.observe(stage, elapsed_ms)
+        for counter, amount in counters.items():
+            self.incr(counter, amount)
+        for name, value in gauges.items():
+            self.set_gauge(name, value)
+
+    def set_gauge(self, name, value):
+        # A plain dict store; no lock needed for a single assignment
+        self.gauges[name] = value
+
+    def export(self):
+        # Lifetime counters, gauges and per-stage histograms for the exporter:
+        # {'counters': {...}, 'gauges': {...}, 'histograms': {stage: (bucket_counts, sum_ms)}}
+        with self.lock:
+            histograms = {stage: (list(counts), total) for stage, (counts, total) in self.histograms.items()}
+            counters = dict(self.counters)
+        return {'counters': counters, 'gauges': dict(self.gauges), 'histograms': histograms}
+
+    def snapshot(self):
+        # {'stages': {stage: {count, mean, p50, p95, p99}}, 'counters': {...}}
+        with self.lock:
+            samples = {stage: np.fromiter(values, dtype=np.float64) for stage, values in self.samples.items()}
+            counters = dict(self.counters)
+        stages = {}
+        for stage in sorted(samples, key=lambda name: STAGES.index(name) if name in STAGES else len(STAGES)):
+            values = samples[stage]
+            if not len(values):
+                continue
+            p50, p95, p99 = np.percentile(values, (50, 95, 99))
+            stages[stage] = {'count': len(values), 'mean': float(values.mean()),
+                             'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
+        return {'stages': stages, 'counters': counters}
+
+    def format_lines(self, snapshot=None):
+        snapshot = snapshot or self.snapshot()
+        lines = [f"{stage:<12} p50 {s['p50']:6.1f}  p95 {s['p95']:6.1f}  p99 {s['p99']:6.1f} ms"
+                 for stage, s in snapshot['stages'].items()]
+        if snapshot['counters']:
+            lines.append("  ".join(f"{name} {count}" for name, count in sorted(snapshot['counters'].items())))
+        return lines
+
+    def maybe_dump(self):
+        # Called from the camera loop; logs a report every dump_interval seconds
+        now = time.perf_counter()
+        if not self.dump_interval or now - self.last_dump < self.dump_interval:
+            return
+        self.last_dump = now
+        snapshot = self.snapshot()
+        log.info("Pipeline latency:\n  %s", "\n  ".join(self.format_lines(snapshot)),
+                 extra={'metrics': snapshot})
+
+    def reset(self):
+        # Clears the rolling windows behind the overlay and dumps; exported histograms
+        # and counters must stay monotonic, so they are kept
+        with self.lock:
+            self.samples = {}
+
+
+class GilLagProbe:
+
+    # Measures GIL contention in this process: a thread asks to wake every `interval`
+    # seconds and records how late it actually ran as the 'gil_lag' stage. It stays
+    # near zero unless other Python threads hold the GIL for long stretches.
+
+    def __init__(self, metrics, interval=0.005):
+        self.metrics = metrics
+        self.interval = interval
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if not self.metrics.enabled:
+            return
+        self.thread = threading.Thread(target=self._run, name="gil-lag-probe", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopping.is_set():
+            due = time.perf_counter() + self.interval
+            time.sleep(self.interval)
+            self.metrics.record('gil_lag', due)
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+
+
+class NullMetrics(PipelineMetrics):
+
+    # Same interface, nothing recorded: what the pipeline uses when metrics are off
+
+    enabled = False
+
+    def __init__(self):
+        pass
+
+    def record(self, stage, started):
+        pass
+
+    def observe(self, stage, elapsed_ms):
+        pass
+
+    def incr(self, counter, amount=1):
+        pass
+
+    def set_gauge(self, name, value):
+        pass
+
+    def snapshot(self):
+        return {'stages': {}, 'counters': {}}
+
+    def export(self):
+        return {'counters': {}, 'gauges': {}, 'histograms': {}}
+
+    def maybe_dump(self):
+        pass
+
+    def reset(self):
+        pass
+
+    def take(self):
+        return [], {}, {}
+
+
+NULL_METRICS = NullMetrics()
+
+
+class FrameMetrics(NullMetrics):
+
+    # Collects the stage timings, counters and gauges of one frame in a worker process, so
+    # they can travel with its result; the GUI process replays them with PipelineMetrics.merge
+
+    enabled = True
+
+    def __init__(self):
+        self.stages = []
+        self.counters = {}
+        self.gauges = {}
+
+    def record(self, stage, started):
+        self.stages.append((stage, (time.perf_counter() - started) * 1000))
+
+    def observe(self, stage, elapsed_ms):
+        self.stages.append((stage, elapsed_ms))
+
+    def incr(self, counter, amount=1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def take(self):
+        collected = (self.stages, self.counters, self.gauges)
+        self.stages, self.counters, self.gauges = [], {}, {}
+        return collected
@@ -0,0 +1,204 @@
+import os
+import io
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import weakref
+from collections import Counter
+from datetime import datetime
+from app_logging import get_logger
+
+log = get_logger('profiling')
+
+TOP_FUNCTIONS = 25
+
+# Loops that can profile themselves with cProfile while a capture runs, see ThreadProfileHook
+_hooks = weakref.WeakSet()
+_active = None
+_active_lock = threading.Lock()
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class ProfileCapture:
+
+    # Time-boxed statistical profile of every thread in the process. A sampler thread
+    # reads sys._current_frames() every interval and counts each stack, so the threads
+    # being profiled run unmodified. Writes, under output_dir:
+    #   <stem>.folded      - collapsed stacks (flamegraph.pl / speedscope), root = thread name
+    #   <stem>.txt         - top functions by self and total samples, per-thread counts
+    #   <stem>-<hook>.pstats / .txt - cProfile of each loop that registered a hook
+
+    def __init__(self, duration=30.0, output_dir='profiles', interval=0.01):
+        self.duration = duration
+        self.output_dir = output_dir
+        self.interval = interval
+        self.stem = os.path.join(output_dir, datetime.now().strftime("profile_%Y%m%d_%H%M%S"))
+        self.deadline = None
+        self.stacks = Counter()
+        self.thread_samples = Counter()
+        self.samples = 0
+        self.thread = None
+        self.finished = threading.Event()
+        self.on_finished = None
+
+    @property
+    def summary_path(self):
+        return f"{self.stem}.txt"
+
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+    def start(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.deadline = time.monotonic() + self.duration
+        for hook in list(_hooks):
+            hook.session = self
+        self.thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self.thread.start()
+        log.info("Profiling all threads for %.0f s -> %s.*", self.duration, self.stem)
+
+    def _run(self):
+        global _active
+        try:
+            own_id = threading.get_ident()
+            while not self.expired():
+                self._sample(own_id)
+                time.sleep(self.interval)
+            self._write()
+        except Exception:
+            log.exception("Profile capture failed")
+        finally:
+            with _active_lock:
+                _active = None
+            self.finished.set()
+            if self.on_finished is not None:
+                self.on_finished(self)
+
+    def _sample(self, own_id):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        # QThreads are not in threading.enumerate(); hooked loops name their own thread
+        names.update((hook.thread_id, hook.name) for hook in list(_hooks))
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            thread_name = names.get(thread_id, f"thread-{thread_id}")
+            stack.append(thread_name)
+            self.stacks[";".join(reversed(stack))] += 1
+            self.thread_samples[thread_name] += 1
+        self.samples += 1
+
+    def _write(self):
+        with open(f"{self.stem}.folded", 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        self_samples = Counter()
+        total_samples = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if not frames:
+                continue
+            self_samples[frames[-1]] += count
+            for label in set(frames):
+                total_samples[label] += count
+
+        lines = [f"{self.samples} samples every {self.interval * 1000:.0f} ms over {self.duration:.0f} s",
+                 "", "Samples per thread:"]
+        lines += [f"  {count:7d}  {name}" for name, count in self.thread_samples.most_common()]
+        lines += ["", f"Top {TOP_FUNCTIONS} functions by self samples (where time is spent):"]
+        lines += [f"  {count:7d}  {label}" for label, count in self_samples.most_common(TOP_FUNCTIONS)]
+        lines += ["", f"Top {TOP_FUNCTIONS} functions by total samples (including callees):"]
+        lines += [f"  {count:7d}  {label}" for label, count in total_samples.most_common(TOP_FUNCTIONS)]
+        with open(self.summary_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        log.info("Profile written to %s (.folded for flamegraphs)", self.summary_path)
+
+
+class ThreadProfileHook:
+
+    # Deterministic cProfile for one long-running loop, on top of the sampler. The loop
+    # calls tick() once per iteration: profiling starts on the first tick after a
+    # capture begins and is written out on the first tick after it ends. cProfile only
+    # sees the thread that enabled it, which is why the loop does this itself.
+
+    def __init__(self, name):
+        # Created on the thread it profiles
+        self.name = name
+        self.thread_id = threading.get_ident()
+        self.session = None
+        self.profiler = None
+        self.profiling = None
+        _hooks.add(self)
+
+    def tick(self):
+        if self.profiler is None:
+            session = self.session
+            if session is None or session.expired():
+                return
+            self.profiling = session
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif self.profiling.expired():
+            self.stop()
+
+    def stop(self):
+        # Also called when the loop exits mid-capture, so a partial profile is kept
+        if self.profiler is None:
+            return
+        self.profiler.disable()
+        stem = f"{self.profiling.stem}-{self.name}"
+        try:
+            self.profiler.dump_stats(f"{stem}.pstats")
+            text = io.StringIO()
+            pstats.Stats(self.profiler, stream=text).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+            with open(f"{stem}.txt", 'w', encoding='utf-8') as f:
+                f.write(text.getvalue())
+            log.info("%s cProfile written to %s.pstats", self.name, stem)
+        except OSError as e:
+            log.warning("Error writing %s profile: %s", self.name, e)
+        self.profiler = None
+        self.profiling = None
+        self.session = None
+
+    def close(self):
+        self.stop()
+        _hooks.discard(self)
+
+
+def active_capture():
+    with _active_lock:
+        return _active
+
+
+def start_capture(duration=30.0, output_dir='profiles', interval=0.01, on_finished=None):
+
+    # Starts a capture unless one is already running; returns it, or None if busy or
+    # if it could not start (e.g. output_dir not writable, which is logged).
+    # on_finished(capture) is called from the sampler thread once the files are written.
+    global _active
+    with _active_lock:
+        if _active is not None:
+            return None
+        capture = _active = ProfileCapture(duration, output_dir, interval)
+        capture.on_finished = on_finished
+    try:
+        capture.start()
+    except Exception:
+        log.exception("Could not start a profile capture in %s", output_dir)
+        for hook in list(_hooks):
+            if hook.session is capture:
+                hook.session = None
+        with _active_lock:
+            _active = None
+        return None
+    return capture
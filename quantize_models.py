@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+from datetime import datetime
+import numpy as np
+import cv2
+from app_settings import load_settings
+from bulk_import import read_directory
+from database_helper import DatabaseHelper
+from insightface_embeddings import InsightFaceEmbeddingExtractor
+from model_runtime import RuntimeProfile, APPROVAL_FILE, variant_fingerprint
+
+# Only the models that run on every frame are quantized; the attribute and landmark
+# models are copied into the variant unchanged
+QUANTIZED_TASKS = ('detection', 'recognition')
+
+
+def load_photos(photos_dir=None, db_helper=None):
+
+    # Returns [(employee_id, image)] from a bulk-import style folder tree and/or the database
+    photos = []
+    if photos_dir:
+        for row in read_directory(photos_dir):
+            for path in row.image_paths:
+                img = cv2.imread(path)
+                if img is not None:
+                    photos.append((row.employee_id, img))
+    if db_helper:
+        for employee in db_helper.get_all_employees():
+            for img in db_helper.get_employee_images(employee['employee_id']):
+                if img is not None:
+                    photos.append((employee['employee_id'], img))
+    return photos
+
+
+def detection_blob(model, img, det_size):
+
+    # Same letterboxing as the insightface detector's own preprocessing
+    det_w, det_h = det_size
+    if img.shape[0] / img.shape[1] > det_h / det_w:
+        new_h, new_w = det_h, int(det_h * img.shape[1] / img.shape[0])
+    else:
+        new_w, new_h = det_w, int(det_w * img.shape[0] / img.shape[1])
+    det_img = np.zeros((det_h, det_w, 3), dtype=np.uint8)
+    det_img[:new_h, :new_w] = cv2.resize(img, (new_w, new_h))
+    return cv2.dnn.blobFromImage(det_img, 1.0 / model.input_std, (det_w, det_h),
+                                 (model.input_mean,) * 3, swapRB=True)
+
+
+def recognition_blob(model, img, face):
+
+    from insightface.utils import face_align
+    crop = face_align.norm_crop(img, landmark=face.kps, image_size=model.input_size[0])
+    return cv2.dnn.blobFromImage(crop, 1.0 / model.input_std, model.input_size,
+                                 (model.input_mean,) * 3, swapRB=True)
+
+
+class BlobCalibrationReader:
+
+    # onnxruntime.quantization.CalibrationDataReader protocol: get_next() until None
+
+    def __init__(self, input_name, blobs):
+        self.input_name = input_name
+        self.blobs = iter(blobs)
+
+    def get_next(self):
+        blob = next(self.blobs, None)
+        return None if blob is None else {self.input_name: blob}
+
+
+def calibration_blobs(extractor, photos, limit):
+
+    app = extractor.app
+    det_model, rec_model = app.models['detection'], app.models['recognition']
+    blobs = {'detection': [], 'recognition': []}
+    for _, img in photos[:limit]:
+        blobs['detection'].append(detection_blob(det_model, img, extractor.det_size))
+        faces = app.get(img)
+        if faces:
+            face = max(faces, key=lambda f: (f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1]))
+            blobs['recognition'].append(recognition_blob(rec_model, img, face))
+    return blobs
+
+
+def build_variant(extractor, variant_dir, mode, blobs):
+
+    from onnxruntime.quantization import (quantize_dynamic, quantize_static, QuantType, QuantFormat,
+                                          CalibrationMethod)
+
+    os.makedirs(variant_dir, exist_ok=True)
+    for name in os.listdir(extractor.app.model_dir):
+        if name.endswith('.onnx'):
+            shutil.copy2(os.path.join(extractor.app.model_dir, name), variant_dir)
+
+    for task in QUANTIZED_TASKS:
+        model = extractor.app.models[task]
+        target = os.path.join(variant_dir, os.path.basename(model.model_file))
+        print(f"Quantizing {task} model ({mode})...")
+        if mode == 'dynamic':
+            quantize_dynamic(model.model_file, target, weight_type=QuantType.QInt8)
+        else:
+            if not blobs[task]:
+                raise RuntimeError(f"No calibration samples for the {task} model")
+            reader = BlobCalibrationReader(model.session.get_inputs()[0].name, blobs[task])
+            quantize_static(model.model_file, target, reader, quant_format=QuantFormat.QDQ,
+                            per_channel=True, activation_type=QuantType.QUInt8,
+                            weight_type=QuantType.QInt8, calibrate_method=CalibrationMethod.MinMax)
+
+
+def accuracy_gate(reference, candidate, photos):
+
+    # Embedding agreement per photo, plus whether the variant's embedding picks the same
+    # employee as FP32 against a gallery built from the FP32 embeddings
+    reference_embeddings, candidate_embeddings, identities = [], [], []
+    missed = 0
+    for employee_id, img in photos:
+        ref_embedding, _ = reference.extract_face_embedding(img)
+        if ref_embedding is None:
+            continue
+        cand_embedding, _ = candidate.extract_face_embedding(img)
+        if cand_embedding is None:
+            missed += 1
+            continue
+        reference_embeddings.append(ref_embedding / np.linalg.norm(ref_embedding))
+        candidate_embeddings.append(cand_embedding / np.linalg.norm(cand_embedding))
+        identities.append(employee_id)
+
+    if not reference_embeddings:
+        raise RuntimeError("No faces found in the evaluation photos")
+
+    ref = np.stack(reference_embeddings)
+    cand = np.stack(candidate_embeddings)
+    cosine = np.sum(ref * cand, axis=1)
+
+    employee_ids = sorted(set(identities))
+    gallery = np.stack([ref[[i for i, e in enumerate(identities) if e == emp_id]].mean(axis=0)
+                        for emp_id in employee_ids])
+    gallery /= np.linalg.norm(gallery, axis=1, keepdims=True)
+    ref_scores, cand_scores = ref @ gallery.T, cand @ gallery.T
+    ref_top1, cand_top1 = ref_scores.argmax(axis=1), cand_scores.argmax(axis=1)
+    # A decision is the matched employee, or no match when the best score is below threshold
+    ref_decision = np.where(ref_scores.max(axis=1) > reference.threshold, ref_top1, -1)
+    cand_decision = np.where(cand_scores.max(axis=1) > candidate.threshold, cand_top1, -1)
+
+    evaluated = len(identities) + missed
+    return {
+        'photos': evaluated,
+        'detection_missed_rate': missed / evaluated,
+        'cosine_mean': float(cosine.mean()),
+        'cosine_min': float(cosine.min()),
+        'cosine_p5': float(np.percentile(cosine, 5)),
+        'top1_agreement': float(np.mean(ref_top1 == cand_top1)),
+        'decision_agreement': float(np.mean(ref_decision == cand_decision)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build INT8 variants of the detection and recognition models")
+    parser.add_argument('--mode', choices=('dynamic', 'static'), default='static')
+    parser.add_argument('--variant', default='int8')
+    parser.add_argument('--photos', help="folder of '<id>_<name>' subfolders with enrollment photos")
+    parser.add_argument('--from-db', action='store_true', help="use the employee photos stored in the database")
+    parser.add_argument('--calibration-size', type=int, default=200)
+    parser.add_argument('--gate-only', action='store_true', help="re-run the accuracy gate on an existing variant")
+    parser.add_argument('--min-cosine-mean', type=float, default=0.98)
+    parser.add_argument('--min-cosine-p5', type=float, default=0.95)
+    parser.add_argument('--min-top1-agreement', type=float, default=0.99)
+    parser.add_argument('--min-decision-agreement', type=float, default=0.99)
+    parser.add_argument('--max-detection-missed', type=float, default=0.01)
+    args = parser.parse_args()
+    if not args.photos and not args.from_db:
+        parser.error("give --photos and/or --from-db")
+
+    settings = load_settings()
+    model_settings = settings['model']
+    profile = RuntimeProfile.from_dict(settings['runtime'])
+
+    db_helper = None
+    if args.from_db:
+        db_helper = DatabaseHelper(host="localhost", user="root", password="1234", database="attend")
+        if not db_helper.connect():
+            sys.exit(1)
+    try:
+        photos = load_photos(args.photos, db_helper)
+    finally:
+        if db_helper:
+            db_helper.disconnect()
+    print(f"Loaded {len(photos)} photos")
+
+    reference = InsightFaceEmbeddingExtractor(None, model_name=model_settings['name'],
+                                              det_size=model_settings['det_size'],
+                                              det_thresh=model_settings['det_thresh'],
+                                              warmup_runs=0, runtime_profile=profile)
+    variant_dir = os.path.join(model_settings['variants_dir'], 'models', f"{model_settings['name']}_{args.variant}")
+
+    if not args.gate_only:
+        blobs = calibration_blobs(reference, photos, args.calibration_size) if args.mode == 'static' else None
+        build_variant(reference, variant_dir, args.mode, blobs)
+
+    candidate = InsightFaceEmbeddingExtractor(None, model_name=model_settings['name'],
+                                              det_size=model_settings['det_size'],
+                                              det_thresh=model_settings['det_thresh'],
+                                              warmup_runs=0, runtime_profile=profile,
+                                              model_variant=args.variant,
+                                              variants_dir=model_settings['variants_dir'],
+                                              require_approval=False)
+    if candidate.model_variant != args.variant:
+        print(f"Variant {args.variant} could not be loaded from {variant_dir}")
+        sys.exit(1)
+
+    metrics = accuracy_gate(reference, candidate, photos)
+    failures = []
+    if metrics['cosine_mean'] < args.min_cosine_mean:
+        failures.append("cosine_mean")
+    if metrics['cosine_p5'] < args.min_cosine_p5:
+        failures.append("cosine_p5")
+    if metrics['top1_agreement'] < args.min_top1_agreement:
+        failures.append("top1_agreement")
+    if metrics['decision_agreement'] < args.min_decision_agreement:
+        failures.append("decision_agreement")
+    if metrics['detection_missed_rate'] > args.max_detection_missed:
+        failures.append("detection_missed_rate")
+
+    report = {
+        'approved': not failures,
+        'failed_checks': failures,
+        'mode': args.mode,
+        'metrics': metrics,
+        'thresholds': {key: value for key, value in vars(args).items() if key.startswith(('min_', 'max_'))},
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'files': variant_fingerprint(variant_dir),
+    }
+    with open(os.path.join(variant_dir, APPROVAL_FILE), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    for key, value in metrics.items():
+        print(f"  {key}: {value:.4f}" if isinstance(value, float) else f"  {key}: {value}")
+    if failures:
+        print(f"Variant {args.variant} REJECTED ({', '.join(failures)}); the app keeps using FP32")
+        sys.exit(1)
+    print(f"Variant {args.variant} approved; set model.variant to '{args.variant}' in settings.json to use it")
+
+
+if __name__ == "__main__":
+    main()
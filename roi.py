@@ -0,0 +1,93 @@
+import os
+import json
+import math
+import numpy as np
+import cv2
+
+ROI_CONFIG_FILE = 'roi_config.json'
+# The insightface detectors use strides up to 32, so input sides must be multiples of it
+DET_SIZE_STEP = 32
+MIN_DET_SIZE = 128
+
+
+class RegionOfInterest:
+
+    # A rectangle or polygon in normalized (0..1) frame coordinates. Detection runs on
+    # the bounding rectangle only; with a polygon, faces centred outside it are dropped.
+
+    __slots__ = ('points', 'is_rect', 'frame_shape', 'pixel_points', 'rect')
+
+    def __init__(self, points, is_rect=False):
+        self.points = np.clip(np.asarray(points, dtype=np.float32), 0.0, 1.0)
+        self.is_rect = is_rect
+        self.frame_shape = None
+        self.pixel_points = None
+        self.rect = None
+
+    @classmethod
+    def from_config(cls, entry):
+        # {"rect": [x1, y1, x2, y2]} or {"polygon": [[x, y], ...]}
+        if 'rect' in entry:
+            x1, y1, x2, y2 = entry['rect']
+            return cls([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], is_rect=True)
+        if len(entry.get('polygon', [])) < 3:
+            raise ValueError("ROI polygon needs at least three points")
+        return cls(entry['polygon'])
+
+    def _resolve(self, frame_shape):
+        # Pixel coordinates are cached per frame size
+        if self.frame_shape == frame_shape[:2]:
+            return
+        h, w = frame_shape[:2]
+        self.pixel_points = self.points * np.array([w, h], dtype=np.float32)
+        x1, y1 = np.floor(self.pixel_points.min(axis=0)).astype(int)
+        x2, y2 = np.ceil(self.pixel_points.max(axis=0)).astype(int)
+        self.rect = (max(x1, 0), max(y1, 0), min(x2, w), min(y2, h))
+        self.frame_shape = frame_shape[:2]
+
+    def crop(self, image):
+        # Returns a view on the ROI's bounding rectangle and its (x, y) offset in the frame
+        self._resolve(image.shape)
+        x1, y1, x2, y2 = self.rect
+        return image[y1:y2, x1:x2], (x1, y1)
+
+    def scale_det_size(self, det_size, frame_shape):
+        # Keeps the detector's pixels-per-face the same as on the full frame. The detector
+        # letterboxes the full frame by s = min(det_w / w, det_h / h); the crop gets an
+        # input of its own size times s, rounded up to the stride and no larger than det_size.
+        self._resolve(frame_shape)
+        x1, y1, x2, y2 = self.rect
+        det_w, det_h = det_size
+        s = min(det_w / frame_shape[1], det_h / frame_shape[0])
+        return tuple(min(size, max(MIN_DET_SIZE, int(math.ceil(side * s / DET_SIZE_STEP)) * DET_SIZE_STEP))
+                     for size, side in ((det_w, x2 - x1), (det_h, y2 - y1)))
+
+    def contains(self, x, y, frame_shape):
+        if self.is_rect:
+            return True
+        self._resolve(frame_shape)
+        return cv2.pointPolygonTest(self.pixel_points, (float(x), float(y)), False) >= 0
+
+    def draw(self, image, color=(0, 200, 255)):
+        self._resolve(image.shape)
+        cv2.polylines(image, [self.pixel_points.astype(np.int32)], True, color, 2)
+
+
+def load_roi_config(path=ROI_CONFIG_FILE):
+
+    # {"<source>": {"rect": [...]}} or {"<source>": {"polygon": [...]}}; the source is the
+    # camera index or stream URL as a string. A missing file means full-frame detection.
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        return {str(source): RegionOfInterest.from_config(entry) for source, entry in config.items()}
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Error reading ROI config {path}, using full frame: {e}")
+        return {}
+
+
+def roi_for_source(source, path=ROI_CONFIG_FILE):
+
+    return load_roi_config(path).get(str(source))
@@ -0,0 +1,91 @@
+import os
+import time
+import argparse
+import itertools
+import numpy as np
+import cv2
+from app_settings import load_settings, save_settings, SETTINGS_FILE
+from insightface_embeddings import InsightFaceEmbeddingExtractor
+from model_runtime import RuntimeProfile, CPU_PROVIDERS, apply_profile
+
+SAMPLE_IMAGE = 'Tom_Hanks_54745'
+
+
+def candidate_profiles(providers):
+
+    # A deliberately small sweep: the interesting axis on a kiosk is how many cores ORT
+    # takes from OpenCV and the Qt thread, not every combination of every knob
+    cores = os.cpu_count() or 1
+    intra_choices = sorted(threads for threads in {1, 2, max(1, cores // 2), cores} if threads <= cores)
+    opencv_choices = sorted({1, max(1, cores // 4)})
+    for intra, opencv_threads, graph_optimization in itertools.product(
+            intra_choices, opencv_choices, ('extended', 'all')):
+        yield RuntimeProfile(intra, 1, 'sequential', graph_optimization, opencv_threads, providers)
+    # Parallel execution only pays off for graphs with independent branches; try it once
+    yield RuntimeProfile(max(1, cores // 2), 2, 'parallel', 'all', 1, providers)
+
+
+def load_frame(path):
+
+    # A frame with a face, so recognition is timed along with detection; without a
+    # path, the single-face sample photo that ships with insightface
+    if path:
+        return cv2.imread(path)
+    from insightface.data import get_image
+    return get_image(SAMPLE_IMAGE)
+
+
+def measure(extractor, frame, runs):
+
+    # The camera loop's per-frame work: detection, then the other models on the largest face
+    for _ in range(2):
+        extractor.extract_face_embedding(frame)
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        extractor.extract_face_embedding(frame)
+        timings.append((time.perf_counter() - started) * 1000)
+    return float(np.median(timings)), float(np.percentile(timings, 90))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the fastest ONNX Runtime / OpenCV thread profile on this machine")
+    parser.add_argument('--image', help="photo with a face to benchmark on (default: insightface's sample photo)")
+    parser.add_argument('--runs', type=int, default=20, help="timed runs per profile")
+    parser.add_argument('--providers', nargs='+', default=CPU_PROVIDERS)
+    parser.add_argument('--save', action='store_true', help=f"write the winning profile to {SETTINGS_FILE}")
+    args = parser.parse_args()
+
+    settings = load_settings()
+    det_w, det_h = settings['model']['det_size']
+    frame = load_frame(args.image)
+    if frame is None:
+        parser.error(f"cannot read {args.image}")
+
+    base = RuntimeProfile.from_dict(dict(settings['runtime'], providers=args.providers))
+    extractor = InsightFaceEmbeddingExtractor(None, model_name=settings['model']['name'],
+                                              det_size=(det_w, det_h), det_thresh=settings['model']['det_thresh'],
+                                              warmup_runs=0, runtime_profile=base)
+    if extractor.extract_face_embedding(frame)[0] is None:
+        parser.error("no face found in the benchmark image; recognition would not be timed")
+
+    results = []
+    for profile in candidate_profiles(args.providers):
+        profile.apply_opencv()
+        apply_profile(extractor.app, profile)
+        median_ms, p90_ms = measure(extractor, frame, args.runs)
+        results.append((median_ms, p90_ms, profile))
+        print(f"{median_ms:8.1f} ms median {p90_ms:8.1f} ms p90  {profile.describe()}")
+
+    results.sort(key=lambda result: (result[0], result[1]))
+    median_ms, p90_ms, best = results[0]
+    print(f"\nFastest profile: {best.describe()} ({median_ms:.1f} ms median, {p90_ms:.1f} ms p90)")
+
+    if args.save:
+        settings['runtime'] = best.to_dict()
+        save_settings(settings)
+        print(f"Saved to {SETTINGS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import time
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, pyqtSignal
+from database_schema import SchemaManager
+from attendance_ledger import DailyAttendanceLedger
+from insightface_embeddings import InsightFaceEmbeddingExtractor, load_embeddings_file
+from app_settings import DEFAULT_SETTINGS
+from app_logging import get_logger
+
+log = get_logger('startup')
+
+# Taken when the app first imports this module, i.e. as close to process start as we get
+STARTUP_T0 = time.perf_counter()
+
+
+def since_start_ms():
+    return (time.perf_counter() - STARTUP_T0) * 1000
+
+
+class StartupTimer:
+
+    def __init__(self):
+        self.phases = []
+        self.lock = threading.Lock()
+        self.first_frame_logged = False
+
+    def record(self, name, started, finished):
+        with self.lock:
+            self.phases.append((name, (started - STARTUP_T0) * 1000, (finished - started) * 1000))
+        log.info("%s: %.0f ms (done at %.0f ms)", name, (finished - started) * 1000,
+                 (finished - STARTUP_T0) * 1000)
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.record(name, now, now)
+
+    def timed(self, name, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.record(name, started, time.perf_counter())
+
+    def first_frame(self):
+        # Time-to-first-frame: process start until the first camera frame is painted
+        if self.first_frame_logged:
+            return
+        self.first_frame_logged = True
+        log.info("Time to first frame: %.0f ms", since_start_ms())
+
+    def summary(self):
+        with self.lock:
+            return list(self.phases)
+
+
+class StartupLoader(QObject):
+    phase_finished = pyqtSignal(str, float)
+    database_ready = pyqtSignal(object, object)
+    engine_ready = pyqtSignal(object, object)
+    startup_failed = pyqtSignal(str, str)
+    status_changed = pyqtSignal(str)
+
+    # Runs the database connection, the model load and the gallery load concurrently,
+    # then falls back to a full extraction only if there was no saved gallery
+
+    def __init__(self, db_helper, embeddings_file='embeddings_insightface.pkl', timer=None, settings=None):
+        super().__init__()
+        self.db_helper = db_helper
+        self.embeddings_file = embeddings_file
+        self.settings = settings or DEFAULT_SETTINGS
+        self.timer = timer or StartupTimer()
+        self.executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="startup")
+        self.coordinator = None
+
+    def start(self):
+        self.coordinator = threading.Thread(target=self._run, name="startup-coordinator", daemon=True)
+        self.coordinator.start()
+
+    def _connect_database(self):
+        if not self.db_helper.connect():
+            raise RuntimeError("Failed to connect to database")
+        SchemaManager(self.db_helper).ensure_schema()
+        ledger = DailyAttendanceLedger(self.db_helper)
+        ledger.load()
+        return ledger
+
+    def _load_model(self):
+        # Warm-up is timed as its own phase so it shows up separately from the model load
+        extractor = self._timed("model", lambda: InsightFaceEmbeddingExtractor.from_settings(
+            None, self.settings, warmup=False))
+        warmup_runs = self.settings['model']['warmup_runs']
+        if warmup_runs:
+            self._timed("warmup", lambda: extractor.warm_up(warmup_runs))
+        return extractor
+
+    def _timed(self, name, fn):
+        started = time.perf_counter()
+        result = fn()
+        finished = time.perf_counter()
+        self.timer.record(name, started, finished)
+        self.phase_finished.emit(name, (finished - started) * 1000)
+        return result
+
+    def _run(self):
+        db_future = self.executor.submit(self._timed, "database", self._connect_database)
+        model_future = self.executor.submit(self._load_model)
+        gallery_future = self.executor.submit(self._timed, "embeddings",
+                                              lambda: load_embeddings_file(self.embeddings_file))
+
+        try:
+            ledger = db_future.result()
+        except Exception as e:
+            traceback.print_exc()
+            self.startup_failed.emit("database", str(e))
+            return
+        self.database_ready.emit(self.db_helper, ledger)
+        self.status_changed.emit("Loading face recognition model...")
+
+        try:
+            extractor = model_future.result()
+        except Exception as e:
+            traceback.print_exc()
+            self.startup_failed.emit("model", str(e))
+            return
+        extractor.db_helper = self.db_helper
+
+        embeddings_data = gallery_future.result()
+        if not embeddings_data:
+            self.status_changed.emit("Extracting embeddings from database...")
+            # Its own connection: the shared one belongs to the GUI thread from here on
+            worker_db = self.db_helper.clone()
+            if worker_db is None:
+                self.startup_failed.emit("embeddings", "Failed to open a database connection for extraction")
+                return
+            try:
+                embeddings_data = self._timed(
+                    "extract_embeddings",
+                    lambda: extractor.extract_embeddings_for_all_employees(db_helper=worker_db)) or {}
+            finally:
+                worker_db.disconnect()
+            if embeddings_data:
+                extractor.save_embeddings(embeddings_data, self.embeddings_file)
+            else:
+                log.warning("No embeddings could be extracted from the database")
+        extractor.embeddings_data = embeddings_data
+
+        self.timer.mark("ready")
+        self.engine_ready.emit(extractor, embeddings_data)
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,58 @@
+import pickle
+import numpy as np
+import pytest
+from compact_gallery import CompactGallery, gallery_to_dict
+from gallery_matching import MatrixMatcher
+from test_gallery_matching import make_gallery
+
+
+def with_face_info(gallery):
+    for entry in gallery.values():
+        entry['face_info'] = [{'bbox': np.array([10, 20, 110, 140], dtype=np.float32),
+                               'kps': np.arange(10, dtype=np.float32).reshape(5, 2),
+                               'det_score': 0.9, 'gender': 1, 'age': 30, 'det_size': (640, 640),
+                               'det_attempts': 1}] + [None] * (entry['num_faces'] - 1)
+    return gallery
+
+
+def test_round_trip_keeps_the_pickled_dict_format():
+    original = with_face_info(make_gallery(size=5))
+    restored = pickle.loads(pickle.dumps(gallery_to_dict(CompactGallery.from_dict(original))))
+
+    assert type(restored) is dict
+    assert list(restored) == list(original)
+    for emp_id, entry in original.items():
+        copy = restored[emp_id]
+        assert type(copy) is dict
+        assert set(copy) == set(entry)
+        assert copy['employee_name'] == entry['employee_name']
+        assert copy['num_faces'] == entry['num_faces']
+        np.testing.assert_allclose(copy['avg_embedding'], entry['avg_embedding'], atol=1e-6)
+        np.testing.assert_allclose(np.asarray(copy['all_embeddings']), np.asarray(entry['all_embeddings']))
+        first, *rest = copy['face_info']
+        np.testing.assert_array_equal(first['bbox'], entry['face_info'][0]['bbox'])
+        np.testing.assert_array_equal(first['kps'], entry['face_info'][0]['kps'])
+        assert first['det_score'] == pytest.approx(0.9)
+        assert (first['gender'], first['age'], first['det_size'], first['det_attempts']) == (1, 30, (640, 640), 1)
+        assert rest == [None] * (entry['num_faces'] - 1)
+
+
+def test_from_dict_accepts_a_compact_gallery_and_a_mix():
+    compact = CompactGallery.from_dict(make_gallery(size=3))
+    assert CompactGallery.from_dict(compact) is compact
+    mixed = CompactGallery.from_dict({**compact, 'NEW': make_gallery(size=1)['EMP000']})
+    assert list(mixed) == ['EMP000', 'EMP001', 'EMP002', 'NEW']
+    assert mixed['NEW']['num_faces'] == 3
+
+
+@pytest.mark.parametrize('use_templates', [False, True])
+def test_matcher_gives_the_same_results_on_compact_and_plain_galleries(use_templates):
+    plain = make_gallery()
+    plain_matcher = MatrixMatcher(plain, use_templates)
+    compact_matcher = MatrixMatcher(CompactGallery.from_dict(plain), use_templates)
+    rng = np.random.default_rng(2)
+    for _ in range(10):
+        query = rng.standard_normal(512).astype(np.float32)
+        expected, actual = plain_matcher.match(query), compact_matcher.match(query)
+        assert [result[:2] for result in actual] == [result[:2] for result in expected]
+        np.testing.assert_allclose([sim for _, _, sim in actual], [sim for _, _, sim in expected], atol=1e-5)
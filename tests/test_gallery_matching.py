@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from gallery_matching import LoopMatcher, MatrixMatcher
+
+
+def make_gallery(size=20, templates=3, dim=512, seed=0):
+    rng = np.random.default_rng(seed)
+    gallery = {}
+    for i in range(size):
+        faces = rng.standard_normal((templates, dim)).astype(np.float32)
+        faces /= np.linalg.norm(faces, axis=1, keepdims=True)
+        average = faces.mean(axis=0)
+        gallery[f"EMP{i:03d}"] = {
+            'avg_embedding': average / np.linalg.norm(average),
+            'all_embeddings': list(faces),
+            'employee_name': f"Employee {i}",
+            'face_info': [],
+            'num_faces': templates,
+        }
+    return gallery
+
+
+def test_matrix_matcher_agrees_with_loop_matcher():
+    gallery = make_gallery()
+    loop, matrix = LoopMatcher(gallery), MatrixMatcher(gallery)
+    rng = np.random.default_rng(1)
+    for _ in range(10):
+        query = rng.standard_normal(512).astype(np.float32)
+        # Below zero every similarity is clipped to 0.0 and the order among those ties is arbitrary
+        expected = [result for result in loop.match(query) if result[2] > 0]
+        actual = matrix.match(query)[:len(expected)]
+        assert [emp_id for emp_id, _, _ in actual] == [emp_id for emp_id, _, _ in expected]
+        np.testing.assert_allclose([sim for _, _, sim in actual], [sim for _, _, sim in expected], atol=1e-5)
+
+
+def test_top_k_returns_best_first():
+    gallery = make_gallery()
+    matcher = MatrixMatcher(gallery)
+    query = gallery['EMP007']['avg_embedding']
+    results = matcher.match(query, top_k=3)
+    assert len(results) == 3
+    assert results[0][:2] == ('EMP007', 'Employee 7')
+    assert results[0][2] == pytest.approx(1.0, abs=1e-5)
+    assert [sim for _, _, sim in results] == sorted((sim for _, _, sim in results), reverse=True)
+
+
+def test_templates_score_an_employee_by_their_best_template():
+    gallery = make_gallery()
+    matcher = MatrixMatcher(gallery, use_templates=True)
+    template = gallery['EMP004']['all_embeddings'][2]
+    scores = matcher.scores(template)
+    assert len(scores) == len(gallery)
+    assert scores[matcher.ids.index('EMP004')] == pytest.approx(1.0, abs=1e-5)
+    assert matcher.match(template, top_k=1)[0][0] == 'EMP004'
+
+
+def test_empty_gallery():
+    matcher = MatrixMatcher({})
+    assert len(matcher) == 0
+    assert matcher.match(np.ones(512, dtype=np.float32)) == []
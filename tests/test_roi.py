@@ -0,0 +1,29 @@
+import pytest
+
+from roi import RegionOfInterest, MIN_DET_SIZE
+
+
+def rect_roi(frame_w, frame_h, x1, y1, x2, y2):
+    return RegionOfInterest.from_config({'rect': [x1 / frame_w, y1 / frame_h, x2 / frame_w, y2 / frame_h]})
+
+
+def test_det_size_keeps_full_frame_scale():
+    # 1280x720 at det 640 is detected at scale 0.5, so a 400x400 crop needs 200x200,
+    # rounded up to the stride
+    roi = rect_roi(1280, 720, 440, 160, 840, 560)
+    assert roi.scale_det_size((640, 640), (720, 1280, 3)) == (224, 224)
+
+
+def test_det_size_is_clamped():
+    frame_shape = (720, 1280, 3)
+    assert rect_roi(1280, 720, 600, 300, 700, 400).scale_det_size((640, 640), frame_shape) == \
+        (MIN_DET_SIZE, MIN_DET_SIZE)
+    assert RegionOfInterest.from_config({'rect': [0, 0, 1, 1]}).scale_det_size((640, 640), frame_shape) == \
+        (640, 384)
+
+
+@pytest.mark.parametrize('det_size', [(320, 320), (480, 480), (640, 640)])
+def test_det_size_never_exceeds_requested(det_size):
+    roi = rect_roi(1920, 1080, 0, 0, 1920, 1080)
+    width, height = roi.scale_det_size(det_size, (1080, 1920, 3))
+    assert width <= det_size[0] and height <= det_size[1]
@@ -0,0 +1,10 @@
+DARK_BG = "#18191A"
+DARK_SECONDARY = "#242526"
+DARK_TERTIARY = "#3A3B3C"
+ACCENT_BLUE = "#0A66C2"
+ACCENT_BLUE_HOVER = "#0952A4"
+TEXT_PRIMARY = "#E4E6EB"
+TEXT_SECONDARY = "#B0B3B9"
+SUCCESS_GREEN = "#31A24C"
+ERROR_RED = "#E4163A"
+WARNING_ORANGE = "#F57C00"